@@ -0,0 +1,172 @@
+"""
+SnapVid - Download Archive
+Indexed record of downloaded videos, compatible with yt-dlp's
+--download-archive text format ("<extractor> <id>" per line)
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from sections import CLIP_NAME
+from storage import WORK_DIR
+
+# yt-dlp's default output template ends in " [<id>].<ext>" (11-char YouTube IDs)
+BRACKETED_ID = re.compile(r'\[([0-9A-Za-z_-]{11})\]\.[0-9A-Za-z]+$')
+# Extractor assumed for bare IDs found in file names
+DEFAULT_EXTRACTOR = 'youtube'
+# IDs per IN (...) lookup - below SQLite's default variable limit
+LOOKUP_CHUNK = 500
+
+
+def archive_id(extractor_key, video_id):
+    """Archive line for a video, e.g. 'youtube dQw4w9WgXcQ'"""
+    if not extractor_key or not video_id:
+        return None
+    return f"{extractor_key.lower()} {video_id}"
+
+
+def archive_id_from_key(key):
+    """Archive line for an info-cache key ('Youtube:ID'), None for URL keys"""
+    extractor, _, video_id = key.partition(':')
+    if extractor == 'url':
+        return None
+    return archive_id(extractor, video_id)
+
+
+class DownloadArchive:
+    """
+    SQLite-backed archive. Lookups hit the primary-key index directly, so
+    startup does not read the table and cost stays flat as it grows.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS archive (
+                id TEXT PRIMARY KEY,
+                title TEXT,
+                path TEXT,
+                added REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __contains__(self, entry):
+        if not entry:
+            return False
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM archive WHERE id = ?", (entry,)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM archive").fetchone()[0]
+
+    def existing(self, entries):
+        """Subset of entries already in the archive, in a few indexed queries"""
+        entries = [e for e in set(entries) if e]
+        found = set()
+        with self._lock:
+            for i in range(0, len(entries), LOOKUP_CHUNK):
+                chunk = entries[i:i + LOOKUP_CHUNK]
+                rows = self._db.execute(
+                    f"SELECT id FROM archive WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+                found.update(row[0] for row in rows)
+        return found
+
+    def add(self, entry, title=None, path=None):
+        if entry:
+            self.add_many([(entry, title, path)])
+
+    def add_many(self, rows):
+        """Insert (id, title, path) tuples; returns how many were new"""
+        now = time.time()
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO archive (id, title, path, added) VALUES (?, ?, ?, ?)",
+                ((entry, title, path, now) for entry, title, path in rows if entry))
+            self._db.commit()
+            return self._db.total_changes - before
+
+    def remove(self, entry):
+        with self._lock:
+            self._db.execute("DELETE FROM archive WHERE id = ?", (entry,))
+            self._db.commit()
+
+    # ========== IMPORT / EXPORT ==========
+    def import_file(self, path):
+        """Merge a yt-dlp --download-archive text file"""
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = ((line.strip(), None, None) for line in f if line.strip())
+            return self.add_many(rows)
+
+    def export_file(self, path):
+        """Write the archive in yt-dlp --download-archive format"""
+        with self._lock:
+            rows = self._db.execute("SELECT id FROM archive ORDER BY added").fetchall()
+        with open(path, 'w', encoding='utf-8') as f:
+            for (entry,) in rows:
+                f.write(entry + "\n")
+        return len(rows)
+
+    def scan_directory(self, directory, known=None):
+        """
+        Register videos already present in an output folder: yt-dlp
+        .info.json sidecars, file names carrying a bracketed [id] and,
+        for SnapVid's own '%(title)s.%(ext)s' files, the downloads in
+        `known` - (filepath, video_id, extractor, title, filesize) rows,
+        matched by path or, for a moved folder, by file name and size.
+        """
+        by_path, by_name = {}, {}
+        for filepath, video_id, extractor, title, filesize in known or ():
+            entry = archive_id(extractor, video_id)
+            # A clip does not count as having the video
+            if entry is None or CLIP_NAME.search(filepath):
+                continue
+            by_path[os.path.normcase(os.path.abspath(filepath))] = (entry, title)
+            if filesize:
+                key = (os.path.basename(filepath), filesize)
+                by_name.setdefault(key, set()).add((entry, title))
+        rows = []
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if d != WORK_DIR]
+            for name in files:
+                full = os.path.join(root, name)
+                if name.endswith('.info.json'):
+                    try:
+                        with open(full, 'r', encoding='utf-8') as f:
+                            info = json.load(f)
+                        entry = archive_id(info.get('extractor_key') or info.get('extractor'),
+                                           info.get('id'))
+                        rows.append((entry, info.get('title'), full))
+                    except (OSError, ValueError):
+                        continue
+                    continue
+                match = BRACKETED_ID.search(name)
+                if match:
+                    rows.append((archive_id(DEFAULT_EXTRACTOR, match.group(1)), None, full))
+                    continue
+                found = by_path.get(os.path.normcase(os.path.abspath(full)))
+                if found is None and by_name:
+                    # A name alone is too weak ('Intro.mp4'): the size must agree too
+                    try:
+                        candidates = by_name.get((name, os.stat(full).st_size), ())
+                    except OSError:
+                        continue
+                    if len(candidates) == 1:
+                        found, = candidates
+                if found is not None:
+                    rows.append((found[0], found[1], full))
+        return self.add_many(rows)
@@ -0,0 +1,189 @@
+"""
+SnapVid - Bandwidth Scheduler
+Global token bucket shared by every download, with per-job weights and
+caps, enforced from the yt-dlp progress hook
+"""
+
+import threading
+import time
+
+from download_queue import JobCancelled
+
+# ========== FAIRNESS POLICIES ==========
+FAIR = 'fair'          # weighted fair share: least bytes per unit of weight goes next
+FIFO = 'fifo'          # oldest job first
+SMALLEST = 'smallest'  # fewest remaining bytes first
+POLICIES = (FAIR, FIFO, SMALLEST)
+
+# Seconds of traffic a bucket may bank while idle
+BURST_SECONDS = 0.5
+# Longest single wait, so cancellation and limit changes are noticed
+MAX_WAIT = 0.25
+
+
+class JobShare:
+    """Scheduling state for one running job"""
+
+    def __init__(self, job, weight=1.0, cap=None):
+        self.job = job
+        self.weight = max(float(weight or 1.0), 0.01)
+        self.cap = cap or None
+        self.tokens = 0.0
+        self.refilled = time.monotonic()
+        self.consumed = 0
+        self.positions = {}
+        self.totals = {}
+        self.waiting = False
+
+    @property
+    def remaining(self):
+        """Bytes left across the job's files (unknown sizes sort last)"""
+        if not self.totals:
+            return float('inf')
+        return max(sum(self.totals.values()) - sum(self.positions.values()), 0)
+
+    def refill_cap(self, now):
+        if self.cap:
+            self.tokens = min(self.tokens + (now - self.refilled) * self.cap,
+                              self.cap * BURST_SECONDS)
+        self.refilled = now
+
+
+class BandwidthScheduler:
+    """
+    Token-bucket limiter. `rate` (bytes/s, None for unlimited) caps the sum
+    of all downloads; a job's `cap` caps that job alone. When several jobs
+    wait for global tokens the policy decides who is served first. Buckets
+    may go into debt by one block so yt-dlp's block size does not matter.
+    Every setter takes effect on the next block of every running download.
+    """
+
+    def __init__(self, rate=None, policy=FAIR):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown bandwidth policy: {policy}")
+        self.rate = rate or None
+        self.policy = policy
+        self._tokens = 0.0
+        self._refilled = time.monotonic()
+        self._shares = {}
+        self._cond = threading.Condition()
+
+    # ========== CONFIGURATION ==========
+    def set_rate(self, rate):
+        """Global limit in bytes/s (None or 0 lifts it)"""
+        with self._cond:
+            self._refill(time.monotonic())
+            self.rate = rate or None
+            self._tokens = min(self._tokens, self._burst())
+            self._cond.notify_all()
+
+    def set_policy(self, policy):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown bandwidth policy: {policy}")
+        with self._cond:
+            self.policy = policy
+            self._cond.notify_all()
+
+    def set_job(self, job_id, weight=None, cap=None):
+        """Change a running job's weight and/or cap (cap=0 removes it)"""
+        with self._cond:
+            share = self._shares.get(job_id)
+            if share is None:
+                return False
+            if weight is not None:
+                share.weight = max(float(weight), 0.01)
+            if cap is not None:
+                share.cap = cap or None
+                share.tokens = 0.0
+            self._cond.notify_all()
+            return True
+
+    # ========== JOBS ==========
+    def register(self, job, weight=None, cap=None):
+        with self._cond:
+            self._shares[job.id] = JobShare(job, weight, cap)
+
+    def unregister(self, job):
+        with self._cond:
+            self._shares.pop(job.id, None)
+            self._cond.notify_all()
+
+    def shares(self):
+        """Per-job weight, cap and bytes consumed"""
+        with self._cond:
+            return {job_id: {'weight': s.weight, 'cap': s.cap, 'consumed': s.consumed,
+                             'waiting': s.waiting}
+                    for job_id, s in self._shares.items()}
+
+    def transferred(self, job, key, downloaded, total=0):
+        """
+        Account for progress reported by yt-dlp (cumulative per file) and
+        block until the job may continue. Raises JobCancelled if the job is
+        cancelled while waiting.
+        """
+        share = self._shares.get(job.id)
+        if share is None:
+            return
+        previous = share.positions.get(key, 0)
+        share.positions[key] = downloaded
+        amount = downloaded - previous if downloaded >= previous else downloaded
+        if total:
+            share.totals[key] = total
+        if amount <= 0:
+            return
+        share.consumed += amount
+        if self.rate is None and share.cap is None:
+            return
+        self._wait_cap(share, amount)
+        self._wait_global(share, amount)
+
+    # ========== INTERNALS ==========
+    def _burst(self):
+        return (self.rate or 0) * BURST_SECONDS
+
+    def _refill(self, now):
+        if self.rate:
+            self._tokens = min(self._tokens + (now - self._refilled) * self.rate, self._burst())
+        self._refilled = now
+
+    def _wait_cap(self, share, amount):
+        with self._cond:
+            share.refill_cap(time.monotonic())
+            if share.cap is None:
+                return
+            share.tokens -= amount
+            while share.cap is not None and share.tokens < 0:
+                if share.job.cancelled:
+                    raise JobCancelled()
+                self._cond.wait(min(-share.tokens / share.cap, MAX_WAIT))
+                share.refill_cap(time.monotonic())
+
+    def _next(self):
+        """Waiting share that the policy serves next"""
+        waiting = [s for s in self._shares.values() if s.waiting]
+        if not waiting:
+            return None
+        if self.policy == FIFO:
+            return min(waiting, key=lambda s: s.job.id)
+        if self.policy == SMALLEST:
+            return min(waiting, key=lambda s: (s.remaining, s.job.id))
+        return min(waiting, key=lambda s: (s.consumed / s.weight, s.job.id))
+
+    def _wait_global(self, share, amount):
+        with self._cond:
+            share.waiting = True
+            try:
+                while True:
+                    if self.rate is None:
+                        return
+                    self._refill(time.monotonic())
+                    if self._tokens > 0 and self._next() is share:
+                        self._tokens -= amount
+                        return
+                    if share.job.cancelled:
+                        raise JobCancelled()
+                    deficit = -self._tokens if self._tokens <= 0 else 0
+                    self._cond.wait(min(max(deficit / self.rate, 0.005), MAX_WAIT))
+            finally:
+                share.waiting = False
+                self._cond.notify_all()
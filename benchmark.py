@@ -0,0 +1,419 @@
+"""
+SnapVid - Benchmark
+Drives the download engine against a local HTTP stand-in serving synthetic
+media, and writes the measurements as JSON for comparison between runs.
+
+    python benchmark.py
+    python benchmark.py --size-mb 50 --bandwidth-mbps 20 --jobs 1 4 16 -o bench.json
+    python benchmark.py --baseline bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yt_dlp
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from download_queue import RUNNING, DONE
+from engine import DownloadEngine
+from ui_events import UIEventChannel, FRAME_RATE
+
+# Bytes written per socket send by the stand-in server
+CHUNK_SIZE = 64 * 1024
+# Seconds between RSS samples
+RSS_INTERVAL = 0.05
+
+# Metrics compared against a baseline: (path, higher is better)
+COMPARED_METRICS = (
+    (('throughput_mbps',), True),
+    (('ttfb', 'mean'), False),
+    (('extraction', 'mean'), False),
+    (('progress', 'hook_us'), False),
+    (('progress', 'drain_us'), False),
+    (('peak_rss_mb',), False),
+)
+
+
+# ========== SYNTHETIC MEDIA SERVER ==========
+class MediaHandler(BaseHTTPRequestHandler):
+    """Serves /media/<name>.mp4 as `size` bytes with Range support and throttling"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def byte_range(self, size):
+        header = self.headers.get('Range')
+        if not header or not header.startswith('bytes='):
+            return 0, size - 1, False
+        start, _, end = header[6:].split(',')[0].partition('-')
+        start = int(start) if start else 0
+        end = min(int(end), size - 1) if end else size - 1
+        return start, end, True
+
+    def send_headers(self):
+        size = self.server.media_size
+        if not self.path.startswith('/media/'):
+            self.send_error(404)
+            return None
+        start, end, partial = self.byte_range(size)
+        if start >= size:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(206 if partial else 200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        if partial:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        return start, end
+
+    def do_HEAD(self):
+        self.send_headers()
+
+    def do_GET(self):
+        span = self.send_headers()
+        if span is None:
+            return
+        start, end = span
+        block = self.server.block
+        bandwidth = self.server.bandwidth
+        began = time.monotonic()
+        sent = 0
+        offset = start
+        try:
+            while offset <= end:
+                length = min(CHUNK_SIZE, end - offset + 1)
+                pos = offset % len(block)
+                chunk = (block[pos:] + block)[:length]
+                self.wfile.write(chunk)
+                offset += length
+                sent += length
+                if bandwidth:
+                    # Per-connection cap, like a CDN edge throttling each stream
+                    ahead = sent / bandwidth - (time.monotonic() - began)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class MediaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, size, bandwidth=0, latency=0):
+        super().__init__(('127.0.0.1', 0), MediaHandler)
+        self.media_size = size
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.block = os.urandom(1024 * 1024)
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+# ========== MEASUREMENT ==========
+def current_rss():
+    """Resident set size in bytes (Linux /proc), or None elsewhere"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def max_rss():
+    """Lifetime peak RSS in bytes (ru_maxrss is kilobytes on Linux, bytes on macOS)"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def summarize(values):
+    if not values:
+        return {'mean': None, 'p50': None, 'p95': None, 'max': None}
+    ordered = sorted(values)
+    return {
+        'mean': round(statistics.fmean(ordered), 4),
+        'p50': round(ordered[len(ordered) // 2], 4),
+        'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        'max': round(ordered[-1], 4),
+    }
+
+
+class RunProbe:
+    """
+    Engine callbacks and wrappers that timestamp one benchmark run. The
+    progress path mirrors the Tk app: each record is posted to a
+    UIEventChannel and a pump thread drains it at FRAME_RATE.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.lock = threading.Lock()
+        self.started = {}
+        self.first_byte = {}
+        self.extraction = []
+        self.hook_calls = 0
+        self.hook_time = 0.0
+        self.posted = 0
+        self.drained = 0
+        self.drain_time = 0.0
+        self.frames = 0
+        self.peak_rss = current_rss() or 0
+        self.events = UIEventChannel()
+        self._stop = threading.Event()
+
+        extract = engine.extract
+        progress_hook = engine.progress_hook
+
+        def timed_extract(ydl, job):
+            t = time.perf_counter()
+            try:
+                return extract(ydl, job)
+            finally:
+                with self.lock:
+                    self.extraction.append(time.perf_counter() - t)
+
+        def timed_hook(d, job):
+            t = time.perf_counter()
+            try:
+                progress_hook(d, job)
+            finally:
+                elapsed = time.perf_counter() - t
+                with self.lock:
+                    self.hook_calls += 1
+                    self.hook_time += elapsed
+
+        engine.extract = timed_extract
+        engine.progress_hook = timed_hook
+        engine.on_progress = self.on_progress
+        engine.on_job_change = self.on_job_change
+
+    def on_job_change(self, job):
+        if job.state == RUNNING:
+            self.started[job.id] = time.perf_counter()
+
+    def on_progress(self, job, record):
+        if record['downloaded'] and job.id not in self.first_byte:
+            self.first_byte[job.id] = time.perf_counter()
+        self.events.post_progress(job.id, (record['percent'], record['speed']))
+        self.posted += 1
+
+    def _pump(self):
+        while not self._stop.wait(1 / FRAME_RATE):
+            t = time.perf_counter()
+            self.drained += len(self.events.drain())
+            self.drain_time += time.perf_counter() - t
+            self.frames += 1
+            rss = current_rss()
+            if rss and rss > self.peak_rss:
+                self.peak_rss = rss
+
+    def _sample(self):
+        while not self._stop.wait(RSS_INTERVAL):
+            rss = current_rss()
+            if rss and rss > self.peak_rss:
+                self.peak_rss = rss
+
+    def start(self):
+        for target in (self._pump, self._sample):
+            threading.Thread(target=target, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        self.drained += len(self.events.drain())
+
+    def ttfb(self):
+        return [self.first_byte[i] - self.started[i] for i in self.first_byte if i in self.started]
+
+
+def run_level(server, concurrency, args, run_id):
+    """Download `concurrency` distinct items with as many workers; returns a result dict"""
+    def on_log(message, job):
+        print(message, file=sys.stderr, flush=True)
+
+    with tempfile.TemporaryDirectory(prefix='snapvid-bench-') as output:
+        engine = DownloadEngine(output, workers=concurrency, fragments=args.fragments,
+                                connections=args.connections, cache=False, archive=False, journal=False,
+                                on_log=on_log if args.verbose else None)
+        probe = RunProbe(engine)
+        probe.start()
+        for i in range(concurrency):
+            engine.submit(f"{server.base_url}/media/{run_id}-{concurrency}-{i}.mp4",
+                          "Best Quality", "MP4", bulk=False)
+        began = time.perf_counter()
+        engine.start()
+        engine.wait()
+        wall = time.perf_counter() - began
+        probe.stop()
+        engine.close()
+
+        jobs = engine.jobs()
+        done = [j for j in jobs if j.state == DONE]
+        downloaded = sum(os.path.getsize(os.path.join(root, name))
+                         for root, _, files in os.walk(output) for name in files)
+
+    return {
+        'concurrency': concurrency,
+        'jobs': len(jobs),
+        'done': len(done),
+        'failed': len(jobs) - len(done),
+        'wall_seconds': round(wall, 4),
+        'bytes': downloaded,
+        'throughput_mbps': round(downloaded * 8 / wall / 1e6, 3) if wall else None,
+        'ttfb': summarize(probe.ttfb()),
+        'extraction': summarize(probe.extraction),
+        'progress': {
+            'hook_calls': probe.hook_calls,
+            'hook_us': round(probe.hook_time / probe.hook_calls * 1e6, 2) if probe.hook_calls else None,
+            'hook_share': round(probe.hook_time / (wall * concurrency), 5) if wall else None,
+            'posted': probe.posted,
+            'drawn': probe.drained,
+            'frames': probe.frames,
+            'drain_us': round(probe.drain_time / probe.frames * 1e6, 2) if probe.frames else None,
+        },
+        'peak_rss_mb': round((probe.peak_rss or max_rss()) / (1024 * 1024), 1),
+    }
+
+
+# ========== REPORTING ==========
+def lookup(run, path):
+    value = run
+    for key in path:
+        value = (value or {}).get(key)
+    return value
+
+
+def compare(report, baseline):
+    """Percent change per metric against a previous report, matched by concurrency"""
+    previous = {run['concurrency']: run for run in baseline.get('runs', [])}
+    changes = []
+    for run in report['runs']:
+        old = previous.get(run['concurrency'])
+        if old is None:
+            continue
+        for path, higher_better in COMPARED_METRICS:
+            new_value, old_value = lookup(run, path), lookup(old, path)
+            if not new_value or not old_value:
+                continue
+            delta = (new_value - old_value) / old_value * 100
+            changes.append({
+                'concurrency': run['concurrency'],
+                'metric': '.'.join(path),
+                'baseline': old_value,
+                'value': new_value,
+                'change_pct': round(delta, 2),
+                'regression': delta < 0 if higher_better else delta > 0,
+            })
+    return changes
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='benchmark',
+                                     description='SnapVid download benchmark')
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 4, 16],
+                        help='concurrency levels to run (default: 1 4 16)')
+    parser.add_argument('--size-mb', type=float, default=8,
+                        help='synthetic media size per item')
+    parser.add_argument('--bandwidth-mbps', type=float, default=0,
+                        help='per-connection server cap in megabits/s (0 = unlimited)')
+    parser.add_argument('--latency-ms', type=float, default=0,
+                        help='server delay before each response')
+    parser.add_argument('--fragments', type=int, default=None,
+                        help='parallel fragment downloads passed to the engine')
+    parser.add_argument('--connections', type=int, default=None,
+                        help='parallel range requests per file (1 = single stream)')
+    parser.add_argument('-o', '--output', default=None,
+                        help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', metavar='FILE',
+                        help='earlier report to compare against')
+    parser.add_argument('--verbose', action='store_true',
+                        help='print the engine console log to stderr')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    size = int(args.size_mb * 1024 * 1024)
+    server = MediaServer(size, bandwidth=args.bandwidth_mbps * 1e6 / 8,
+                         latency=args.latency_ms / 1000).start()
+    run_id = datetime.now().strftime('%H%M%S')
+
+    runs = []
+    try:
+        for concurrency in args.jobs:
+            print(f"⏱️  {concurrency} concurrent job(s)...", file=sys.stderr, flush=True)
+            run = run_level(server, concurrency, args, run_id)
+            print(f"   {run['throughput_mbps']} Mbit/s • TTFB {run['ttfb']['mean']}s • "
+                  f"extract {run['extraction']['mean']}s • {run['peak_rss_mb']} MB RSS",
+                  file=sys.stderr, flush=True)
+            runs.append(run)
+    finally:
+        server.stop()
+
+    report = {
+        'time': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'yt_dlp': yt_dlp.version.__version__,
+        'cpus': os.cpu_count(),
+        'config': {
+            'size_bytes': size,
+            'bandwidth_mbps': args.bandwidth_mbps,
+            'latency_ms': args.latency_ms,
+            'fragments': args.fragments,
+            'connections': args.connections,
+        },
+        'runs': runs,
+    }
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report['comparison'] = compare(report, json.load(f))
+        regressions = [c for c in report['comparison'] if c['regression']]
+        for change in regressions:
+            print(f"⚠️  {change['metric']} @ {change['concurrency']}: {change['change_pct']:+.1f}%",
+                  file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if any(run['failed'] for run in runs) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
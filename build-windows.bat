@@ -67,6 +67,12 @@ if exist assets\icon.ico (
     echo Warning: icon.ico not found
     set ICON_ARG=
 )
+REM One-file builds unpack before Python starts - show the logo meanwhile
+if exist assets\logo.png (
+    set SPLASH_ARG=--splash=assets\logo.png
+) else (
+    set SPLASH_ARG=
+)
 echo.
 
 REM ========== BUILD EXE ==========
@@ -79,6 +85,7 @@ pyinstaller ^
     --noconfirm ^
     --clean ^
     %ICON_ARG% ^
+    %SPLASH_ARG% ^
     --add-binary="%FFMPEG_PATH%;." ^
     --add-binary="%FFPROBE_PATH%;." ^
     --add-data="assets;assets" ^
@@ -0,0 +1,122 @@
+"""
+SnapVid - Bulk Mode
+Playlist/channel expansion and aggregate progress for fanned-out jobs
+"""
+
+import itertools
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+from download_queue import DONE, FAILED, CANCELLED
+
+# URL paths that always point at a collection of videos
+BULK_PATH_MARKERS = ('/playlist', '/channel/', '/c/', '/user/', '/@')
+
+
+def is_bulk_url(url):
+    """Cheap check for playlist/channel URLs - no network"""
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return False
+    if 'list' in parse_qs(parsed.query):
+        return True
+    return any(marker in parsed.path for marker in BULK_PATH_MARKERS)
+
+
+def flat_entries(info):
+    """
+    Yield (url, entry) for every entry of a flat-extracted playlist.
+    Nested playlists (channel tabs) are yielded as URLs too and get
+    expanded again by the engine.
+    """
+    for entry in info.get('entries') or []:
+        if not entry:
+            continue
+        url = entry.get('url') or entry.get('webpage_url')
+        if not url:
+            continue
+        yield url, entry
+
+
+class Batch:
+    """Aggregate state for all jobs expanded from one playlist/channel"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, url, title=None, subscription=None):
+        self.id = next(Batch._ids)
+        self.url = url
+        self.title = title or url
+        # Subscription id when a background sync queued the batch
+        self.subscription = subscription
+        self.started = time.monotonic()
+        self.finished = None
+        self.job_ids = set()
+        self.expected = 0
+        self.sealed = False
+        self._bytes = {}
+        self._totals = {}
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def add_job(self, job_id):
+        with self._lock:
+            self.job_ids.add(job_id)
+            self.expected += 1
+
+    def update(self, job_id, downloaded, total):
+        """Record the latest byte counts for one job"""
+        with self._lock:
+            self._bytes[job_id] = downloaded
+            if total:
+                self._totals[job_id] = total
+
+    def seal(self):
+        """No more jobs will be added; returns True if that completes the batch"""
+        with self._lock:
+            self.sealed = True
+            return self._check_complete()
+
+    def finish(self, job_id, state):
+        """Record a terminal job state; returns True when the whole batch is done"""
+        with self._lock:
+            self._states[job_id] = state
+            return self._check_complete()
+
+    def _check_complete(self):
+        # Children may finish while expansion is still adding jobs
+        if self.sealed and self.finished is None and len(self._states) >= self.expected:
+            self.finished = time.monotonic()
+            return True
+        return False
+
+    @property
+    def complete(self):
+        return self.finished is not None
+
+    def snapshot(self):
+        """Aggregate counts, bytes and throughput"""
+        with self._lock:
+            states = list(self._states.values())
+            downloaded = sum(self._bytes.values())
+            total = sum(self._totals.values())
+            end = self.finished or time.monotonic()
+        elapsed = max(end - self.started, 1e-6)
+        finished = len(states)
+        return {
+            'batch': self.id,
+            'title': self.title,
+            'subscription': self.subscription,
+            'jobs': self.expected,
+            'finished': finished,
+            'done': states.count(DONE),
+            'failed': states.count(FAILED),
+            'cancelled': states.count(CANCELLED),
+            'percent': (finished / self.expected * 100) if self.expected else 0,
+            'downloaded': downloaded,
+            'total': total,
+            'throughput': downloaded / elapsed,
+            'elapsed': elapsed,
+        }
@@ -0,0 +1,131 @@
+"""
+SnapVid - Console Log
+Fixed-size in-memory log backing the console view, per-job channels,
+and rotating log files on disk for the full session history
+"""
+
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from datetime import datetime
+
+# ========== SEVERITY ==========
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+LEVEL_NAMES = OrderedDict([
+    ("Debug", DEBUG),
+    ("Info", INFO),
+    ("Warnings", WARNING),
+    ("Errors", ERROR),
+])
+
+# Lines kept in memory for the whole console, and per job
+DEFAULT_CAPACITY = 5000
+JOB_CAPACITY = 500
+# Job channels kept before the oldest is dropped
+MAX_CHANNELS = 200
+
+# Rotating files: size of each and how many old ones are kept
+LOG_FILE_BYTES = 2 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+
+LogLine = namedtuple('LogLine', 'time level job text')
+
+
+def message_level(message):
+    """Severity of a console message from its marker"""
+    if message.startswith('❌') or message.startswith('[ERROR]'):
+        return ERROR
+    if message.startswith('⚠️') or message.startswith('[WARNING]'):
+        return WARNING
+    if message.startswith('[DEBUG]'):
+        return DEBUG
+    return INFO
+
+
+class ConsoleLog:
+    """
+    Thread-safe log store. Memory is bounded by ring buffers (one for the
+    whole console, one per job); every line is also spilled to rotating
+    files through a background listener, so writers never wait on disk.
+    """
+
+    def __init__(self, path=None, capacity=DEFAULT_CAPACITY, job_capacity=JOB_CAPACITY,
+                 max_bytes=LOG_FILE_BYTES, backups=LOG_FILE_BACKUPS):
+        self.path = str(path) if path else None
+        self.job_capacity = job_capacity
+        self._lines = deque(maxlen=capacity)
+        self._channels = OrderedDict()
+        self._lock = threading.Lock()
+        self._logger = None
+        self._listener = None
+        if self.path:
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)-7s %(message)s'))
+            records = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(records, handler)
+            self._listener.start()
+            self._logger = logging.getLogger(f'snapvid.console.{id(self)}')
+            self._logger.propagate = False
+            self._logger.setLevel(DEBUG)
+            self._logger.addHandler(logging.handlers.QueueHandler(records))
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+
+    # ========== WRITES ==========
+    def add(self, message, level=None, job=None):
+        """Store a message; returns the LogLine for the view"""
+        if level is None:
+            level = message_level(message)
+        now = time.time()
+        stamp = datetime.fromtimestamp(now).strftime("%H:%M:%S")
+        line = LogLine(now, level, job, f"[{stamp}] {message}\n")
+        with self._lock:
+            self._lines.append(line)
+            if job is not None:
+                channel = self._channels.get(job)
+                if channel is None:
+                    channel = self._channels[job] = deque(maxlen=self.job_capacity)
+                    if len(self._channels) > MAX_CHANNELS:
+                        self._channels.popitem(last=False)
+                channel.append(line)
+        if self._logger is not None:
+            self._logger.log(level, f"#{job} {message}" if job is not None else message)
+        return line
+
+    def clear(self):
+        """Empty the in-memory view; the files keep the history"""
+        with self._lock:
+            self._lines.clear()
+            self._channels.clear()
+
+    # ========== READS ==========
+    def lines(self, min_level=INFO, job=None, limit=None):
+        """Stored lines at or above min_level, optionally for one job only"""
+        with self._lock:
+            source = self._lines if job is None else self._channels.get(job, ())
+            selected = [line for line in source if line.level >= min_level]
+        if limit is not None:
+            selected = selected[-limit:]
+        return selected
+
+    def channels(self):
+        """Job IDs with a log channel, oldest first"""
+        with self._lock:
+            return list(self._channels)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._lines)
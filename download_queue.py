@@ -0,0 +1,381 @@
+"""
+SnapVid - Download Queue
+Bounded worker pool with priorities, per-job state and de-duplication
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+# ========== JOB STATES ==========
+QUEUED = 'queued'
+RUNNING = 'running'
+PROCESSING = 'processing'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# Lower number runs first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+
+def default_worker_count():
+    """Pick a worker count that leaves CPU room for ffmpeg"""
+    cpus = os.cpu_count() or 2
+    return max(1, min(4, cpus // 2))
+
+
+class Job:
+    """A single download request tracked by the queue"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, url, quality, format_type, priority=PRIORITY_NORMAL, options=None):
+        self.id = next(Job._ids)
+        self.url = url
+        self.quality = quality
+        self.format_type = format_type
+        self.priority = priority
+        self.options = options or {}
+        self.state = QUEUED
+        self.error = None
+        self.result = None
+        self.created = datetime.now()
+        self.started = None
+        self.finished = None
+        self.attempts = 0
+        self.not_before = 0.0
+        self.cancel_event = threading.Event()
+
+    @property
+    def key(self):
+        """De-duplication key - same URL in same quality/format (and clip sections) is one job"""
+        return (self.url, self.quality, self.format_type, self.options.get('sections'))
+
+    def cancel(self):
+        """Request cancellation (checked by the worker between chunks)"""
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def __repr__(self):
+        return f"<Job #{self.id} {self.state} {self.url}>"
+
+
+class JobCancelled(Exception):
+    """Raised from inside a job when cancellation was requested"""
+
+
+class JobRetry(Exception):
+    """Raised by a runner to put the job back in the queue after `delay` seconds"""
+
+    def __init__(self, delay=0.0, error=None):
+        super().__init__(str(error) if error else "retry")
+        self.delay = delay
+        self.error = error
+
+
+class DownloadQueue:
+    """
+    Priority queue drained by a fixed number of worker threads.
+
+    `runner(job)` does the actual work and returns a result; exceptions mark
+    the job failed. A runner may instead return a Future for work handed to
+    another stage: the job moves to PROCESSING, the worker slot is freed and
+    the job finishes when the future does. Raising JobRetry re-queues the job
+    without holding a worker while it waits. `on_change(job)` is called on
+    every state transition. `gate(job)` (optional) returns how many seconds
+    the job about to be dequeued must still wait - 0 lets it run.
+    """
+
+    def __init__(self, runner, workers=None, on_change=None, gate=None):
+        self.runner = runner
+        self.on_change = on_change
+        self.gate = gate
+        self.workers = workers or default_worker_count()
+
+        self._heap = []
+        self._seq = itertools.count()
+        self._jobs = {}
+        self._active = {}
+        self._running_urls = set()
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._threads = []
+        self._stopping = False
+        self._cancel_pending = False
+
+    # ========== LIFECYCLE ==========
+    def start(self):
+        """Spawn the worker threads"""
+        with self._lock:
+            self._stopping = False
+            self._cancel_pending = False
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._worker,
+                                          name=f"snapvid-worker-{len(self._threads) + 1}",
+                                          daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def stop(self, cancel_pending=True, wait=False):
+        """Stop workers; optionally cancel everything still queued"""
+        cancelled = []
+        with self._lock:
+            self._stopping = True
+            self._cancel_pending = cancel_pending
+            if cancel_pending:
+                # Finished like cancel() does, so wait() returns and the URLs can be queued again
+                cancelled = [job for _, _, job in self._heap if job.state == QUEUED]
+                for job in cancelled:
+                    job.cancel()
+                    self._finish(job, CANCELLED)
+                self._heap = [entry for entry in self._heap if entry[2].state == QUEUED]
+                heapq.heapify(self._heap)
+            self._cond.notify_all()
+            threads = list(self._threads)
+        for job in cancelled:
+            self._notify(job)
+        if wait:
+            for thread in threads:
+                thread.join()
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+
+    def set_workers(self, count):
+        """Grow the pool at runtime (shrinking happens as workers go idle)"""
+        with self._lock:
+            self.workers = max(1, int(count))
+            self._cond.notify_all()
+        self.start()
+
+    # ========== SUBMISSION ==========
+    def submit(self, url, quality, format_type, priority=PRIORITY_NORMAL, options=None):
+        """
+        Queue a download. Returns (job, created) - when an identical job is
+        already queued or running the existing job is returned instead.
+        """
+        job = Job(url, quality, format_type, priority, options)
+        with self._lock:
+            existing = self._active.get(job.key)
+            if existing is not None:
+                return existing, False
+            self._active[job.key] = job
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (job.priority, next(self._seq), job))
+            self._cond.notify()
+        self._notify(job)
+        return job, True
+
+    def submit_many(self, requests):
+        """
+        Queue (url, quality, format_type, priority, options) tuples under one
+        lock acquisition. Returns a list of (job, created) in input order.
+        """
+        results = []
+        with self._lock:
+            for url, quality, format_type, priority, options in requests:
+                job = Job(url, quality, format_type, priority, options)
+                existing = self._active.get(job.key)
+                if existing is not None:
+                    results.append((existing, False))
+                    continue
+                self._active[job.key] = job
+                self._jobs[job.id] = job
+                heapq.heappush(self._heap, (job.priority, next(self._seq), job))
+                results.append((job, True))
+            self._cond.notify_all()
+        for job, created in results:
+            if created:
+                self._notify(job)
+        return results
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            job.cancel()
+            if job.state == QUEUED:
+                self._finish(job, CANCELLED)
+        self._notify(job)
+        return True
+
+    # ========== INSPECTION ==========
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Snapshot of all known jobs in submission order"""
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.id)
+
+    def counts(self):
+        """Number of jobs in each state"""
+        counts = {QUEUED: 0, RUNNING: 0, PROCESSING: 0, DONE: 0, FAILED: 0, CANCELLED: 0}
+        for job in self.jobs():
+            counts[job.state] += 1
+        return counts
+
+    def upcoming(self, limit):
+        """The next `limit` queued jobs in run order, left in the queue"""
+        with self._lock:
+            queued = [entry for entry in self._heap if entry[2].state == QUEUED]
+            return [entry[2] for entry in heapq.nsmallest(limit, queued)]
+
+    def pending(self):
+        """Jobs that are queued or running"""
+        with self._lock:
+            return len(self._active)
+
+    def wait(self, timeout=None):
+        """Block until no job is queued or running"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._active, timeout)
+
+    # ========== INTERNALS ==========
+    def _finish(self, job, state):
+        """Record a terminal state - caller holds the lock"""
+        # A requeued job waiting for its retry holds no claim on its URL
+        if job.state in (RUNNING, PROCESSING):
+            self._running_urls.discard(job.url)
+        job.state = state
+        job.finished = datetime.now()
+        if self._active.get(job.key) is job:
+            del self._active[job.key]
+        self._cond.notify_all()
+
+    def _notify(self, job):
+        if self.on_change:
+            try:
+                self.on_change(job)
+            except Exception as e:
+                print(f"Queue callback error: {e}")
+
+    def _next_job(self):
+        """Pop the next runnable job, or None when the worker should exit"""
+        with self._cond:
+            while True:
+                if self._stopping:
+                    return None
+                me = threading.current_thread()
+                if me in self._threads and self._threads.index(me) >= self.workers:
+                    # Pool was shrunk - retire this worker
+                    self._threads.remove(me)
+                    return None
+                job, wait = self._pop_runnable()
+                if job is not None:
+                    job.state = RUNNING
+                    job.started = datetime.now()
+                    self._running_urls.add(job.url)
+                    return job
+                self._cond.wait(wait)
+
+    def _pop_runnable(self):
+        """
+        Pop the best queued job whose URL is not already running - two
+        formats of one video share an output name, so they never overlap.
+        Jobs backing off or held by the gate are skipped. Returns (job, wait)
+        where wait is the time until a skipped job is due (None if none).
+        Caller holds the lock.
+        """
+        deferred = []
+        job = None
+        wait = None
+        now = time.monotonic()
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            candidate = entry[2]
+            if candidate.state != QUEUED:
+                continue
+            if candidate.url in self._running_urls:
+                deferred.append(entry)
+                continue
+            delay = candidate.not_before - now
+            if delay <= 0 and self.gate is not None:
+                delay = self.gate(candidate)
+            if delay > 0:
+                deferred.append(entry)
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            job = candidate
+            break
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+        return job, wait
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._notify(job)
+            try:
+                if job.cancelled:
+                    raise JobCancelled()
+                result = self.runner(job)
+                if isinstance(result, Future):
+                    with self._lock:
+                        job.state = PROCESSING
+                    self._notify(job)
+                    result.add_done_callback(lambda f, job=job: self._complete(job, f))
+                    continue
+                job.result = result
+                state = DONE
+            except JobCancelled:
+                state = CANCELLED
+            except JobRetry as retry:
+                if job.cancelled:
+                    state = CANCELLED
+                else:
+                    self._requeue(job, retry)
+                    continue
+            except Exception as e:
+                job.error = e
+                state = CANCELLED if job.cancelled else FAILED
+            with self._lock:
+                self._finish(job, state)
+            self._notify(job)
+
+    def _requeue(self, job, retry):
+        """Put a job back in the queue to run again after retry.delay"""
+        with self._lock:
+            job.attempts += 1
+            job.error = retry.error
+            if self._stopping and self._cancel_pending:
+                # stop() has already cancelled the queue - nothing would run the job again
+                job.cancel()
+                self._finish(job, CANCELLED)
+            else:
+                self._running_urls.discard(job.url)
+                job.state = QUEUED
+                job.not_before = time.monotonic() + max(retry.delay, 0)
+                heapq.heappush(self._heap, (job.priority, next(self._seq), job))
+                self._cond.notify_all()
+        self._notify(job)
+
+    def _complete(self, job, future):
+        """Finish a job whose runner handed work to another stage"""
+        try:
+            job.result = future.result()
+            state = DONE
+        except JobCancelled:
+            state = CANCELLED
+        except Exception as e:
+            job.error = e
+            state = CANCELLED if job.cancelled else FAILED
+        with self._lock:
+            self._finish(job, state)
+        self._notify(job)
@@ -0,0 +1,1416 @@
+"""
+SnapVid - Download Engine
+UI-independent download pipeline shared by the Tk app and the CLI
+"""
+
+import copy
+import os
+import sys
+import shutil
+import time
+import uuid
+from pathlib import Path
+from datetime import datetime
+
+from bulk import Batch, is_bulk_url, flat_entries
+from ingest import normalize
+from format_selector import (AUDIO_CODECS, AUDIO_FORMATS, QUALITY_HEIGHTS, audio_container,
+                             codec_family, container_for, select_formats, selection_from_ids,
+                             stream_copyable)
+from info_cache import InfoCache, cache_key, info_expiry
+from archive import DownloadArchive, archive_id, archive_id_from_key
+from journal import JobJournal
+from history import DownloadHistory
+from postprocess import AUDIO_SETTINGS, MERGE_SETTINGS, PostProcessStage
+from metrics import Metrics
+from bandwidth import BandwidthScheduler, FAIR
+from retry import RetryManager, host_of
+from prefetch import Prefetcher, DEFAULT_DEPTH
+from toolchain import AUDIO_ENCODERS, MERGE_AUDIO, VIDEO_ENCODERS, ToolchainCache, ToolchainError
+from storage import OutputManager, expected_size
+from subscriptions import (DEFAULT_INTERVAL, ENTRY_RETRIES, WATERMARK_SIZE, SubscriptionStore,
+                           SyncScheduler, entry_date, entry_key, is_date_ordered, new_entries)
+from sessions import SessionPool
+from segmented import DEFAULT_CONNECTIONS, session_class
+import sections
+from download_queue import (DownloadQueue, JobCancelled, JobRetry, PRIORITY_NORMAL, PRIORITY_LOW,
+                            RUNNING, PROCESSING, DONE, FAILED, CANCELLED, FINISHED_STATES)
+
+# ========== SSL CERTIFICATE FIX ==========
+_certificates_configured = False
+
+
+def configure_certificates():
+    """Point SSL at certifi's bundle (also inside PyInstaller bundles)"""
+    import certifi
+
+    # Set SSL certificate paths globally
+    cert_path = certifi.where()
+    os.environ['SSL_CERT_FILE'] = cert_path
+    os.environ['REQUESTS_CA_BUNDLE'] = cert_path
+
+
+def load_yt_dlp():
+    """
+    The yt_dlp module, imported on first use. It loads hundreds of
+    modules, so nothing imports it at startup; see preload().
+    """
+    global _certificates_configured
+    if not _certificates_configured:
+        configure_certificates()
+        _certificates_configured = True
+    import yt_dlp
+    return yt_dlp
+
+
+# ========== OPTIONS ==========
+QUALITIES = ["Best Quality", "1080p", "720p", "480p", "Audio Only"]
+FORMATS = ["MP4", "WEBM", "MP3", "M4A", "OPUS", "OGG"]
+
+# yt-dlp FFmpegExtractAudio codec per audio container (clips and ffmpeg-less fallbacks)
+YTDLP_AUDIO_CODECS = {'mp3': 'mp3', 'm4a': 'm4a', 'opus': 'opus', 'ogg': 'vorbis'}
+
+# Parallel fragment fetches for DASH/HLS items
+DEFAULT_FRAGMENTS = 4
+
+# How deep channel -> tab -> playlist nesting is followed
+MAX_BULK_DEPTH = 3
+
+# url results followed to reach a subscription's listing
+MAX_REDIRECTS = 3
+
+# Job options of clip jobs, inherited by the entries of a clipped playlist
+CLIP_OPTIONS = ('sections', 'precise_cuts')
+
+
+def preload():
+    """
+    Import yt-dlp and its extractor list. yt-dlp is imported on first use
+    (it loads hundreds of modules), so the app calls this in the
+    background once its window is up.
+    """
+    yt_dlp = load_yt_dlp()
+    from yt_dlp.extractor import gen_extractor_classes
+    gen_extractor_classes()
+    return yt_dlp.version.__version__
+
+
+def default_download_path():
+    """Default output folder (~/Downloads/YouTube)"""
+    return str(Path.home() / "Downloads" / "YouTube")
+
+
+def data_dir():
+    """Folder for SnapVid's own databases (~/.snapvid)"""
+    path = Path.home() / ".snapvid"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+# ========== FFMPEG PATH DETECTION ==========
+def get_ffmpeg_path():
+    """
+    Get ffmpeg path for bundled or system installation
+    Supports PyInstaller bundles and system installations
+    """
+    # Check if running as PyInstaller bundle
+    if getattr(sys, 'frozen', False):
+        # Running in PyInstaller bundle
+        base_path = getattr(sys, '_MEIPASS', os.path.dirname(sys.executable))
+
+        # Check for bundled ffmpeg
+        if sys.platform == 'darwin':  # macOS
+            ffmpeg_path = os.path.join(base_path, 'ffmpeg')
+            ffprobe_path = os.path.join(base_path, 'ffprobe')
+        elif sys.platform == 'win32':  # Windows
+            ffmpeg_path = os.path.join(base_path, 'ffmpeg.exe')
+            ffprobe_path = os.path.join(base_path, 'ffprobe.exe')
+        else:  # Linux
+            ffmpeg_path = os.path.join(base_path, 'ffmpeg')
+            ffprobe_path = os.path.join(base_path, 'ffprobe')
+
+        # Return directory if files exist
+        if os.path.exists(ffmpeg_path) and os.path.exists(ffprobe_path):
+            return base_path
+
+    # Check system PATH
+    system_ffmpeg = shutil.which('ffmpeg')
+    if system_ffmpeg:
+        return os.path.dirname(system_ffmpeg)
+
+    # Not found
+    return None
+
+
+def is_audio_job(quality, format_type):
+    return quality == "Audio Only" or format_type in AUDIO_FORMATS
+
+
+def select_format(quality, format_type, can_merge=True):
+    """
+    Fallback yt-dlp selector for a quality/format choice, used when the
+    format list cannot be ranked (see format_selector.select_formats).
+    Progressive-only selectors would cap YouTube at 720p, so split
+    video+audio is preferred whenever ffmpeg can merge.
+    """
+    if is_audio_job(quality, format_type):
+        # Streams that only need a remux first
+        codecs = AUDIO_CODECS[audio_container(quality, format_type)]
+        return ''.join(f"bestaudio[acodec^={codec}]/" for codec in codecs) + "bestaudio/best"
+    height = QUALITY_HEIGHTS.get(quality)
+    limit = f"[height<={height}]" if height else ""
+    if can_merge:
+        return f"bestvideo{limit}+bestaudio/best{limit}"
+    return f"best{limit}"
+
+
+# Console Logger Class
+class ConsoleLogger:
+    """yt-dlp logger that forwards messages to a log callable"""
+
+    def __init__(self, log):
+        self.log = log
+
+    def debug(self, msg):
+        if msg.startswith('[debug] '):
+            return
+        self.log(f"[DEBUG] {msg}")
+
+    def info(self, msg):
+        self.log(msg)
+
+    def warning(self, msg):
+        self.log(f"⚠️ {msg}")
+
+    def error(self, msg):
+        self.log(f"❌ {msg}")
+
+
+class DownloadEngine:
+    """
+    Queue-backed download engine with a plain callback API.
+
+    Callbacks may fire on worker threads:
+      on_log(message, job)      - console lines (job is None for engine messages)
+      on_progress(job, record)  - normalized progress dicts, see progress_hook()
+      on_job_change(job)        - queue state transitions; job.result is set when done
+      on_batch_done(batch)      - every job of a playlist or imported list has finished
+
+    With ffmpeg available, merges and MP3 conversions run on a separate
+    PostProcessStage: the download worker hands the raw files over and
+    picks up the next job while the item sits in the PROCESSING state.
+    """
+
+    def __init__(self, download_path=None, workers=None, ffmpeg_path=None,
+                 fragments=None, connections=None, cache=True, archive=True, journal=True, history=True,
+                 subscriptions=True, schedule=False, postprocess_workers=None, metrics=True, rate_limit=None,
+                 bandwidth_policy=FAIR, retry=True, prefetch=None, toolchain=True, storage=None,
+                 sessions=True, on_log=None, on_progress=None, on_job_change=None, on_batch_done=None):
+        self.download_path = download_path or default_download_path()
+        self.ffmpeg_path = ffmpeg_path or get_ffmpeg_path()
+        # Probed ffmpeg capabilities, cached in ~/.snapvid/toolchain.json (False skips the checks)
+        if toolchain is True:
+            toolchain = ToolchainCache(data_dir() / "toolchain.json")
+        self.toolchains = toolchain if toolchain is not False else None
+        self.fragments = fragments or DEFAULT_FRAGMENTS
+        # 1 leaves progressive downloads to yt-dlp's single-stream HttpFD
+        self.connections = connections or DEFAULT_CONNECTIONS
+        # Scratch directory, free-space admission and final renames
+        self.storage = storage or OutputManager()
+        # Warm YoutubeDL instances reused across jobs (False builds one per job)
+        if sessions is True:
+            sessions = SessionPool(self.new_session)
+        self.sessions = sessions if sessions is not False else None
+        # cache=True uses ~/.snapvid/info_cache.sqlite, False disables it
+        if cache is True:
+            cache = InfoCache(data_dir() / "info_cache.sqlite")
+        self.cache = cache if cache is not False else None
+        # Same convention for the download archive (~/.snapvid/archive.sqlite)
+        if archive is True:
+            archive = DownloadArchive(data_dir() / "archive.sqlite")
+        self.archive = archive if archive is not False else None
+        # ... and the job journal (~/.snapvid/journal.sqlite)
+        if journal is True:
+            journal = JobJournal(data_dir() / "journal.sqlite")
+        self.journal = journal if journal is not False else None
+        # ... and the download history (~/.snapvid/history.sqlite)
+        if history is True:
+            history = DownloadHistory(data_dir() / "history.sqlite")
+        self.history = history if history is not False else None
+        # ... and subscribed channels/playlists (~/.snapvid/subscriptions.sqlite);
+        # schedule=True syncs the due ones in the background once started
+        if subscriptions is True:
+            subscriptions = SubscriptionStore(data_dir() / "subscriptions.sqlite")
+        self.subscriptions = subscriptions if subscriptions is not False else None
+        self.scheduler = None
+        if schedule and self.subscriptions is not None:
+            self.scheduler = SyncScheduler(self.sync_due)
+        # ... and per-job metrics (in memory; pass Metrics(path) to export JSON lines)
+        if metrics is True:
+            metrics = Metrics()
+        self.metrics = metrics if metrics is not False else None
+        # Global/per-job bandwidth limits (bytes/s), adjustable while running
+        self.bandwidth = BandwidthScheduler(rate_limit, bandwidth_policy)
+        # Failure classification, backoff and per-host circuit breaker
+        if retry is True:
+            retry = RetryManager()
+        self.retry = retry if retry is not False else None
+        self.on_log = on_log
+        self.on_progress = on_progress
+        self.on_job_change = on_job_change
+        self.on_batch_done = on_batch_done
+        self.batches = {}
+        # Jobs queued outside a sync that a sync also wanted: job id -> subscription id
+        self.sync_entries = {}
+        self.stopping = False
+        self.postprocessor = None
+        if self.ffmpeg_path:
+            self.postprocessor = PostProcessStage(self.ffmpeg_path, postprocess_workers,
+                                                  on_log=self.log, on_task=self._postprocessed)
+        self.queue = DownloadQueue(self.run_job, workers=workers,
+                                   on_change=self._job_changed,
+                                   gate=self.retry.gate if self.retry is not None else None)
+        # Extraction for the next `prefetch` queued jobs runs ahead of the workers (0 disables)
+        self.prefetcher = Prefetcher(self.prefetch_job, self.queue.upcoming,
+                                     DEFAULT_DEPTH if prefetch is None else prefetch,
+                                     skip=self.skip_prefetch)
+
+    # ========== LIFECYCLE ==========
+    def start(self):
+        if self.postprocessor is not None:
+            self.postprocessor.start()
+        self.queue.start()
+        self.prefetcher.start()
+        if self.scheduler is not None:
+            self.scheduler.start()
+
+    def stop(self, wait=False):
+        # Queued jobs cancelled by the shutdown stay journaled for resume_pending()
+        self.stopping = True
+        if self.scheduler is not None:
+            self.scheduler.stop(wait=wait)
+        self.queue.stop(wait=wait)
+        self.prefetcher.stop(wait=wait)
+        if self.postprocessor is not None:
+            self.postprocessor.stop(wait=wait)
+
+    def close(self):
+        """
+        Stop workers and release the on-disk stores and pooled sessions.
+        Running jobs are interrupted rather than waited for; like queued
+        ones they stay journaled and resume from their .part files.
+        """
+        self.stopping = True
+        for job in self.queue.jobs():
+            if job.state in (RUNNING, PROCESSING):
+                job.cancel()
+        self.stop(wait=True)
+        if self.sessions is not None:
+            self.sessions.close()
+        if self.cache is not None:
+            self.cache.close()
+        if self.archive is not None:
+            self.archive.close()
+        if self.journal is not None:
+            self.journal.close()
+        if self.history is not None:
+            self.history.close()
+        if self.subscriptions is not None:
+            self.subscriptions.close()
+
+    @property
+    def workers(self):
+        return self.queue.workers
+
+    def set_workers(self, count):
+        self.queue.set_workers(count)
+
+    def set_rate_limit(self, rate):
+        """Global bandwidth cap in bytes/s; None lifts it"""
+        self.bandwidth.set_rate(rate)
+
+    def set_job_limit(self, job_id, weight=None, cap=None):
+        """Re-weight or cap one job; queued jobs keep it in their options"""
+        job = self.queue.get(job_id)
+        if job is None:
+            return False
+        if weight is not None:
+            job.options['weight'] = weight
+        if cap is not None:
+            job.options['rate_limit'] = cap
+        self.bandwidth.set_job(job_id, weight, cap)
+        return True
+
+    def set_bandwidth_policy(self, policy):
+        self.bandwidth.set_policy(policy)
+
+    # ========== JOBS ==========
+    def submit(self, url, quality="Best Quality", format_type="MP4",
+               priority=PRIORITY_NORMAL, bulk=None, **options):
+        """
+        Queue a URL. Returns (job, created) like DownloadQueue.submit.
+        Playlist/channel URLs are expanded into one job per entry unless
+        bulk=False; bulk=None detects them from the URL.
+        """
+        item = normalize(url)
+        url = item.url
+        if bulk is None:
+            bulk = item.bulk
+        if not item.key.startswith('url:'):
+            # Known video ID - saves the extractor scan in job_key()
+            options.setdefault('cache_key', item.key)
+        if options.get('sections'):
+            # Clip job - validated here so a bad spec fails before queueing
+            options['sections'] = sections.parse(options['sections']).spec
+        options.setdefault('path', self.download_path)
+        if bulk:
+            options['bulk'] = True
+        else:
+            options.setdefault('noplaylist', True)
+        return self.enqueue(url, quality, format_type, priority, options)
+
+    def submit_many(self, items, quality="Best Quality", format_type="MP4",
+                    priority=PRIORITY_NORMAL, title=None, bulk=None, **options):
+        """
+        Queue a list of ingest.IngestItem (see ingest.parse) in one pass.
+        Videos already in the archive or the queue are skipped; the rest
+        share one Batch so they report aggregate progress. Playlist and
+        channel URLs are submitted on their own and expand as usual.
+        Returns counts: queued, archived, duplicates, playlists.
+        """
+        force = options.get('force')
+        options.setdefault('path', self.download_path)
+        if options.get('sections'):
+            options['sections'] = sections.parse(options['sections']).spec
+        archived = set()
+        # Clips are cut from archived videos too
+        if self.archive is not None and not force and not options.get('sections'):
+            archived = self.archive.existing(item.archive for item in items if item.archive)
+
+        stats = {'queued': 0, 'archived': 0, 'duplicates': 0, 'playlists': 0, 'batch': None}
+        requests = []
+        for item in items:
+            if item.bulk and bulk is not False:
+                job, created = self.submit(item.url, quality, format_type, priority,
+                                           bulk=True, **options)
+                stats['playlists' if created else 'duplicates'] += 1
+                continue
+            if item.archive in archived:
+                stats['archived'] += 1
+                continue
+            job_options = dict(options, noplaylist=True)
+            if not item.key.startswith('url:'):
+                job_options['cache_key'] = item.key
+            requests.append((item.url, quality, format_type, priority, job_options))
+        if not requests:
+            return stats
+
+        batch = Batch(title or "import", title or f"{len(requests)} imported URL(s)")
+        self.batches[batch.id] = batch
+        for request in requests:
+            request[4]['batch'] = batch.id
+        if self.journal is not None:
+            self.journal.record_many(requests)
+        duplicates = []
+        for request, (job, created) in zip(requests, self.queue.submit_many(requests)):
+            if not created:
+                duplicates.append(request[4].get('journal_id'))
+                continue
+            batch.add_job(job.id)
+            if self.metrics is not None:
+                self.metrics.job_queued(job)
+        if self.journal is not None:
+            self.journal.remove_many(duplicates)
+        stats['queued'] = len(requests) - len(duplicates)
+        stats['duplicates'] += len(duplicates)
+        if not stats['queued']:
+            del self.batches[batch.id]
+            return stats
+        stats['batch'] = batch.id
+        if batch.seal():
+            self._batch_done(batch)
+        return stats
+
+    def enqueue(self, url, quality, format_type, priority, options):
+        """Journal a job, then queue it"""
+        if self.journal is not None:
+            self.journal.record(url, quality, format_type, priority, options)
+        job, created = self.queue.submit(url, quality, format_type, priority, options)
+        if not created and self.journal is not None:
+            self.journal.remove(options['journal_id'])
+        if created and self.metrics is not None:
+            self.metrics.job_queued(job)
+        return job, created
+
+    def resume_pending(self):
+        """
+        Re-queue jobs left unfinished by a quit or crash. The journaled
+        format ID is pinned so yt-dlp continues the existing .part file.
+        """
+        if self.journal is None:
+            return 0
+        resumed = 0
+        for entry in self.journal.pending():
+            job, created = self.enqueue(entry['url'], entry['quality'], entry['format_type'],
+                                        entry['priority'], entry['options'])
+            if not created:
+                continue
+            resumed += 1
+            if entry['part_bytes']:
+                self.log(f"♻️  Resuming job #{job.id} from {entry['part_bytes'] / (1024 * 1024):.1f} MB: {job.url}")
+            else:
+                self.log(f"♻️  Re-queued job #{job.id}: {job.url}")
+        return resumed
+
+    def cancel(self, job_id):
+        return self.queue.cancel(job_id)
+
+    def cancel_all(self):
+        """Cancel every queued and running job, returns how many"""
+        cancelled = 0
+        for job in self.queue.jobs():
+            if job.state not in FINISHED_STATES and self.queue.cancel(job.id):
+                cancelled += 1
+        return cancelled
+
+    def jobs(self):
+        return self.queue.jobs()
+
+    def counts(self):
+        return self.queue.counts()
+
+    def wait(self, timeout=None):
+        return self.queue.wait(timeout)
+
+    # ========== CALLBACKS ==========
+    def log(self, message, job=None):
+        if self.on_log:
+            self.on_log(message, job)
+
+    def _job_changed(self, job):
+        if self.journal is not None:
+            if job.state in FINISHED_STATES and not (self.stopping and job.state == CANCELLED):
+                self.journal.remove(job.options.get('journal_id'))
+            elif job.state == RUNNING:
+                self.journal.set_state(job)
+        if self.metrics is not None:
+            if job.state in FINISHED_STATES:
+                self.metrics.job_finished(job)
+            elif job.state == RUNNING:
+                self.metrics.job_started(job)
+            else:
+                self.metrics.job_state(job)
+        if job.state in FINISHED_STATES:
+            # Drop unused prefetched info (cancelled or skipped jobs)
+            job.options.pop('_prefetch', None)
+            job.options.pop('_selection', None)
+            # Subscriptions waiting on this download: its own and any sync that found it queued
+            wanted = {job.options.get('subscription'), self.sync_entries.pop(job.id, None)}
+            if job.state in (DONE, FAILED):
+                for sub_id in wanted - {None}:
+                    self.entry_finished(job, sub_id)
+        if job.state not in (RUNNING, PROCESSING):
+            self.storage.release(job.id)
+        if job.state != PROCESSING:
+            self.prefetcher.poke()
+        if self.on_job_change:
+            self.on_job_change(job)
+        batch = self.batches.get(job.options.get('batch'))
+        if batch is not None and job.state in FINISHED_STATES:
+            if batch.finish(job.id, job.state):
+                self._batch_done(batch)
+
+    def _postprocessed(self, task):
+        if self.metrics is not None:
+            self.metrics.postprocess(task.job, task.kind, task.queued, task.started,
+                                     task.started + task.elapsed, task.cpu_time)
+
+    def _batch_done(self, batch):
+        stats = batch.snapshot()
+        self.log("="*60)
+        self.log(f"📋 Batch finished: {batch.title}")
+        self.log(f"   {stats['done']} done • {stats['failed']} failed • "
+                 f"{stats['cancelled']} cancelled • {stats['throughput'] / (1024 * 1024):.2f} MB/s avg")
+        self.log("="*60)
+        if self.on_batch_done:
+            self.on_batch_done(batch)
+        # Its jobs are all finished; nothing looks the batch up again
+        self.batches.pop(batch.id, None)
+
+    # ========== TOOLCHAIN ==========
+    def capabilities(self):
+        """Toolchain for the detected ffmpeg (probed on first call), None if not checked"""
+        if self.toolchains is None or not self.ffmpeg_path:
+            return None
+        return self.toolchains.get(self.ffmpeg_path)
+
+    def can_merge(self, job):
+        """ffmpeg is present and can write the job's container"""
+        if not self.ffmpeg_path:
+            return False
+        caps = self.capabilities()
+        return caps is None or caps.can_mux(container_for(job.format_type))
+
+    def check_toolchain(self, job):
+        """Fail before any download when ffmpeg cannot produce the requested file"""
+        if job.options.get('sections') and not self.ffmpeg_path:
+            raise ToolchainError("ffmpeg not found - it is needed to download clips")
+        if not is_audio_job(job.quality, job.format_type):
+            return
+        container = audio_container(job.quality, job.format_type)
+        if not self.ffmpeg_path:
+            raise ToolchainError(f"ffmpeg not found - it is needed to write {container.upper()} audio")
+        caps = self.capabilities()
+        if caps is None:
+            return
+        if not caps.available:
+            raise ToolchainError(f"ffmpeg at {self.ffmpeg_path} does not run")
+        if not caps.can_write_audio(container):
+            raise ToolchainError(f"ffmpeg {caps.version} cannot write {container.upper()} files")
+        # Only MP3 always needs an encoder; the other targets usually remux
+        if container == 'mp3' and not caps.mp3_encoder():
+            raise ToolchainError(f"ffmpeg {caps.version} cannot write MP3 "
+                                 f"(no {'/'.join(AUDIO_ENCODERS['mp3'])} encoder)")
+
+    def audio_plan(self, job, selection):
+        """
+        (encoder, fallback) for an audio job's ffmpeg step: ('copy', None)
+        when the chosen stream fits the target container as it is, the best
+        encoder when it does not, and for streams of unknown codec (generic
+        links) a remux attempt with the encoder as fallback. Raises
+        ToolchainError when a transcode is needed and ffmpeg has no encoder.
+        """
+        container = audio_container(job.quality, job.format_type)
+        caps = self.capabilities()
+        encoder = caps.audio_encoder(container) if caps is not None else AUDIO_SETTINGS[container][0]
+        if selection is None or selection.audio is None:
+            return 'copy', encoder
+        if selection.stream_copy:
+            return 'copy', None
+        if encoder is None:
+            raise ToolchainError(f"ffmpeg {caps.version} cannot encode {container.upper()} "
+                                 f"(no {'/'.join(AUDIO_ENCODERS[container])} encoder)")
+        return encoder, None
+
+    def merge_plan(self, selection):
+        """
+        ((video, audio) encoders, fallback) for merging a split pair: 'copy'
+        for a stream the container takes, the best encoder for one it does
+        not (e.g. H.264 for a WEBM), and for streams of unknown codec a copy
+        attempt with the encoders as fallback. Raises ToolchainError when a
+        conversion is needed and ffmpeg has no encoder for it.
+        """
+        container = selection.container
+        caps = self.capabilities()
+        if caps is not None:
+            available = (caps.video_encoder(container), caps.audio_encoder(MERGE_AUDIO[container]))
+        else:
+            available = MERGE_SETTINGS[container]
+        plan, fallback = [], []
+        for fmt, encoder, video in ((selection.video, available[0], True),
+                                    (selection.audio, available[1], False)):
+            codec = codec_family(fmt.get('vcodec' if video else 'acodec'))
+            if codec is None:
+                # Unknown codec (generic links): try a copy first
+                plan.append('copy')
+                fallback.append(encoder or 'copy')
+            elif stream_copyable(fmt, container, video=video, audio=not video):
+                plan.append('copy')
+                fallback.append('copy')
+            elif encoder is not None:
+                plan.append(encoder)
+                fallback.append(encoder)
+            else:
+                names = VIDEO_ENCODERS[container] if video else AUDIO_ENCODERS[MERGE_AUDIO[container]]
+                raise ToolchainError(f"ffmpeg {caps.version} cannot convert {codec} for "
+                                     f"{container.upper()} (no {'/'.join(names)} encoder)")
+        return tuple(plan), (tuple(fallback) if fallback != plan else None)
+
+    # ========== STORAGE ==========
+    def admit(self, job, info, selection):
+        """Reserve disk space for the chosen formats; raises DiskSpaceError if they do not fit"""
+        size = expected_size(info, selection)
+        clip = self.clip_sections(job)
+        if size and clip is not None:
+            seconds = clip.duration(info)
+            if seconds is not None:
+                size = int(size * seconds / info['duration'])
+        if clip is not None:
+            # yt-dlp cuts and merges in one ffmpeg pass; only MP3 conversion writes a second file
+            processed = is_audio_job(job.quality, job.format_type)
+        else:
+            processed = self.postprocessor is not None and (
+                (selection is not None and selection.merged) or is_audio_job(job.quality, job.format_type))
+        self.storage.admit(job.id, job.options.get('path', self.download_path), size, processed)
+
+    # ========== CLIPS ==========
+    def clip_sections(self, job):
+        """Parsed sections of a clip job, None for whole-video jobs"""
+        spec = job.options.get('sections')
+        return sections.parse(spec) if spec else None
+
+    def clip_options(self, job, ydl_opts):
+        """
+        Point yt-dlp at the requested ranges. ffmpeg reads only the part of
+        each stream around them and stream-copies from the keyframe at or
+        before each start; 'precise_cuts' re-encodes for frame-exact cuts.
+        """
+        clip = self.clip_sections(job)
+        ydl_opts['download_ranges'] = load_yt_dlp().utils.download_range_func(
+            clip.chapter_patterns(), clip.ranges)
+        ydl_opts['force_keyframes_at_cuts'] = bool(job.options.get('precise_cuts'))
+        ydl_opts['outtmpl'] = os.path.join(os.path.dirname(ydl_opts['outtmpl']), sections.CLIP_TEMPLATE)
+
+    def clip_info(self, job, info):
+        """Clip jobs choose among formats ffmpeg can seek into"""
+        if not job.options.get('sections'):
+            return info
+        return sections.seekable(info)
+
+    # ========== SUBSCRIPTIONS ==========
+    def subscribe(self, url, quality="Best Quality", format_type="MP4", interval=None,
+                  path=None, backfill=None):
+        """
+        Follow a channel or playlist: it is synced now and then every
+        `interval` seconds (while the scheduler runs). Returns its id.
+        """
+        sub_id = self.subscriptions.add(normalize(url).url, quality, format_type, path,
+                                        interval or DEFAULT_INTERVAL, backfill)
+        if self.scheduler is not None:
+            self.scheduler.poke()
+        return sub_id
+
+    def unsubscribe(self, key):
+        """Forget a subscription by id or URL; downloaded files stay"""
+        return self.subscriptions.remove(key)
+
+    def sync_due(self):
+        """Queue a sync job for every subscription that is due; returns the new jobs"""
+        if self.subscriptions is None:
+            return []
+        # Background syncs wait behind downloads the user asked for
+        return [job for job in (self.sync_now(sub, PRIORITY_LOW)
+                                for sub in self.subscriptions.claim_due()) if job is not None]
+
+    def sync_now(self, sub, priority=PRIORITY_NORMAL):
+        """Queue a sync of one subscription (dict, id or URL); None if already queued"""
+        if not isinstance(sub, dict):
+            sub = self.subscriptions.get(sub)
+            if sub is None:
+                return None
+        job, created = self.enqueue(sub['url'], sub['quality'], sub['format'], priority,
+                                    {'sync': sub['id'], 'path': sub['path'] or self.download_path})
+        return job if created else None
+
+    def entry_finished(self, job, sub_id):
+        """Track downloads a sync wanted, so failed ones are tried again next time"""
+        if self.subscriptions is None:
+            return
+        if job.state == DONE:
+            self.subscriptions.resolve(sub_id, job.url)
+        elif not self.subscriptions.miss(sub_id, job.url):
+            self.log(f"🔔 Giving up on {job.url} after {ENTRY_RETRIES} syncs", job)
+
+    # ========== SESSIONS ==========
+    def new_session(self, options):
+        """A YoutubeDL that sends progressive HTTP formats to the segmented downloader"""
+        return session_class(load_yt_dlp())(options)
+
+    def session(self, options):
+        """Context manager lending a YoutubeDL configured with `options`"""
+        if self.sessions is None:
+            return self.new_session(options)
+        return self.sessions.session(options)
+
+    # ========== PIPELINE ==========
+    def build_options(self, job):
+        """yt-dlp options for one job"""
+        path = job.options.get('path', self.download_path)
+        fmt = select_format(job.quality, job.format_type, can_merge=self.can_merge(job))
+        if job.options.get('format_id'):
+            # Resumed job - keep the format whose .part is on disk
+            fmt = f"{job.options['format_id']}/{fmt}"
+        ydl_opts = {
+            'format': fmt,
+            'outtmpl': os.path.join(self.work_dir(job), '%(title)s.%(ext)s'),
+            'progress_hooks': [lambda d: self.progress_hook(d, job)],
+            'quiet': False,
+            'no_warnings': False,
+            'logger': ConsoleLogger(lambda msg: self.log(msg, job)),
+            # Progress goes through progress_hooks; yt-dlp's own per-tick
+            # "[download] x%" lines would only flood the console
+            'noprogress': True,
+            'progress_with_newline': False,
+            'concurrent_fragment_downloads': self.fragments,
+            'segment_connections': self.connections,
+            'merge_output_format': container_for(job.format_type),
+            'noplaylist': job.options.get('noplaylist', False),
+        }
+
+        # Add ffmpeg location if available
+        if self.ffmpeg_path:
+            ydl_opts['ffmpeg_location'] = self.ffmpeg_path
+
+        if job.options.get('sections'):
+            self.clip_options(job, ydl_opts)
+
+        # Audio conversion (the post-processing stage does it when available;
+        # clips are cut and converted by yt-dlp in the same job)
+        if is_audio_job(job.quality, job.format_type) and (
+                self.postprocessor is None or job.options.get('sections')):
+            if not self.ffmpeg_path:
+                self.log("⚠️  Warning: ffmpeg not found, audio conversion may fail", job)
+
+            # FFmpegExtractAudio copies streams already in the target codec
+            container = audio_container(job.quality, job.format_type)
+            ydl_opts['postprocessors'] = [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': YTDLP_AUDIO_CODECS[container],
+                'preferredquality': AUDIO_SETTINGS[container][1],
+            }]
+        return ydl_opts
+
+    def run_job(self, job):
+        """
+        Queue worker entry point; returns a result dict or raises. Failures
+        worth retrying are re-raised as JobRetry so the queue backs off.
+        """
+        self.bandwidth.register(job, job.options.get('weight'), job.options.get('rate_limit'))
+        try:
+            if job.options.get('sync'):
+                result = self.sync_job(job)
+            elif job.options.get('bulk'):
+                result = self.expand_job(job)
+            else:
+                result = self.download_job(job)
+        except JobCancelled:
+            if self.retry is not None:
+                self.retry.abandoned(job)
+            raise
+        except Exception as e:
+            raise self.retry_or_fail(job, e)
+        finally:
+            self.bandwidth.unregister(job)
+        if self.retry is not None:
+            self.retry.succeeded(job)
+        return result
+
+    def retry_or_fail(self, job, exc):
+        """JobRetry for a failure the retry policy wants to repeat, else exc itself"""
+        if self.retry is None or job.cancelled:
+            return exc
+        decision = self.retry.decide(job, exc)
+        if decision.tripped:
+            self.log(f"🚧 {host_of(job.url)} is throttling us - holding its jobs for a while", job)
+        if not decision.retry:
+            if decision.attempts:
+                self.log(f"❌ Giving up after {decision.attempt} {decision.cls} retries", job)
+            return exc
+        if decision.reextract and self.cache is not None:
+            self.cache.invalidate(self.job_key(job))
+        if self.metrics is not None:
+            self.metrics.retry(job)
+        self.log(f"🔁 {decision.cls.capitalize()} error - retrying in {decision.delay:.0f}s "
+                 f"(attempt {decision.attempt}/{decision.attempts})", job)
+        return JobRetry(decision.delay, exc)
+
+    def expand_job(self, job):
+        """
+        Flat-extract a playlist/channel and fan its entries out as separate
+        jobs so the worker pool downloads them in parallel.
+        """
+        yt_dlp = load_yt_dlp()
+
+        self.log(f"📋 Expanding playlist: {job.url}", job)
+        ydl_opts = {
+            'extract_flat': 'in_playlist',
+            'skip_download': True,
+            'quiet': True,
+            'logger': ConsoleLogger(lambda msg: self.log(msg, job)),
+        }
+        try:
+            with self.session(ydl_opts) as ydl:
+                info = ydl.extract_info(job.url, download=False)
+        except Exception as e:
+            if job.cancelled:
+                raise JobCancelled() from e
+            self.log(f"❌ Error: {str(e)}", job)
+            raise
+
+        if info.get('_type') not in ('playlist', 'multi_video'):
+            # Not a collection after all - download it directly
+            job.options['noplaylist'] = True
+            return self.download_job(job)
+
+        title = info.get('title') or info.get('id') or job.url
+        path = job.options.get('path', self.download_path)
+        depth = job.options.get('depth', 0)
+        batch = self.batches.get(job.options.get('batch'))
+        owner = batch is None
+        if owner:
+            batch = Batch(job.url, title)
+            self.batches[batch.id] = batch
+            path = os.path.join(path, yt_dlp.utils.sanitize_filename(title))
+
+        queued = skipped = 0
+        try:
+            for url, entry in flat_entries(info):
+                if job.cancelled:
+                    raise JobCancelled()
+                nested = depth < MAX_BULK_DEPTH and is_bulk_url(url)
+                if not nested and self.is_archived(job, archive_id(entry.get('ie_key'), entry.get('id'))):
+                    skipped += 1
+                    continue
+                options = {'path': path, 'batch': batch.id, 'depth': depth + 1}
+                # Every entry of a playlist is clipped the same way
+                options.update({k: job.options[k] for k in CLIP_OPTIONS if k in job.options})
+                if nested:
+                    options['bulk'] = True
+                else:
+                    options['noplaylist'] = True
+                child, created = self.enqueue(url, job.quality, job.format_type,
+                                              job.priority, options)
+                if created:
+                    batch.add_job(child.id)
+                    queued += 1
+        finally:
+            # Seal even when cancelled so the batch can still complete
+            if owner and batch.seal():
+                self._batch_done(batch)
+
+        self.log(f"📋 {title}: queued {queued} item(s), {skipped} already downloaded", job)
+
+        return {
+            'title': title,
+            'url': job.url,
+            'id': info.get('id'),
+            'entries': queued,
+            'skipped': skipped,
+            'batch': batch.id,
+            'time': datetime.now().isoformat(),
+            'path': path,
+            'quality': job.quality,
+            'format': job.format_type,
+        }
+
+    def extract_listing(self, ydl, url):
+        """
+        Unprocessed playlist result for a URL: entries stay a generator or
+        paged list, so only the pages a sync actually reads are requested
+        """
+        info = ydl.extract_info(url, download=False, process=False)
+        for _ in range(MAX_REDIRECTS):
+            if info.get('_type') not in ('url', 'url_transparent'):
+                break
+            info = ydl.extract_info(info['url'], download=False, process=False,
+                                    ie_key=info.get('ie_key'))
+        return info
+
+    def sync_job(self, job):
+        """
+        Check a subscription for new uploads. Listings are read newest
+        first and the walk stops at the watermark (see new_entries), so a
+        sync costs a page or two however long the channel is. New entries
+        and earlier failures are queued as one batch, oldest first.
+        """
+        yt_dlp = load_yt_dlp()
+        sub_id = job.options['sync']
+        sub = self.subscriptions.get(sub_id) if self.subscriptions is not None else None
+        if sub is None:
+            raise ValueError(f"Subscription #{sub_id} no longer exists")
+        watermark = self.subscriptions.watermark(sub_id)
+        # First sync: `backfill` caps the downloads, the rest only seeds the watermark
+        backfill = sub['backfill'] if watermark.empty else None
+        self.log(f"🔔 Checking {sub['title'] or job.url}", job)
+
+        def existing(entry):
+            return self.is_archived(job, archive_id(entry.get('ie_key'), entry.get('id')))
+
+        found = []
+        seen = {}
+        dates = []
+        ydl_opts = {
+            'skip_download': True,
+            'quiet': True,
+            'logger': ConsoleLogger(lambda msg: self.log(msg, job)),
+        }
+        try:
+            with self.session(ydl_opts) as ydl:
+                info = self.extract_listing(ydl, job.url)
+                if info.get('_type') not in ('playlist', 'multi_video'):
+                    raise ValueError(f"Not a channel or playlist: {job.url}")
+
+                def walk(listing, url, depth):
+                    keys = seen.setdefault(url, [])
+                    for entry_url, entry in new_entries(
+                            listing, watermark, existing, is_date_ordered(url),
+                            nested=lambda u: depth < MAX_BULK_DEPTH and is_bulk_url(u)):
+                        if job.cancelled:
+                            raise JobCancelled()
+                        if depth < MAX_BULK_DEPTH and is_bulk_url(entry_url):
+                            walk(self.extract_listing(ydl, entry_url), entry_url, depth + 1)
+                            continue
+                        if backfill is not None and len(keys) >= backfill + WATERMARK_SIZE:
+                            return
+                        keys.append(entry_key(entry, entry_url))
+                        dates.append(entry_date(entry))
+                        if backfill is not None and len(found) >= backfill:
+                            continue
+                        if not existing(entry):
+                            found.append(entry_url)
+
+                walk(info, job.url, 0)
+        except JobCancelled:
+            raise
+        except Exception as e:
+            if job.cancelled:
+                raise JobCancelled() from e
+            self.log(f"❌ Error: {str(e)}", job)
+            self.subscriptions.sync_failed(sub_id, e)
+            raise
+
+        title = sub['title'] or info.get('title') or info.get('id') or job.url
+        # Same folder on every sync, even if the channel is renamed later
+        path = os.path.join(job.options.get('path', self.download_path),
+                            yt_dlp.utils.sanitize_filename(title))
+        missed = [url for url in self.subscriptions.missed(sub_id) if url not in found]
+        urls = found[::-1] + missed
+        queued = 0
+        batch = None
+        if urls:
+            batch = Batch(job.url, f"{title}: {len(urls)} new", subscription=sub_id)
+            self.batches[batch.id] = batch
+            for url in urls:
+                child, created = self.enqueue(url, job.quality, job.format_type, job.priority, {
+                    'path': path, 'batch': batch.id, 'noplaylist': True, 'subscription': sub_id})
+                if created:
+                    batch.add_job(child.id)
+                    queued += 1
+                elif child.options.get('subscription') != sub_id:
+                    # Queued by hand (or by another source): the watermark moves past
+                    # it now, so keep it as missed until that job downloads it
+                    self.subscriptions.expect(sub_id, url)
+                    self.sync_entries[child.id] = sub_id
+                    if child.state in FINISHED_STATES:
+                        # Finished meanwhile - the next sync queues it again
+                        self.sync_entries.pop(child.id, None)
+            if batch.seal():
+                self._batch_done(batch)
+        self.subscriptions.synced(sub_id, watermark.advanced(seen, dates), title, len(found))
+
+        checked = sum(len(keys) for keys in seen.values())
+        self.log(f"🔔 {title}: {len(found)} new since last sync"
+                 f"{f', {len(missed)} retried' if missed else ''} ({checked} entries checked)", job)
+
+        return {
+            'title': title,
+            'url': job.url,
+            'id': info.get('id'),
+            'subscription': sub_id,
+            'entries': queued,
+            'checked': checked,
+            'batch': batch.id if batch is not None else None,
+            'time': datetime.now().isoformat(),
+            'path': path,
+            'quality': job.quality,
+            'format': job.format_type,
+        }
+
+    def download_job(self, job):
+        """
+        Download one video. Returns a result dict, or a Future for it when
+        the files were handed to the post-processing stage; raises on error.
+        """
+        yt_dlp = load_yt_dlp()
+
+        path = job.options.get('path', self.download_path)
+        Path(path).mkdir(parents=True, exist_ok=True)
+
+        # Skip known videos before any network call
+        entry = archive_id_from_key(self.job_key(job))
+        if self.is_archived(job, entry):
+            return self.skip_job(job, entry)
+        try:
+            self.check_toolchain(job)
+        except ToolchainError as e:
+            self.log(f"❌ {e}", job)
+            raise
+
+        self.log("="*60, job)
+        self.log(f"🚀 Starting download... (job #{job.id})", job)
+        self.log(f"📎 URL: {job.url}", job)
+        self.log(f"🎯 Quality: {job.quality}", job)
+        self.log(f"📦 Format: {job.format_type}", job)
+        self.log("-"*60, job)
+
+        try:
+            ydl_opts = self.build_options(job)
+            self.log("📡 Fetching video information...", job)
+
+            with self.session(ydl_opts) as ydl:
+                raw, cached = self.extract(ydl, job)
+
+                # Generic URLs only reveal their ID after extraction
+                entry = archive_id(raw.get('extractor_key'), raw.get('id')) or entry
+                if self.is_archived(job, entry):
+                    return self.skip_job(job, entry, raw.get('title'))
+
+                try:
+                    info, files, selection = self.fetch(ydl, raw, job)
+                except yt_dlp.utils.DownloadError:
+                    if not cached or job.cancelled:
+                        raise
+                    # Cached stream URLs may have gone stale - re-extract once
+                    self.log("♻️  Cached info rejected, re-extracting...", job)
+                    if self.metrics is not None:
+                        self.metrics.retry(job)
+                    self.cache.invalidate(job.options['cache_key'])
+                    raw, _ = self.extract(ydl, job)
+                    info, files, selection = self.fetch(ydl, raw, job)
+
+            future = self.hand_off(job, info, files, selection, path, entry)
+        except Exception as e:
+            if job.cancelled:
+                raise JobCancelled() from e
+            self.log("-"*60, job)
+            self.log(f"❌ Error: {str(e)}", job)
+            self.log("="*60, job)
+            raise
+
+        if future is not None:
+            return future
+        # One file per clip, or the single downloaded file
+        filepaths = [self.storage.finalize(job.id, f, path) for f in files]
+        self.clean_work_dir(job)
+        return self.finish_download(job, info, path, entry, filepaths[0] if filepaths else None,
+                                    filepaths)
+
+    def fetch(self, ydl, raw, job):
+        """
+        Select formats and download. Merged selections are fetched as
+        separate stream files when the post-processing stage will mux them.
+        Returns (info, downloaded file paths, selection).
+        """
+        raw = self.clip_info(job, raw)
+        selection = self.apply_selection(ydl, raw, job)
+        if (self.postprocessor is not None and is_audio_job(job.quality, job.format_type)
+                and not job.options.get('sections')):
+            # A transcode ffmpeg cannot do fails here, before the download
+            self.audio_plan(job, selection)
+        elif (self.postprocessor is not None and selection is not None and selection.merged
+                and not job.options.get('sections')):
+            self.merge_plan(selection)
+        self.admit(job, raw, selection)
+        if (self.postprocessor is None or selection is None or not selection.merged
+                or job.options.get('sections')):
+            info = ydl.process_ie_result(raw, download=True)
+            files = [d['filepath'] for d in info.get('requested_downloads') or [] if d.get('filepath')]
+            return info, files, selection
+
+        # Pin the pair so the journal resumes both streams, not just the last one
+        job.options['format_id'] = selection.format_id
+        work = self.work_dir(job)
+        outtmpl = ydl.params['outtmpl']
+        default = outtmpl['default']
+        outtmpl['default'] = os.path.join(work, '%(title)s.f%(format_id)s.%(ext)s')
+        files = []
+        try:
+            for fmt in (selection.video, selection.audio):
+                ydl.format_selector = ydl.build_format_selector(fmt['format_id'])
+                info = ydl.process_ie_result(copy.deepcopy(raw), download=True)
+                files.append(info['requested_downloads'][0]['filepath'])
+        finally:
+            outtmpl['default'] = default
+        return info, files, selection
+
+    def hand_off(self, job, info, files, selection, path, entry):
+        """Queue the ffmpeg step for downloaded files; None if there is nothing to do"""
+        if self.postprocessor is None or not files or job.options.get('sections'):
+            return None
+
+        def finalize(task):
+            self.clean_work_dir(job)
+            return self.finish_download(job, info, path, entry, task.output, task=task)
+
+        if selection is not None and selection.merged and len(files) == 2:
+            video, audio = files
+            base = os.path.splitext(video)[0]
+            suffix = f".f{selection.video['format_id']}"
+            if base.endswith(suffix):
+                base = base[:-len(suffix)]
+            output = self.storage.claim(
+                job.id, os.path.join(path, f"{os.path.basename(base)}.{selection.container}"))
+            encoders, fallback = self.merge_plan(selection)
+            self.log(f"📤 Handing off to post-processing ({self.postprocessor.pending()} waiting)", job)
+            return self.postprocessor.merge(job, video, audio, output, finalize, encoders, fallback)
+
+        if is_audio_job(job.quality, job.format_type):
+            source = files[0]
+            container = audio_container(job.quality, job.format_type)
+            name = os.path.splitext(os.path.basename(source))[0] + '.' + container
+            if os.path.basename(source) == name:
+                # Downloaded in the target container already (e.g. YouTube's m4a audio)
+                return None
+            encoder, fallback = self.audio_plan(job, selection)
+            output = self.storage.claim(job.id, os.path.join(path, name))
+            self.log(f"📤 Handing off to post-processing ({self.postprocessor.pending()} waiting)", job)
+            return self.postprocessor.extract_audio(job, source, output, encoder=encoder,
+                                                    fallback=fallback, finalize=finalize)
+        return None
+
+    def work_dir(self, job):
+        """
+        The job's own folder for partial files, so videos with the same
+        title never share a .part file; journaled jobs get the same folder
+        back when they resume
+        """
+        key = job.options.get('journal_id') or job.options.setdefault('_work_id', uuid.uuid4().hex)
+        return os.path.join(self.storage.work_dir(job.options.get('path', self.download_path)), key[:16])
+
+    def clean_work_dir(self, job):
+        """Remove the job's work folder once its files have been moved out"""
+        try:
+            os.rmdir(self.work_dir(job))
+        except OSError:
+            pass
+
+    def finish_download(self, job, info, path, entry, filepath=None, filepaths=None, task=None):
+        """Archive a completed download and build its result dict (`task`: its ffmpeg run)"""
+        result = {
+            'title': info.get('title', 'Video'),
+            'url': job.url,
+            'id': info.get('id'),
+            'duration': info.get('duration') or 0,
+            'filesize': info.get('filesize') or info.get('filesize_approx') or 0,
+            'time': datetime.now().isoformat(),
+            'path': path,
+            'quality': job.quality,
+            'format': job.format_type,
+        }
+        if filepath:
+            result['filepath'] = filepath
+            if os.path.exists(filepath):
+                result['filesize'] = os.path.getsize(filepath)
+        clip = self.clip_sections(job)
+        if clip is not None:
+            result['sections'] = job.options['sections']
+            result['files'] = filepaths or ([filepath] if filepath else [])
+            result['filesize'] = sum(os.path.getsize(f) for f in result['files'] if os.path.exists(f))
+        if task is not None:
+            # Per-job ffmpeg cost: stream copies take a fraction of a second
+            result['postprocess'] = {
+                'kind': task.kind,
+                'codec': task.codec,
+                'seconds': round(task.elapsed, 3),
+                'cpu_time': round(task.cpu_time, 3) if task.cpu_time is not None else None,
+            }
+
+        # A clip does not count as having the video
+        if self.archive is not None and clip is None:
+            self.archive.add(entry, result['title'], path)
+        if self.history is not None:
+            self.history.add(result, (info.get('extractor_key') or '').lower() or None)
+
+        duration = result['duration']
+        size_mb = result['filesize'] / (1024 * 1024)
+        self.log("-"*60, job)
+        self.log(f"✅ Successfully downloaded!", job)
+        self.log(f"📝 Title: {result['title']}", job)
+        if clip is not None:
+            self.log(f"✂️  Clips: {len(result['files'])} ({clip.describe()})", job)
+        self.log(f"⏱️  Duration: {int(duration)//60}m {int(duration)%60}s", job)
+        if size_mb > 0:
+            self.log(f"💾 Size: {size_mb:.2f} MB", job)
+        if task is not None:
+            mode = "stream copy" if task.codec == 'copy' else task.codec
+            cpu = f", {task.cpu_time:.2f}s CPU" if task.cpu_time is not None else ""
+            self.log(f"⚙️  ffmpeg: {task.kind} ({mode}){cpu}", job)
+        self.log(f"📁 Saved to: {path}", job)
+        self.log("="*60, job)
+        return result
+
+    def apply_selection(self, ydl, info, job):
+        """
+        Rank the extracted formats and point the session's format selector
+        at the chosen IDs, keeping the generic selector as fallback.
+        """
+        if job.options.get('format_id'):
+            # Resumed job - the journaled format is already pinned
+            return selection_from_ids(info, job.options['format_id'], job.format_type, job.quality)
+        # Chosen by the prefetcher for this same info dict
+        selection = job.options.pop('_selection', None) or select_formats(
+            info, job.quality, job.format_type, can_merge=self.can_merge(job))
+        if selection is None:
+            return None
+        self.log(f"🎞️  Format: {selection.describe()}", job)
+        ydl.format_selector = ydl.build_format_selector(
+            f"{selection.format_id}/{ydl.params['format']}")
+        return selection
+
+    def job_key(self, job):
+        """extractor:id key for a job's URL, computed once"""
+        if 'cache_key' not in job.options:
+            job.options['cache_key'] = cache_key(job.url)
+        return job.options['cache_key']
+
+    def is_archived(self, job, entry):
+        if self.archive is None or job.options.get('force') or job.options.get('sections'):
+            return False
+        return entry in self.archive
+
+    def skip_job(self, job, entry, title=None):
+        """Result for a video that is already in the download archive"""
+        self.log(f"⏭️  Already downloaded ({entry}), skipping: {title or job.url}", job)
+        return {
+            'title': title or job.url,
+            'url': job.url,
+            'id': entry.split(' ', 1)[1],
+            'skipped': True,
+            'time': datetime.now().isoformat(),
+            'path': job.options.get('path', self.download_path),
+            'quality': job.quality,
+            'format': job.format_type,
+        }
+
+    def scan_output(self, path=None):
+        """Add videos already in the output folder to the archive"""
+        if self.archive is None:
+            return 0
+        # Downloads named '%(title)s.%(ext)s' are recognised through the history
+        known = self.history.downloads() if self.history is not None else None
+        return self.archive.scan_directory(path or self.download_path, known)
+
+    def import_history(self, path=None):
+        """Add media files already in the output folder to the history"""
+        if self.history is None:
+            return 0
+        return self.history.import_directory(path or self.download_path)
+
+    def extract(self, ydl, job):
+        """
+        Unprocessed info dict for a job: prefetched, served from the
+        metadata cache when fresh, or extracted now. Returns (info, from_cache);
+        format selection happens later in process_ie_result, so one entry
+        serves every format.
+        """
+        started = time.monotonic()
+        prefetched = self.take_prefetched(job)
+        if prefetched is not None:
+            info, cached = prefetched['info'], prefetched['cached']
+            self.log(f"⚡ Using prefetched video information "
+                     f"(resolved {time.monotonic() - prefetched['resolved']:.1f}s ago)", job)
+        else:
+            info, cached = self.resolve(ydl, job)
+        if self.metrics is not None:
+            self.metrics.extraction(job, started, cached)
+        return info, cached
+
+    def resolve(self, ydl, job):
+        """Info dict from the metadata cache, or a fresh extraction stored in it"""
+        if self.cache is None:
+            return ydl.extract_info(job.url, download=False, process=False), False
+        key = self.job_key(job)
+        info = self.cache.get(key)
+        if info is not None:
+            self.log("⚡ Using cached video information", job)
+            return info, True
+        info = ydl.extract_info(job.url, download=False, process=False)
+        self.cache.put(key, info, job.url)
+        return info, False
+
+    # ========== PREFETCH ==========
+    def skip_prefetch(self, job):
+        """Playlists and syncs expand on their own; throttled hosts wait for the breaker"""
+        if job.options.get('bulk') or job.options.get('sync'):
+            return True
+        return self.retry is not None and host_of(job.url) in self.retry.breaker.states()
+
+    def prefetch_job(self, job):
+        """
+        Prefetcher stage: extraction and format selection for a queued job,
+        off the worker pool. Returns None for archived videos.
+        """
+        if self.is_archived(job, archive_id_from_key(self.job_key(job))):
+            return None
+        with self.session(self.build_options(job)) as ydl:
+            info, cached = self.resolve(ydl, job)
+        selection = None
+        if not job.options.get('format_id'):
+            selection = select_formats(self.clip_info(job, info), job.quality, job.format_type,
+                                       can_merge=self.can_merge(job))
+        return {'info': info, 'cached': cached, 'selection': selection,
+                'resolved': time.monotonic()}
+
+    def take_prefetched(self, job):
+        """
+        Claim a job's prefetch result, waiting if it is still in flight.
+        Extraction errors are re-raised so the retry policy sees them.
+        Returns None when there is nothing usable (stale or cancelled).
+        """
+        future = job.options.pop('_prefetch', None)
+        if future is None or future.cancelled():
+            return None
+        prefetched = future.result()
+        if prefetched is None or info_expiry(prefetched['info']) <= time.time():
+            return None
+        if prefetched['selection'] is not None:
+            job.options['_selection'] = prefetched['selection']
+        return prefetched
+
+    def journal_progress(self, job, d, downloaded, total):
+        """Record the chosen format once, then throttled byte offsets"""
+        info = d.get('info_dict') or {}
+        requested = info.get('requested_formats')
+        # A pinned ID wins: split downloads report one stream at a time
+        format_id = job.options.get('format_id') or (
+            '+'.join(f['format_id'] for f in requested) if requested else info.get('format_id'))
+        part_file = d.get('tmpfilename') or d.get('filename')
+        if format_id and (format_id, part_file) != job.options.get('_journaled_format'):
+            job.options['_journaled_format'] = (format_id, part_file)
+            job.options['format_id'] = format_id
+            self.journal.set_format(job, format_id, part_file)
+        self.journal.set_offset(job, downloaded, total, force=d['status'] != 'downloading')
+
+    def progress_hook(self, d, job):
+        """
+        yt-dlp progress hook. Normalizes the record to
+        {status, downloaded, total, percent, speed, eta, filename}
+        """
+        if job.cancelled:
+            # Raising from the hook aborts the yt-dlp transfer
+            raise JobCancelled()
+        # Blocking here throttles the transfer - yt-dlp calls hooks after every block
+        self.bandwidth.transferred(job, d.get('filename'), d.get('downloaded_bytes') or 0,
+                                   d.get('total_bytes') or d.get('total_bytes_estimate') or 0)
+        self.storage.progress(job.id, d.get('filename'), d.get('downloaded_bytes') or 0,
+                              d.get('total_bytes') or d.get('total_bytes_estimate') or 0)
+        try:
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            downloaded = d.get('downloaded_bytes') or 0
+            percent = None
+            if d['status'] == 'finished':
+                percent = 100
+            elif total > 0 and downloaded > 0:
+                percent = min((downloaded / total) * 100, 100)  # Cap at 100%
+            record = {
+                'status': d['status'],
+                'downloaded': downloaded,
+                'total': total,
+                'percent': percent,
+                'speed': d.get('speed') or 0,
+                'eta': d.get('eta') or 0,
+                'filename': d.get('filename'),
+            }
+            if self.journal is not None:
+                self.journal_progress(job, d, downloaded, total)
+            batch = self.batches.get(job.options.get('batch'))
+            if batch is not None:
+                batch.update(job.id, downloaded, total)
+                record['batch'] = batch.snapshot()
+            if self.metrics is not None:
+                self.metrics.progress(job, record)
+            if self.on_progress:
+                self.on_progress(job, record)
+        except Exception as e:
+            # Silent fail - don't interrupt download
+            print(f"Progress hook error: {e}", file=sys.stderr)
@@ -0,0 +1,229 @@
+"""
+SnapVid - Format Selector
+Ranks the formats in an info dict and picks a video+audio pair that
+ffmpeg can merge into the chosen container with a plain stream copy
+"""
+
+# Codecs each container takes without re-encoding, most preferred first
+VIDEO_CODECS = {
+    'mp4': ('avc1', 'hevc', 'av01', 'vp09'),
+    'webm': ('vp09', 'av01', 'vp8'),
+}
+AUDIO_CODECS = {
+    'mp4': ('mp4a', 'mp3'),
+    'webm': ('opus', 'vorbis'),
+    # Audio-only targets
+    'm4a': ('mp4a',),
+    'opus': ('opus',),
+    'ogg': ('opus', 'vorbis'),
+    'mp3': ('mp3',),
+}
+
+# Audio-only format choices -> file container
+AUDIO_FORMATS = {
+    "MP3": 'mp3',
+    "M4A": 'm4a',
+    "OPUS": 'opus',
+    "OGG": 'ogg',
+}
+
+QUALITY_HEIGHTS = {
+    "1080p": 1080,
+    "720p": 720,
+    "480p": 480,
+}
+
+# Codec string prefixes -> family names used above
+CODEC_FAMILIES = (
+    (('avc', 'h264'), 'avc1'),
+    (('hev', 'hvc', 'h265'), 'hevc'),
+    (('av01', 'av1'), 'av01'),
+    (('vp09', 'vp9'), 'vp09'),
+    (('vp8',), 'vp8'),
+    (('mp4a', 'aac'), 'mp4a'),
+    (('opus',), 'opus'),
+    (('vorbis',), 'vorbis'),
+    (('mp3',), 'mp3'),
+)
+
+
+def codec_family(codec):
+    """Normalize 'avc1.640028', 'h264', 'vp09.00.40.08'... to a family name"""
+    if not codec or codec == 'none':
+        return None
+    codec = codec.lower()
+    for prefixes, family in CODEC_FAMILIES:
+        if codec.startswith(prefixes):
+            return family
+    return codec.split('.')[0]
+
+
+def has_video(fmt):
+    return fmt.get('vcodec') != 'none' and (fmt.get('vcodec') or fmt.get('height'))
+
+
+def has_audio(fmt):
+    return fmt.get('acodec') != 'none' and (fmt.get('acodec') or fmt.get('abr'))
+
+
+def container_for(format_type):
+    return 'webm' if format_type == "WEBM" else 'mp4'
+
+
+def audio_container(quality, format_type):
+    """
+    Container an audio job ends up in: the chosen audio format, or for
+    "Audio Only" with a video format the native audio of that family
+    (MP4 -> m4a, WEBM -> opus), so it is a remux rather than a transcode
+    """
+    if format_type in AUDIO_FORMATS:
+        return AUDIO_FORMATS[format_type]
+    return 'opus' if format_type == "WEBM" else 'm4a'
+
+
+def _preference(family, codecs):
+    """Higher is better; incompatible codecs rank below every compatible one"""
+    if family in codecs:
+        return len(codecs) - codecs.index(family)
+    return 0
+
+
+def video_key(fmt, container):
+    """Sort key for video streams: resolution, then codec fit, fps and bitrate"""
+    family = codec_family(fmt.get('vcodec'))
+    return (
+        fmt.get('height') or 0,
+        _preference(family, VIDEO_CODECS[container]),
+        fmt.get('fps') or 0,
+        fmt.get('vbr') or fmt.get('tbr') or 0,
+    )
+
+
+def audio_key(fmt, container):
+    """Sort key for audio streams: codec fit, then bitrate"""
+    family = codec_family(fmt.get('acodec'))
+    return (
+        _preference(family, AUDIO_CODECS[container]),
+        fmt.get('abr') or fmt.get('tbr') or 0,
+        fmt.get('asr') or 0,
+    )
+
+
+def stream_copyable(fmt, container, video=True, audio=True):
+    """True if the format's streams fit the container as they are"""
+    if video and codec_family(fmt.get('vcodec')) not in VIDEO_CODECS[container]:
+        return False
+    if audio and codec_family(fmt.get('acodec')) not in AUDIO_CODECS[container]:
+        return False
+    return True
+
+
+class Selection:
+    """Chosen format(s) for one job"""
+
+    def __init__(self, video=None, audio=None, container='mp4'):
+        self.video = video
+        self.audio = audio
+        self.container = container
+
+    @property
+    def format_id(self):
+        ids = [f['format_id'] for f in (self.video, self.audio) if f]
+        return '+'.join(ids)
+
+    @property
+    def merged(self):
+        return self.video is not None and self.audio is not None
+
+    @property
+    def stream_copy(self):
+        """Merge/remux can copy every stream without transcoding"""
+        if self.merged:
+            return (stream_copyable(self.video, self.container, audio=False) and
+                    stream_copyable(self.audio, self.container, video=False))
+        fmt = self.video or self.audio
+        return fmt.get('ext') == self.container or stream_copyable(
+            fmt, self.container, video=bool(has_video(fmt)), audio=bool(has_audio(fmt)))
+
+    def describe(self):
+        parts = []
+        if self.video:
+            parts.append(f"{self.video.get('height') or '?'}p {codec_family(self.video.get('vcodec'))}")
+        if self.audio:
+            parts.append(f"{codec_family(self.audio.get('acodec'))} {self.audio.get('abr') or '?'}k")
+        mode = "stream copy" if self.stream_copy else "needs conversion"
+        return f"{self.format_id} ({' + '.join(parts)}, {self.container}, {mode})"
+
+
+def select_formats(info, quality, format_type, can_merge=True):
+    """
+    Pick formats from an info dict. Returns a Selection, or None when the
+    info has no usable format list (the caller falls back to a selector
+    string). Progressive formats win when they reach the same height as
+    the best split pair, since they need no merge at all.
+    """
+    formats = [f for f in info.get('formats') or [] if f.get('format_id')]
+    if not formats:
+        return None
+    container = container_for(format_type)
+
+    if quality == "Audio Only" or format_type in AUDIO_FORMATS:
+        # Streams already in the target codec win, so most jobs only remux
+        container = audio_container(quality, format_type)
+        audios = [f for f in formats if has_audio(f) and not has_video(f)]
+        if not audios:
+            return None
+        return Selection(audio=max(audios, key=lambda f: audio_key(f, container)),
+                         container=container)
+
+    limit = QUALITY_HEIGHTS.get(quality)
+
+    def fits(fmt):
+        return limit is None or (fmt.get('height') or 0) <= limit
+
+    progressive = [f for f in formats if has_video(f) and has_audio(f) and fits(f)]
+    videos = [f for f in formats if has_video(f) and not has_audio(f) and fits(f)]
+    audios = [f for f in formats if has_audio(f) and not has_video(f)]
+
+    best_progressive = None
+    if progressive:
+        best_progressive = max(progressive, key=lambda f: (
+            f.get('height') or 0,
+            stream_copyable(f, container),
+            f.get('tbr') or 0,
+        ))
+
+    if can_merge and videos and audios:
+        # Prefer pairs that stream-copy into the container at the best height
+        pair = Selection(video=max(videos, key=lambda f: video_key(f, container)),
+                         audio=max(audios, key=lambda f: audio_key(f, container)),
+                         container=container)
+        if best_progressive is None:
+            return pair
+        single = Selection(video=best_progressive, container=container)
+        if (best_progressive.get('height') or 0) < (pair.video.get('height') or 0):
+            return pair
+        if pair.stream_copy and not single.stream_copy:
+            return pair
+        return single
+
+    if best_progressive is not None:
+        return Selection(video=best_progressive, container=container)
+    return None
+
+
+def selection_from_ids(info, format_id, format_type, quality=None):
+    """Rebuild the Selection for a pinned 'video+audio' or single format ID"""
+    by_id = {f.get('format_id'): f for f in info.get('formats') or []}
+    picked = [by_id.get(i) for i in format_id.split('+')]
+    if not picked or None in picked:
+        return None
+    container = container_for(format_type)
+    if quality == "Audio Only" or format_type in AUDIO_FORMATS:
+        container = audio_container(quality, format_type)
+    if len(picked) == 2:
+        return Selection(video=picked[0], audio=picked[1], container=container)
+    fmt = picked[0]
+    if has_video(fmt):
+        return Selection(video=fmt, container=container)
+    return Selection(audio=fmt, container=container)
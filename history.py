@@ -0,0 +1,268 @@
+"""
+SnapVid - Download History
+Every finished download in an indexed SQLite table, with full-text title
+search, page-by-page browsing and CSV/JSON export
+"""
+
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from archive import BRACKETED_ID, DEFAULT_EXTRACTOR
+from storage import WORK_DIR
+
+# Rows per history page
+PAGE_SIZE = 100
+# Rows fetched per round trip while exporting
+EXPORT_CHUNK = 1000
+# Files picked up when importing an existing output folder
+MEDIA_EXTENSIONS = ('.mp4', '.webm', '.mkv', '.mov', '.m4a', '.mp3', '.opus', '.ogg', '.flac', '.wav')
+# Leftovers of unfinished downloads and merges ('.f137.mp4', '.temp.mp4')
+PARTIAL_NAME = re.compile(r'\.(?:f[0-9A-Za-z_-]+|temp)\.[0-9A-Za-z]+$')
+
+COLUMNS = ('id', 'url', 'video_id', 'extractor', 'title', 'filepath', 'path', 'quality',
+           'format', 'duration', 'filesize', 'finished', 'source')
+
+
+def fts_query(text):
+    """Prefix-match every word of a search box entry (quoted, so FTS syntax is inert)"""
+    words = re.findall(r'\w+', text, re.UNICODE)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+class DownloadHistory:
+    """
+    SQLite-backed history. URL, video ID, title and time are indexed and
+    titles are mirrored into an FTS5 table, so search and paging cost the
+    same with ten rows or ten years of them; nothing is loaded at startup.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY,
+                url TEXT,
+                video_id TEXT,
+                extractor TEXT,
+                title TEXT,
+                filepath TEXT,
+                path TEXT,
+                quality TEXT,
+                format TEXT,
+                duration REAL,
+                filesize INTEGER,
+                finished REAL NOT NULL,
+                source TEXT NOT NULL DEFAULT 'download'
+            );
+            CREATE INDEX IF NOT EXISTS history_url ON history (url);
+            CREATE INDEX IF NOT EXISTS history_video ON history (video_id);
+            CREATE INDEX IF NOT EXISTS history_title ON history (title COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS history_finished ON history (finished);
+            CREATE UNIQUE INDEX IF NOT EXISTS history_file ON history (filepath);
+        """)
+        self.fts = self._create_fts()
+        self._db.commit()
+
+    def _create_fts(self):
+        """External-content FTS5 index on titles; False where SQLite lacks FTS5"""
+        try:
+            self._db.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS history_fts
+                    USING fts5(title, content='history', content_rowid='id');
+                CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+                    INSERT INTO history_fts (rowid, title) VALUES (new.id, new.title);
+                END;
+                CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+                    INSERT INTO history_fts (history_fts, rowid, title)
+                        VALUES ('delete', old.id, old.title);
+                END;
+                CREATE TRIGGER IF NOT EXISTS history_au AFTER UPDATE OF title ON history BEGIN
+                    INSERT INTO history_fts (history_fts, rowid, title)
+                        VALUES ('delete', old.id, old.title);
+                    INSERT INTO history_fts (rowid, title) VALUES (new.id, new.title);
+                END;
+            """)
+            return True
+        except sqlite3.OperationalError as e:
+            print(f"History search falls back to LIKE: {e}")
+            return False
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    # ========== RECORDING ==========
+    def add(self, result, extractor=None):
+        """Record an engine result dict"""
+        self.add_many([(result, extractor)])
+
+    def add_many(self, rows, source='download'):
+        """Insert (result, extractor) pairs; returns how many were new"""
+        now = time.time()
+        values = []
+        for result, extractor in rows:
+            finished = result.get('finished')
+            if finished is None and result.get('time'):
+                try:
+                    finished = time.mktime(time.strptime(result['time'][:19], '%Y-%m-%dT%H:%M:%S'))
+                except ValueError:
+                    finished = None
+            values.append((result.get('url'), result.get('id'), extractor, result.get('title'),
+                           result.get('filepath'), result.get('path'), result.get('quality'),
+                           result.get('format'), result.get('duration'), result.get('filesize'),
+                           finished or now, source))
+        with self._lock:
+            # rowcount, not total_changes: the FTS triggers' writes would be counted too
+            inserted = self._db.executemany(
+                "INSERT OR IGNORE INTO history (url, video_id, extractor, title, filepath, path, "
+                "quality, format, duration, filesize, finished, source) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", values).rowcount
+            self._db.commit()
+            return inserted
+
+    def remove(self, entry_id):
+        with self._lock:
+            self._db.execute("DELETE FROM history WHERE id = ?", (entry_id,))
+            self._db.commit()
+
+    # ========== QUERIES ==========
+    def _where(self, query):
+        """WHERE clause and parameters for a search box entry ('' matches everything)"""
+        query = (query or '').strip()
+        if not query:
+            return "", []
+        # A pasted URL or video ID hits its index directly
+        exact = "url = ? OR video_id = ?"
+        params = [query, query]
+        match = fts_query(query)
+        if not match:
+            return f"WHERE ({exact})", params
+        if self.fts:
+            return (f"WHERE ({exact} OR id IN "
+                    f"(SELECT rowid FROM history_fts WHERE history_fts MATCH ?))", params + [match])
+        return f"WHERE ({exact} OR title LIKE ?)", params + [f"%{query}%"]
+
+    def search(self, query=None, limit=PAGE_SIZE, before=None):
+        """
+        One page of entries, newest first, as dicts. Pass the (finished, id)
+        of the last entry of a page as `before` to get the next one - a
+        keyset cursor, so deep pages cost the same as the first.
+        """
+        where, params = self._where(query)
+        if before is not None:
+            where += " AND " if where else "WHERE "
+            where += "(finished < ? OR (finished = ? AND id < ?))"
+            params += [before[0], before[0], before[1]]
+        sql = (f"SELECT {', '.join(COLUMNS)} FROM history {where} "
+               f"ORDER BY finished DESC, id DESC LIMIT ?")
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params + [limit])]
+
+    def count(self, query=None):
+        where, params = self._where(query)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM history {where}", params).fetchone()[0]
+
+    def find(self, url=None, video_id=None):
+        """Most recent entry for a URL or video ID, or None"""
+        column, value = ('url', url) if url else ('video_id', video_id)
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM history WHERE {column} = ? "
+                f"ORDER BY finished DESC LIMIT 1", (value,)).fetchone()
+        return dict(row) if row else None
+
+    def downloads(self):
+        """(filepath, video_id, extractor, title, filesize) of every file SnapVid downloaded"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT filepath, video_id, extractor, title, filesize FROM history "
+                "WHERE source = 'download' AND filepath IS NOT NULL AND video_id IS NOT NULL "
+                "ORDER BY finished").fetchall()
+
+    # ========== IMPORT / EXPORT ==========
+    def export_file(self, path, query=None):
+        """
+        Write matching entries to CSV, JSON (.json) or JSON lines (.jsonl),
+        streaming page by page; returns the number written
+        """
+        ext = os.path.splitext(path)[1].lower()
+        written = 0
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = None
+            if ext == '.json':
+                f.write("[")
+            elif ext != '.jsonl':
+                writer = csv.DictWriter(f, fieldnames=COLUMNS)
+                writer.writeheader()
+            before = None
+            while True:
+                page = self.search(query, EXPORT_CHUNK, before)
+                for entry in page:
+                    if writer is not None:
+                        writer.writerow(entry)
+                    elif ext == '.json':
+                        f.write(("," if written else "") + "\n  " + json.dumps(entry, ensure_ascii=False))
+                    else:
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    written += 1
+                if len(page) < EXPORT_CHUNK:
+                    break
+                before = (page[-1]['finished'], page[-1]['id'])
+            if ext == '.json':
+                f.write("\n]\n")
+        return written
+
+    def import_directory(self, directory):
+        """
+        Add media files already in an output folder (titles and IDs from
+        yt-dlp .info.json sidecars or '[id]' file names). Files already in
+        the history are skipped by their path.
+        """
+        rows = []
+        for root, dirs, files in os.walk(directory):
+            # Unfinished downloads
+            dirs[:] = [d for d in dirs if d != WORK_DIR]
+            names = set(files)
+            for name in files:
+                base, ext = os.path.splitext(name)
+                if ext.lower() not in MEDIA_EXTENSIONS or PARTIAL_NAME.search(name):
+                    continue
+                full = os.path.join(root, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                result = {'title': base, 'filepath': full, 'path': root, 'filesize': st.st_size,
+                          'format': ext[1:].upper(), 'finished': st.st_mtime}
+                extractor = None
+                match = BRACKETED_ID.search(name)
+                if match:
+                    result['id'] = match.group(1)
+                    result['title'] = name[:match.start()].rstrip() or base
+                    extractor = DEFAULT_EXTRACTOR
+                if base + '.info.json' in names:
+                    try:
+                        with open(os.path.join(root, base + '.info.json'), 'r', encoding='utf-8') as f:
+                            info = json.load(f)
+                        result.update(title=info.get('title') or result['title'],
+                                      id=info.get('id') or result.get('id'),
+                                      url=info.get('webpage_url'), duration=info.get('duration'))
+                        extractor = (info.get('extractor_key') or extractor or '').lower() or None
+                    except (OSError, ValueError):
+                        pass
+                rows.append((result, extractor))
+        return self.add_many(rows, source='import')
@@ -0,0 +1,199 @@
+"""
+SnapVid - Metadata Cache
+On-disk SQLite cache of extracted info dicts, keyed by extractor + video ID
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlparse, parse_qs
+
+# Fallback lifetime when the formats carry no expiry hint
+DEFAULT_TTL = 60 * 60
+# Stream URLs are refreshed this long before they actually expire
+EXPIRY_MARGIN = 10 * 60
+# Total compressed payload kept on disk before LRU eviction
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def cache_key(url):
+    """
+    extractor:id for URLs a dedicated extractor recognises, without any
+    network access. Everything else is keyed by the URL itself.
+    """
+    from yt_dlp.extractor import gen_extractor_classes
+
+    for ie in gen_extractor_classes():
+        if ie.ie_key() == 'Generic':
+            continue
+        try:
+            if ie.suitable(url):
+                video_id = ie.get_temp_id(url)
+                if video_id:
+                    return f"{ie.ie_key()}:{video_id}"
+                break
+        except Exception:
+            continue
+    return f"url:{url}"
+
+
+def info_expiry(info, now=None, default_ttl=DEFAULT_TTL):
+    """
+    Absolute time at which a cached info dict goes stale: the earliest
+    `expire=` stamp in its stream URLs minus a safety margin, or the
+    default TTL when the URLs carry no expiry hint.
+    """
+    now = now or time.time()
+    stamps = []
+    for fmt in info.get('formats') or [info]:
+        url = fmt.get('url') or ''
+        if 'expire' not in url:
+            continue
+        parsed = urlparse(url)
+        try:
+            stamps.append(int(parse_qs(parsed.query)['expire'][0]))
+        except (KeyError, ValueError, IndexError):
+            # Some CDNs put the parameters in the path (/expire/123/)
+            parts = parsed.path.split('/')
+            try:
+                stamps.append(int(parts[parts.index('expire') + 1]))
+            except (ValueError, IndexError):
+                continue
+    if stamps:
+        return min(stamps) - EXPIRY_MARGIN
+    return now + default_ttl
+
+
+def cacheable(info):
+    """Strip private hook keys; returns None if the dict cannot be stored"""
+    if not info or info.get('_type', 'video') != 'video':
+        return None
+    info = {k: v for k, v in info.items() if not k.startswith('__')}
+    try:
+        json.dumps(info)
+    except (TypeError, ValueError):
+        return None
+    return info
+
+
+class InfoCache:
+    """Thread-safe SQLite info-dict cache with TTL and LRU size cap"""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, default_ttl=DEFAULT_TTL):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS info (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                expires REAL NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS info_accessed ON info (accessed);
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        """)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._flush_counters()
+            self._db.close()
+
+    # ========== LOOKUP ==========
+    def get(self, key):
+        """Cached info dict, or None on miss/expiry"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, expires FROM info WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._db.execute("DELETE FROM info WHERE key = ?", (key,))
+                    self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE info SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key, info, url=None):
+        """Store an info dict; silently skips dicts that cannot be cached"""
+        info = cacheable(info)
+        if info is None:
+            return False
+        now = time.time()
+        expires = info_expiry(info, now, self.default_ttl)
+        if expires <= now:
+            return False
+        data = zlib.compress(json.dumps(info).encode('utf-8'))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO info (key, url, data, size, created, expires, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, url, data, len(data), now, expires, now))
+            self._evict()
+            self._db.commit()
+        return True
+
+    def invalidate(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM info WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM info")
+            self._db.commit()
+
+    # ========== MAINTENANCE ==========
+    def _evict(self):
+        """Drop expired rows, then least recently used until under the cap"""
+        self._db.execute("DELETE FROM info WHERE expires <= ?", (time.time(),))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM info").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT key, size FROM info ORDER BY accessed").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM info WHERE key = ?", (key,))
+            total -= size
+
+    def _flush_counters(self):
+        for name, value in (('hits', self.hits), ('misses', self.misses)):
+            self._db.execute(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, value))
+        self._db.commit()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        """Entry count, payload bytes and hit/miss counters (session + lifetime)"""
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM info").fetchone()
+            lifetime = dict(self._db.execute("SELECT name, value FROM counters").fetchall())
+            return {
+                'entries': entries,
+                'bytes': size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'lifetime_hits': lifetime.get('hits', 0) + self.hits,
+                'lifetime_misses': lifetime.get('misses', 0) + self.misses,
+            }
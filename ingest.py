@@ -0,0 +1,133 @@
+"""
+SnapVid - URL Ingestion
+Pulls URLs out of pasted text, dropped lists and text/CSV/JSON files and
+normalizes them to canonical video URLs so duplicates collapse before queueing
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+from urllib.parse import urlsplit, urlunsplit, unquote_plus
+
+from bulk import is_bulk_url
+from archive import archive_id
+
+# Anything that looks like a link: a scheme, or a bare www./YouTube host
+URL_PATTERN = re.compile(
+    r"(?:https?://|\bwww\.|\byoutu\.be/|\b(?:m\.|music\.)?youtube\.com/)[^\s\"'<>,|\\^`{}]+",
+    re.IGNORECASE)
+# Characters that end a sentence or markup rather than the URL
+TRAILING = '.,;:!?)]}*\''
+
+# Every YouTube URL form that carries a single video ID
+YOUTUBE_VIDEO = re.compile(
+    r"^https?://(?:(?:www|m|music)\.)?(?:youtube(?:-nocookie)?\.com/"
+    r"(?:watch\?(?:[^#]*?&)?v=|shorts/|embed/|live/|v/|e/)|youtu\.be/)"
+    r"([0-9A-Za-z_-]{11})(?![0-9A-Za-z_-])",
+    re.IGNORECASE)
+
+# Query parameters that only track where a link was shared from
+TRACKING_PARAMS = ('fbclid', 'gclid', 'igshid', 'mc_cid', 'mc_eid')
+
+# Canonical form of one ingested URL: `key` is the info-cache key
+# ('Youtube:<id>' or 'url:<url>'), `archive` the archive line if known
+IngestItem = namedtuple('IngestItem', 'url key archive bulk')
+
+
+def extract_urls(text):
+    """Every URL in a block of text, in order (one regex pass over the whole blob)"""
+    urls = []
+    for match in URL_PATTERN.findall(text):
+        url = match.rstrip(TRAILING)
+        if '://' not in url[:8]:
+            url = 'https://' + url
+        urls.append(url)
+    return urls
+
+
+def _strip_tracking(query):
+    # Raw pairs, so the ones kept stay byte-for-byte (signed or strict query strings)
+    kept = []
+    for pair in query.split('&'):
+        name = unquote_plus(pair.partition('=')[0]).lower()
+        if not name.startswith('utm_') and name not in TRACKING_PARAMS:
+            kept.append(pair)
+    return '&'.join(kept)
+
+
+def normalize(url):
+    """IngestItem for one URL; no network access"""
+    url = url.strip()
+    match = YOUTUBE_VIDEO.match(url)
+    if match and not is_bulk_url(url):
+        video_id = match.group(1)
+        return IngestItem(f"https://www.youtube.com/watch?v={video_id}", f"Youtube:{video_id}",
+                          archive_id('youtube', video_id), False)
+    try:
+        parts = urlsplit(url)
+        query = _strip_tracking(parts.query) if parts.query else ''
+        # The fragment stays: '#!/video/42' style routes name the video
+        url = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', query,
+                          parts.fragment))
+    except ValueError:
+        pass
+    return IngestItem(url, f"url:{url}", None, is_bulk_url(url))
+
+
+def parse(text):
+    """Normalized, de-duplicated IngestItems for every URL in text"""
+    items = []
+    seen = set()
+    for url in extract_urls(text):
+        item = normalize(url)
+        if item.key not in seen:
+            seen.add(item.key)
+            items.append(item)
+    return items
+
+
+# ========== SOURCES ==========
+def strip_comments(text):
+    """Drop '#' / ';' comment lines (yt-dlp batch-file convention)"""
+    return "\n".join(line for line in text.splitlines()
+                     if not line.lstrip().startswith(('#', ';')))
+
+
+def _json_strings(value, out):
+    if isinstance(value, str):
+        out.append(value)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _json_strings(item, out)
+    elif isinstance(value, list):
+        for item in value:
+            _json_strings(item, out)
+
+
+def read_source(path):
+    """
+    Text of a URL list file. JSON and JSON-lines documents (e.g. yt-dlp -J
+    output) are flattened to their string values; text and CSV lose comment lines.
+    """
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        text = f.read()
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in ('.json', '.jsonl', '.ndjson'):
+        return strip_comments(text)
+    strings = []
+    try:
+        if ext == '.json':
+            _json_strings(json.loads(text), strings)
+        else:
+            for line in text.splitlines():
+                if line.strip():
+                    _json_strings(json.loads(line), strings)
+    except ValueError:
+        # Not valid JSON after all - scan the raw text
+        return text
+    return "\n".join(strings)
+
+
+def parse_file(path):
+    return parse(read_source(path))
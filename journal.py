@@ -0,0 +1,177 @@
+"""
+SnapVid - Job Journal
+Write-ahead record of unfinished jobs so they survive quits and crashes
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Minimum seconds between byte-offset writes for one job
+OFFSET_INTERVAL = 1.0
+
+# Options that only make sense inside the process that created them
+# (underscore-prefixed keys are engine bookkeeping and never stored either)
+TRANSIENT_OPTIONS = ('batch', 'journal_id')
+
+
+def stored_options(options):
+    return json.dumps({k: v for k, v in options.items()
+                       if k not in TRANSIENT_OPTIONS and not k.startswith('_')},
+                      default=str)
+
+
+class JobJournal:
+    """
+    SQLite journal (synchronous=FULL) of queued and running jobs. A row is
+    written before a job is queued and removed once it reaches a terminal
+    state, so whatever is left at startup was interrupted.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._last_write = {}
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                quality TEXT NOT NULL,
+                format_type TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                options TEXT NOT NULL,
+                state TEXT NOT NULL,
+                format_id TEXT,
+                part_file TEXT,
+                downloaded INTEGER NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ========== WRITES ==========
+    def record(self, url, quality, format_type, priority, options):
+        """
+        Journal a job before it is queued. Assigns options['journal_id']
+        (kept when resuming so the original row is reused).
+        """
+        journal_id = options.get('journal_id') or uuid.uuid4().hex
+        options['journal_id'] = journal_id
+        stored = stored_options(options)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, url, quality, format_type, priority, options, "
+                "state, format_id, created, updated) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET state = 'queued', updated = excluded.updated",
+                (journal_id, url, quality, format_type, priority, stored,
+                 options.get('format_id'), now, now))
+            self._db.commit()
+        return journal_id
+
+    def record_many(self, jobs):
+        """
+        Journal (url, quality, format_type, priority, options) tuples in one
+        transaction; each options dict gets its journal_id like record()
+        """
+        now = time.time()
+        rows = []
+        for url, quality, format_type, priority, options in jobs:
+            options['journal_id'] = options.get('journal_id') or uuid.uuid4().hex
+            rows.append((options['journal_id'], url, quality, format_type, priority,
+                         stored_options(options), options.get('format_id'), now, now))
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO jobs (id, url, quality, format_type, priority, options, "
+                "state, format_id, created, updated) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET state = 'queued', updated = excluded.updated", rows)
+            self._db.commit()
+
+    def set_state(self, job):
+        journal_id = job.options.get('journal_id')
+        if not journal_id:
+            return
+        with self._lock:
+            self._db.execute("UPDATE jobs SET state = ?, options = ?, updated = ? WHERE id = ?",
+                             (job.state, stored_options(job.options), time.time(), journal_id))
+            self._db.commit()
+
+    def set_format(self, job, format_id, part_file):
+        """Pin the format chosen for a job so a resume reuses the same .part"""
+        journal_id = job.options.get('journal_id')
+        if not journal_id:
+            return
+        with self._lock:
+            self._db.execute("UPDATE jobs SET format_id = ?, part_file = ?, updated = ? WHERE id = ?",
+                             (format_id, part_file, time.time(), journal_id))
+            self._db.commit()
+
+    def set_offset(self, job, downloaded, total, force=False):
+        """Record byte progress, throttled to one write per OFFSET_INTERVAL"""
+        journal_id = job.options.get('journal_id')
+        if not journal_id:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_write.get(journal_id, 0) < OFFSET_INTERVAL:
+            return
+        self._last_write[journal_id] = now
+        with self._lock:
+            self._db.execute("UPDATE jobs SET downloaded = ?, total = ?, updated = ? WHERE id = ?",
+                             (downloaded, total or 0, time.time(), journal_id))
+            self._db.commit()
+
+    def remove(self, journal_id):
+        if not journal_id:
+            return
+        self._last_write.pop(journal_id, None)
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (journal_id,))
+            self._db.commit()
+
+    def remove_many(self, journal_ids):
+        ids = [(journal_id,) for journal_id in journal_ids if journal_id]
+        if not ids:
+            return
+        with self._lock:
+            self._db.executemany("DELETE FROM jobs WHERE id = ?", ids)
+            self._db.commit()
+
+    # ========== RECOVERY ==========
+    def pending(self):
+        """Interrupted jobs as dicts, oldest first"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, url, quality, format_type, priority, options, state, "
+                "format_id, part_file, downloaded, total FROM jobs ORDER BY created").fetchall()
+        jobs = []
+        for row in rows:
+            options = json.loads(row[5])
+            options['journal_id'] = row[0]
+            if row[7]:
+                options['format_id'] = row[7]
+            part = row[8]
+            jobs.append({
+                'url': row[1],
+                'quality': row[2],
+                'format_type': row[3],
+                'priority': row[4],
+                'options': options,
+                'state': row[6],
+                'part_file': row[8],
+                'downloaded': row[9],
+                'total': row[10],
+                'part_bytes': os.path.getsize(part) if part and os.path.exists(part) else 0,
+            })
+        return jobs
@@ -3,90 +3,59 @@ SnapVid
 AutoSubs-inspired clean UI with all features
 """
 
+import sys
+
+# Opt-in startup timings (--profile-startup or SNAPVID_PROFILE_STARTUP=1);
+# installed before the other imports so they are timed too
+from startup_profile import StartupProfile
+PROFILE = StartupProfile.from_argv(sys.argv)
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
-import yt_dlp
-import threading
 import os
-import sys
 import json
 import subprocess
-import shutil
+import threading
 from pathlib import Path
 from datetime import datetime
 
-# ========== SSL CERTIFICATE FIX ==========
-import ssl
-import certifi
-
-# Set SSL certificate paths globally
-os.environ['SSL_CERT_FILE'] = certifi.where()
-os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
-
-# For PyInstaller bundles
-if getattr(sys, 'frozen', False):
-    cert_path = certifi.where()
-    os.environ['SSL_CERT_FILE'] = cert_path
-    os.environ['REQUESTS_CA_BUNDLE'] = cert_path
-
-# ========== FFMPEG PATH DETECTION ==========
-def get_ffmpeg_path():
-    """
-    Get ffmpeg path for bundled or system installation
-    Supports PyInstaller bundles and system installations
-    """
-    # Check if running as PyInstaller bundle
-    if getattr(sys, 'frozen', False):
-        # Running in PyInstaller bundle
-        base_path = getattr(sys, '_MEIPASS', os.path.dirname(sys.executable))
-        
-        # Check for bundled ffmpeg
-        if sys.platform == 'darwin':  # macOS
-            ffmpeg_path = os.path.join(base_path, 'ffmpeg')
-            ffprobe_path = os.path.join(base_path, 'ffprobe')
-        elif sys.platform == 'win32':  # Windows
-            ffmpeg_path = os.path.join(base_path, 'ffmpeg.exe')
-            ffprobe_path = os.path.join(base_path, 'ffprobe.exe')
-        else:  # Linux
-            ffmpeg_path = os.path.join(base_path, 'ffmpeg')
-            ffprobe_path = os.path.join(base_path, 'ffprobe')
-        
-        # Return directory if files exist
-        if os.path.exists(ffmpeg_path) and os.path.exists(ffprobe_path):
-            return base_path
-    
-    # Check system PATH
-    system_ffmpeg = shutil.which('ffmpeg')
-    if system_ffmpeg:
-        return os.path.dirname(system_ffmpeg)
-    
-    # Not found
-    return None
+from ui_events import UIEventChannel, LOG, PROGRESS, CALL, FRAME_RATE
+from download_queue import QUEUED, RUNNING, PROCESSING, DONE, FAILED, CANCELLED
+from engine import DownloadEngine, QUALITIES, FORMATS, default_download_path, data_dir, preload
+from console_log import ConsoleLog, LEVEL_NAMES, INFO
+from metrics import MetricsServer
+from bandwidth import POLICIES, FAIR
+from ingest import parse, parse_file
+from storage import OutputManager, format_bytes
+from history import PAGE_SIZE
+from subscriptions import parse_interval, format_interval
+import sections
 
+# Drag-and-drop needs the optional tkinterdnd2 package
+try:
+    from tkinterdnd2 import TkinterDnD, DND_FILES, DND_TEXT
+except ImportError:
+    TkinterDnD = None
 
-
-# Console Logger Class
-class ConsoleLogger:
-    def __init__(self, app):
-        self.app = app
-    
-    def debug(self, msg):
-        if msg.startswith('[debug] '):
-            return
-        self.app.log(f"[DEBUG] {msg}")
-    
-    def info(self, msg):
-        self.app.log(msg)
-    
-    def warning(self, msg):
-        self.app.log(f"⚠️ {msg}")
-    
-    def error(self, msg):
-        self.app.log(f"❌ {msg}")
+# Lines kept in the console widget; older ones stay in the ConsoleLog buffer
+CONSOLE_VIEW_LINES = 1000
+ALL_JOBS = "All jobs"
+# How often the clipboard is checked while watching it
+CLIPBOARD_POLL_MS = 1000
+# Delay after the first frame before background start-up work begins
+WARM_UP_DELAY_MS = 100
+URL_PLACEHOLDER = "https://www.youtube.com/watch?v=..."
+CLIP_PLACEHOLDER = "Whole video - or e.g. 1:00-1:30, 45:10-, Intro"
+# Sync intervals offered in the subscriptions window
+SYNC_INTERVALS = ("1h", "6h", "12h", "1d", "1w")
+# How often the open subscriptions window re-reads the store
+SUBSCRIPTIONS_REFRESH_MS = 5000
 
 class App:
     def __init__(self, root):
         self.root = root
+        self.profile = PROFILE
+        self.mark("imports done")
         self.root.title("SnapVid")
         
         # Fixed window size - NO RESIZE
@@ -111,37 +80,165 @@ class App:
         
         self.root.configure(bg=self.bg)
         
-        # Download path
-        self.download_path = str(Path.home() / "Downloads" / "YouTube")
-        Path(self.download_path).mkdir(parents=True, exist_ok=True)
+        # Worker -> UI event channel, drained by pump_events()
+        self.events = UIEventChannel()
         
-        # Download history
-        self.download_history = []
+        # Bounded console history, spilled to ~/.snapvid/logs/snapvid.log
+        log_dir = data_dir() / "logs"
+        log_dir.mkdir(exist_ok=True)
+        self.console_log = ConsoleLog(log_dir / "snapvid.log")
+        self.view_level = INFO
+        self.view_job = None
         
-        # Check ffmpeg availability
-        self.ffmpeg_path = get_ffmpeg_path()
+        # Clipboard watching and queue-button refresh state
+        self.clipboard_last = None
+        self.queue_refresh_pending = False
+        self.history_window = None
+        self.subscriptions_window = None
+        
+        # Download path
+        self.download_path = default_download_path()
+        Path(self.download_path).mkdir(parents=True, exist_ok=True)
         
         # Load saved settings
+        self.max_workers = None
+        self.fragments = None
+        self.connections = None
+        self.postprocess_workers = None
+        self.prefetch = None
+        self.scratch_path = None
+        self.metrics_port = None
+        self.rate_limit = None
+        self.bandwidth_policy = FAIR
         self.load_settings()
         
+        # Download engine - built after the first frame (see engine)
+        self._engine = None
+        self.ffmpeg_path = None
+        self.metrics_server = None
+        
         # Setup UI
         self.setup_ui()
         
         # Keyboard shortcuts
         self.setup_shortcuts()
         
-        # Show ffmpeg status
-        self.check_ffmpeg_status()
+        self.mark("window built")
+        
+        # Start draining worker events at a fixed frame rate
+        self.pump_events()
+        
+        # Everything else waits until the window is on screen
+        self.started_up = False
+        self.root.bind('<Map>', self.on_first_map, add='+')
         
         # Save settings on close
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
     
+    # ========== STARTUP ==========
+    def mark(self, phase):
+        if self.profile is not None:
+            self.profile.mark(phase)
+    
+    def on_first_map(self, event):
+        if self.started_up or event.widget is not self.root:
+            return
+        self.started_up = True
+        self.mark("window mapped")
+        # Close the splash a one-file PyInstaller build shows while unpacking
+        try:
+            import pyi_splash
+            pyi_splash.close()
+        except ImportError:
+            pass
+        self.root.after(WARM_UP_DELAY_MS, self.finish_startup)
+    
+    @property
+    def engine(self):
+        """
+        The download engine, created on first use. Its ffmpeg lookup, stores
+        and worker threads would otherwise hold back the first frame.
+        """
+        if self._engine is None:
+            # Download engine - queue + bounded worker pool
+            self._engine = DownloadEngine(self.download_path, workers=self.max_workers,
+                                          fragments=self.fragments,
+                                          connections=self.connections,
+                                          postprocess_workers=self.postprocess_workers,
+                                          prefetch=self.prefetch,
+                                          storage=OutputManager(self.scratch_path),
+                                          rate_limit=self.rate_limit,
+                                          bandwidth_policy=self.bandwidth_policy,
+                                          schedule=True,
+                                          on_log=self.on_engine_log,
+                                          on_progress=self.on_engine_progress,
+                                          on_job_change=self.on_job_change,
+                                          on_batch_done=self.on_batch_done)
+            self.ffmpeg_path = self._engine.ffmpeg_path
+            self._engine.start()
+            self.mark("engine ready")
+            self.check_ffmpeg_status()
+        return self._engine
+    
+    def finish_startup(self):
+        """Start-up work that does not need to hold back the first frame"""
+        self.mark("first frame")
+        
+        # ffmpeg lookup, stores and worker threads
+        self.engine
+        
+        # Optional Prometheus-style endpoint ("metrics_port" in settings.json)
+        if self.metrics_port:
+            try:
+                self.metrics_server = MetricsServer(self.engine.metrics, self.metrics_port).start()
+                self.log(f"📈 Metrics at {self.metrics_server.url}")
+            except OSError as e:
+                self.log(f"⚠️  Metrics endpoint failed: {e}")
+        
+        self.scan_archive(self.download_path)
+        
+        def warm_up():
+            # Pick up downloads interrupted by a quit or crash
+            try:
+                resumed = self.engine.resume_pending()
+                if resumed:
+                    self.log(f"♻️  Resumed {resumed} unfinished download(s)")
+            except Exception as e:
+                self.log(f"⚠️  Could not resume downloads: {e}")
+            # Load yt-dlp now rather than when the first job starts
+            try:
+                version = preload()
+                self.mark("yt-dlp loaded (background)")
+                self.log(f"[DEBUG] yt-dlp {version} loaded")
+            except Exception as e:
+                self.log(f"⚠️  Could not load yt-dlp: {e}")
+            # Probe ffmpeg once (cached on disk until the binary changes)
+            caps = self.engine.capabilities()
+            if caps is not None:
+                self.mark("ffmpeg probed (background)")
+                self.log(f"🧰 {caps.describe()}")
+            if self.profile is not None:
+                self.profile.finish()
+                self.ui(self.show_startup_report)
+        threading.Thread(target=warm_up, name="snapvid-warm-up", daemon=True).start()
+    
+    def show_startup_report(self):
+        """Log the startup profile and save it next to the session logs"""
+        lines = self.profile.report()
+        for line in lines:
+            self.log(line)
+        try:
+            with open(data_dir() / "logs" / "startup.txt", 'w', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            print(f"Error saving startup profile: {e}")
+    
     def check_ffmpeg_status(self):
         """Check and log ffmpeg availability"""
         if self.ffmpeg_path:
             self.log(f"✅ ffmpeg found at: {self.ffmpeg_path}")
         else:
-            self.log("⚠️  ffmpeg not found - MP3 conversion may not work")
+            self.log("⚠️  ffmpeg not found - audio conversion may not work")
             self.log("   Install: brew install ffmpeg (macOS)")
     
     def center_window(self):
@@ -158,6 +255,7 @@ class App:
         self.root.bind('<Return>', lambda e: self.start_download())
         self.root.bind('<Command-q>', lambda e: self.on_closing())
         self.root.bind('<Command-l>', lambda e: self.clear_console())
+        self.root.bind('<Command-period>', lambda e: self.cancel_downloads())
     
     def load_settings(self):
         """Load saved settings"""
@@ -170,6 +268,17 @@ class App:
                     saved_path = settings.get('path')
                     if saved_path and os.path.exists(saved_path):
                         self.download_path = saved_path
+                    self.max_workers = settings.get('workers')
+                    self.fragments = settings.get('fragments')
+                    self.connections = settings.get('connections')
+                    self.postprocess_workers = settings.get('postprocess_workers')
+                    self.prefetch = settings.get('prefetch')
+                    self.scratch_path = settings.get('scratch_path')
+                    self.view_level = settings.get('log_level', INFO)
+                    self.metrics_port = settings.get('metrics_port')
+                    self.rate_limit = settings.get('rate_limit')
+                    if settings.get('bandwidth_policy') in POLICIES:
+                        self.bandwidth_policy = settings['bandwidth_policy']
         except:
             self.saved_quality = 'Best Quality'
             self.saved_format = 'MP4'
@@ -180,7 +289,17 @@ class App:
             settings = {
                 'quality': self.quality_var.get(),
                 'format': self.format_var.get(),
-                'path': self.download_path
+                'path': self.download_path,
+                'workers': self.engine.workers,
+                'fragments': self.engine.fragments,
+                'connections': self.engine.connections,
+                'postprocess_workers': self.postprocess_workers,
+                'prefetch': self.prefetch,
+                'scratch_path': self.scratch_path,
+                'log_level': self.view_level,
+                'metrics_port': self.metrics_port,
+                'rate_limit': self.engine.bandwidth.rate,
+                'bandwidth_policy': self.engine.bandwidth.policy
             }
             with open('settings.json', 'w') as f:
                 json.dump(settings, f, indent=2)
@@ -189,7 +308,13 @@ class App:
     
     def on_closing(self):
         """Handle window close"""
-        self.save_settings()
+        # Closed before the first frame: there is no engine to stop or settings to read
+        if self._engine is not None:
+            self.save_settings()
+            self._engine.close()
+        self.console_log.close()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
         self.root.quit()
     
     def setup_ui(self):
@@ -220,9 +345,31 @@ class App:
         input_section = tk.Frame(main, bg=self.bg)
         input_section.pack(fill=tk.X, pady=(0, 15))
         
-        tk.Label(input_section, text="YouTube URL", 
+        url_header = tk.Frame(input_section, bg=self.bg)
+        url_header.pack(fill=tk.X, pady=(0, 6))
+        
+        tk.Label(url_header, text="YouTube URL", 
                 font=("SF Pro Display", 11, "bold"), 
-                bg=self.bg, fg=self.text).pack(anchor='w', pady=(0, 6))
+                bg=self.bg, fg=self.text).pack(side=tk.LEFT)
+        
+        # Bulk input: URL list files and clipboard watching
+        import_btn = tk.Button(url_header, text="📄 Import list",
+                              font=("SF Pro Display", 9),
+                              bg=self.surface, fg=self.text,
+                              relief=tk.FLAT, cursor="hand2",
+                              command=self.import_url_file,
+                              padx=10, pady=2)
+        import_btn.pack(side=tk.RIGHT)
+        
+        self.watch_clipboard_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(url_header, text="Watch clipboard",
+                      variable=self.watch_clipboard_var,
+                      command=self.toggle_clipboard_watch,
+                      font=("SF Pro Display", 9),
+                      bg=self.bg, fg=self.text_secondary,
+                      selectcolor=self.surface,
+                      activebackground=self.bg,
+                      highlightthickness=0).pack(side=tk.RIGHT, padx=(0, 8))
         
         url_frame = tk.Frame(input_section, bg=self.surface, 
                             highlightbackground=self.border, 
@@ -236,9 +383,10 @@ class App:
                                   relief=tk.FLAT, insertbackground=self.accent,
                                   borderwidth=0)
         self.url_entry.pack(fill=tk.X, padx=12, pady=10)
-        self.url_entry.insert(0, "https://www.youtube.com/watch?v=...")
+        self.url_entry.insert(0, URL_PLACEHOLDER)
         self.url_entry.bind('<FocusIn>', self.on_url_focus_in)
         self.url_entry.bind('<FocusOut>', self.on_url_focus_out)
+        self.setup_drop_target()
         
         # Options grid
         options_frame = tk.Frame(main, bg=self.bg)
@@ -274,7 +422,7 @@ class App:
                  selectforeground=[('readonly', self.text)])
         
         quality_box = ttk.Combobox(quality_container, textvariable=self.quality_var,
-                                  values=["Best Quality", "1080p", "720p", "480p", "Audio Only"],
+                                  values=QUALITIES,
                                   font=("SF Pro Display", 11), state='readonly',
                                   style='Custom.TCombobox')
         quality_box.pack(fill=tk.X, padx=10, pady=8)
@@ -295,11 +443,44 @@ class App:
         self.format_var = tk.StringVar(value=getattr(self, 'saved_format', 'MP4'))
         
         format_box = ttk.Combobox(format_container, textvariable=self.format_var,
-                                 values=["MP4", "WEBM", "MP3"],
+                                 values=FORMATS,
                                  font=("SF Pro Display", 11), state='readonly',
                                  style='Custom.TCombobox')
         format_box.pack(fill=tk.X, padx=10, pady=8)
         
+        # Clip sections - time ranges or chapter names (empty = whole video)
+        clip_header = tk.Frame(main, bg=self.bg)
+        clip_header.pack(fill=tk.X, pady=(0, 6))
+        
+        tk.Label(clip_header, text="Clip", 
+                font=("SF Pro Display", 11, "bold"), 
+                bg=self.bg, fg=self.text).pack(side=tk.LEFT)
+        
+        self.precise_cuts_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(clip_header, text="Exact frames (re-encode)",
+                      variable=self.precise_cuts_var,
+                      font=("SF Pro Display", 9),
+                      bg=self.bg, fg=self.text_secondary,
+                      selectcolor=self.surface,
+                      activebackground=self.bg,
+                      highlightthickness=0).pack(side=tk.RIGHT)
+        
+        clip_frame = tk.Frame(main, bg=self.surface,
+                             highlightbackground=self.border,
+                             highlightthickness=1)
+        clip_frame.pack(fill=tk.X, pady=(0, 15))
+        
+        self.clip_var = tk.StringVar()
+        self.clip_entry = tk.Entry(clip_frame, textvariable=self.clip_var,
+                                   font=("SF Pro Display", 11),
+                                   bg=self.surface, fg=self.text_secondary,
+                                   relief=tk.FLAT, insertbackground=self.accent,
+                                   borderwidth=0)
+        self.clip_entry.pack(fill=tk.X, padx=12, pady=8)
+        self.clip_entry.insert(0, CLIP_PLACEHOLDER)
+        self.clip_entry.bind('<FocusIn>', self.on_clip_focus_in)
+        self.clip_entry.bind('<FocusOut>', self.on_clip_focus_out)
+        
         # Download button - CLEARLY VISIBLE
         btn_frame = tk.Frame(main, bg=self.bg)
         btn_frame.pack(fill=tk.X, pady=(0, 15))
@@ -369,6 +550,26 @@ class App:
                              padx=10, pady=2)
         clear_btn.pack(side=tk.RIGHT)
         
+        # Severity and per-job filters for the console view
+        level_name = next((name for name, level in LEVEL_NAMES.items()
+                           if level == self.view_level), "Info")
+        self.level_var = tk.StringVar(value=level_name)
+        level_box = ttk.Combobox(console_header, textvariable=self.level_var,
+                                 values=list(LEVEL_NAMES), width=9,
+                                 font=("SF Pro Display", 9), state='readonly',
+                                 style='Custom.TCombobox')
+        level_box.pack(side=tk.RIGHT, padx=(0, 8))
+        level_box.bind('<<ComboboxSelected>>', lambda e: self.change_console_filter())
+        
+        self.channel_var = tk.StringVar(value=ALL_JOBS)
+        self.channel_box = ttk.Combobox(console_header, textvariable=self.channel_var,
+                                        values=[ALL_JOBS], width=10,
+                                        font=("SF Pro Display", 9), state='readonly',
+                                        style='Custom.TCombobox',
+                                        postcommand=self.refresh_channels)
+        self.channel_box.pack(side=tk.RIGHT, padx=(0, 8))
+        self.channel_box.bind('<<ComboboxSelected>>', lambda e: self.change_console_filter())
+        
         log_container = tk.Frame(main, bg=self.border)
         log_container.pack(fill=tk.BOTH, expand=True)
         
@@ -384,7 +585,7 @@ class App:
         self.console.pack(fill=tk.BOTH, expand=True, padx=1, pady=1)
         self.console.insert("1.0", "● SnapVid ready!\n")
         self.console.insert(tk.END, "● Paste a YouTube URL and press Enter or click Download\n")
-        self.console.insert(tk.END, "● Shortcuts: ⌘+V (Paste), ⌘+L (Clear), ⌘+Q (Quit)\n")
+        self.console.insert(tk.END, "● Shortcuts: ⌘+V (Paste), ⌘+L (Clear), ⌘+. (Cancel), ⌘+Q (Quit)\n")
         self.console.config(state=tk.DISABLED)
         
         # Footer with open folder button
@@ -414,6 +615,22 @@ class App:
                             padx=8, pady=2)
         open_btn.pack(side=tk.LEFT, padx=5)
         
+        history_btn = tk.Button(footer_left, text="🕘 History",
+                               font=("SF Pro Display", 9),
+                               bg=self.surface, fg=self.accent,
+                               relief=tk.FLAT, cursor="hand2",
+                               command=self.show_history,
+                               padx=8, pady=2)
+        history_btn.pack(side=tk.LEFT)
+        
+        subscriptions_btn = tk.Button(footer_left, text="🔔 Subscriptions",
+                                     font=("SF Pro Display", 9),
+                                     bg=self.surface, fg=self.accent,
+                                     relief=tk.FLAT, cursor="hand2",
+                                     command=self.show_subscriptions,
+                                     padx=8, pady=2)
+        subscriptions_btn.pack(side=tk.LEFT, padx=5)
+        
         footer_right = tk.Frame(footer, bg=self.bg)
         footer_right.pack(side=tk.RIGHT)
         
@@ -430,24 +647,109 @@ class App:
         self.download_btn_canvas.itemconfig(self.btn_rect, fill=self.accent)
     
     def on_url_focus_in(self, event):
-        if self.url_var.get() == "https://www.youtube.com/watch?v=...":
+        if self.url_var.get() == URL_PLACEHOLDER:
             self.url_entry.delete(0, tk.END)
     
     def on_url_focus_out(self, event):
         if not self.url_var.get():
-            self.url_entry.insert(0, "https://www.youtube.com/watch?v=...")
+            self.url_entry.insert(0, URL_PLACEHOLDER)
+    
+    def on_clip_focus_in(self, event):
+        if self.clip_var.get() == CLIP_PLACEHOLDER:
+            self.clip_entry.delete(0, tk.END)
+            self.clip_entry.config(fg=self.text)
+    
+    def on_clip_focus_out(self, event):
+        if not self.clip_var.get().strip():
+            self.clip_var.set(CLIP_PLACEHOLDER)
+            self.clip_entry.config(fg=self.text_secondary)
+    
+    def clip_options(self):
+        """Job options for the clip field ({} for whole videos); raises SectionError"""
+        spec = self.clip_var.get().strip()
+        if not spec or spec == CLIP_PLACEHOLDER:
+            return {}
+        return {'sections': sections.parse(spec).spec,
+                'precise_cuts': self.precise_cuts_var.get()}
+    
+    def log(self, message, job=None, level=None):
+        """Log message to console (safe from any thread)"""
+        self.events.post_log(self.console_log.add(message, level, job))
     
-    def log(self, message):
-        """Log message to console"""
+    def ui(self, func, *args, **kwargs):
+        """Run a widget call on the Tk thread"""
+        if self.events.on_main_thread():
+            func(*args, **kwargs)
+        else:
+            self.events.post_call(func, *args, **kwargs)
+    
+    def set_status(self, text, fg, value=None):
+        """Update status label and optionally the progress bar"""
+        self.status_label.config(text=text, fg=fg)
+        if value is not None:
+            self.progress['value'] = value
+    
+    def pump_events(self):
+        """Drain worker events and redraw once per frame"""
+        try:
+            lines = []
+            for kind, key, payload in self.events.drain(limit=5000):
+                if kind == LOG:
+                    if self.console_visible(payload):
+                        lines.append(payload.text)
+                    continue
+                # Flush pending log lines first to keep ordering
+                if lines:
+                    self.write_console(''.join(lines))
+                    lines = []
+                if kind == PROGRESS:
+                    self.set_status(*payload)
+                elif kind == CALL:
+                    func, args, kwargs = payload
+                    func(*args, **kwargs)
+            if lines:
+                self.write_console(''.join(lines))
+        except Exception as e:
+            print(f"UI pump error: {e}")
+        finally:
+            self.root.after(1000 // FRAME_RATE, self.pump_events)
+    
+    def write_console(self, text):
+        """Append a batch of lines in one insert, keeping the widget bounded"""
+        # Only follow the tail if the user has not scrolled up
+        at_bottom = self.console.yview()[1] >= 0.999
+        self.console.config(state=tk.NORMAL)
+        self.console.insert(tk.END, text)
+        excess = int(self.console.index('end-1c').split('.')[0]) - CONSOLE_VIEW_LINES
+        if excess > 0:
+            self.console.delete('1.0', f'{excess + 1}.0')
+        if at_bottom:
+            self.console.see(tk.END)
+        self.console.config(state=tk.DISABLED)
+    
+    def console_visible(self, line):
+        return line.level >= self.view_level and (
+            self.view_job is None or line.job == self.view_job)
+    
+    def refresh_channels(self):
+        """Fill the job filter with the jobs that have logged"""
+        jobs = [f"Job #{job}" for job in reversed(self.console_log.channels())]
+        self.channel_box['values'] = [ALL_JOBS] + jobs
+    
+    def change_console_filter(self):
+        """Redraw the console from the buffer with the selected filters"""
+        self.view_level = LEVEL_NAMES.get(self.level_var.get(), INFO)
+        channel = self.channel_var.get()
+        self.view_job = None if channel == ALL_JOBS else int(channel.split('#')[1])
+        lines = self.console_log.lines(self.view_level, self.view_job, limit=CONSOLE_VIEW_LINES)
         self.console.config(state=tk.NORMAL)
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.console.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.console.see(tk.END)
+        self.console.delete('1.0', tk.END)
         self.console.config(state=tk.DISABLED)
-        self.root.update_idletasks()
+        self.write_console(''.join(line.text for line in lines))
     
     def clear_console(self):
         """Clear console output"""
+        self.console_log.clear()
         self.console.config(state=tk.NORMAL)
         self.console.delete('1.0', tk.END)
         self.console.insert('1.0', "● Console cleared.\n")
@@ -459,227 +761,509 @@ class App:
         path = filedialog.askdirectory(initialdir=self.download_path)
         if path:
             self.download_path = path
+            self.engine.download_path = path
             self.path_label.config(text=path)
             self.log(f"📁 Download path changed to: {path}")
+            self.scan_archive(path)
             self.save_settings()
     
     def open_download_folder(self):
         """Open download folder in Finder"""
+        self.open_folder(self.download_path)
+    
+    def open_folder(self, path):
+        """Open a folder in Finder / Explorer / the desktop's file manager"""
         try:
             if sys.platform == 'darwin':  # macOS
-                subprocess.run(['open', self.download_path])
+                subprocess.run(['open', path])
             elif sys.platform == 'win32':  # Windows
-                subprocess.run(['explorer', self.download_path])
+                subprocess.run(['explorer', path])
             else:  # Linux
-                subprocess.run(['xdg-open', self.download_path])
-            self.log(f"📂 Opened folder: {self.download_path}")
+                subprocess.run(['xdg-open', path])
+            self.log(f"📂 Opened folder: {path}")
         except Exception as e:
             self.log(f"❌ Error opening folder: {e}")
     
+    # ========== HISTORY ==========
+    def show_history(self):
+        """Searchable history window; pages are fetched as the list scrolls"""
+        history = self.engine.history
+        if history is None:
+            return
+        if self.history_window is not None and self.history_window.winfo_exists():
+            self.history_window.lift()
+            return
+        win = self.history_window = tk.Toplevel(self.root)
+        win.title("Download History")
+        win.geometry("760x480")
+        win.configure(bg=self.bg)
+        
+        top = tk.Frame(win, bg=self.bg)
+        top.pack(fill=tk.X, padx=15, pady=(15, 10))
+        
+        query_var = tk.StringVar()
+        search = tk.Entry(top, textvariable=query_var,
+                         font=("SF Pro Display", 11),
+                         bg=self.surface, fg=self.text,
+                         relief=tk.FLAT, insertbackground=self.accent)
+        search.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=5)
+        search.focus()
+        
+        export_btn = tk.Button(top, text="💾 Export",
+                              font=("SF Pro Display", 9),
+                              bg=self.surface, fg=self.accent,
+                              relief=tk.FLAT, cursor="hand2",
+                              command=lambda: self.export_history(query_var.get()),
+                              padx=8, pady=2)
+        export_btn.pack(side=tk.RIGHT, padx=(8, 0))
+        
+        count_label = tk.Label(top, text="", font=("SF Pro Display", 9),
+                              bg=self.bg, fg=self.text_secondary)
+        count_label.pack(side=tk.RIGHT, padx=(8, 0))
+        
+        columns = ('finished', 'title', 'format', 'size')
+        tree = ttk.Treeview(win, columns=columns, show='headings', selectmode='browse')
+        for column, heading, width, stretch in (('finished', "Date", 130, False),
+                                                ('title', "Title", 420, True),
+                                                ('format', "Format", 80, False),
+                                                ('size', "Size", 90, False)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, stretch=stretch)
+        scrollbar = ttk.Scrollbar(win, orient=tk.VERTICAL, command=tree.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, padx=(0, 15), pady=(0, 15))
+        tree.pack(fill=tk.BOTH, expand=True, padx=(15, 0), pady=(0, 15))
+        
+        # Keyset cursor of the last loaded row; None once every match is shown
+        page = {'cursor': None, 'more': True, 'search': None, 'paths': {}}
+        
+        def load_page():
+            entries = history.search(query_var.get(), PAGE_SIZE, page['cursor'])
+            for entry in entries:
+                finished = datetime.fromtimestamp(entry['finished']).strftime('%Y-%m-%d %H:%M')
+                size = format_bytes(entry['filesize']) if entry['filesize'] else ""
+                tree.insert('', tk.END, iid=str(entry['id']),
+                           values=(finished, entry['title'] or entry['url'], entry['format'] or "", size))
+                page['paths'][str(entry['id'])] = entry['filepath'] or entry['path']
+            page['more'] = len(entries) == PAGE_SIZE
+            if entries:
+                page['cursor'] = (entries[-1]['finished'], entries[-1]['id'])
+        
+        def reload():
+            page['search'] = None
+            tree.delete(*tree.get_children())
+            page.update(cursor=None, more=True, paths={})
+            load_page()
+            count_label.config(text=f"{history.count(query_var.get())} downloads")
+        
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            if page['more'] and float(last) >= 1.0:
+                load_page()
+        
+        def on_type(*_):
+            # Search once typing pauses rather than on every key
+            if page['search'] is not None:
+                win.after_cancel(page['search'])
+            page['search'] = win.after(250, reload)
+        
+        def on_open(event):
+            path = page['paths'].get(tree.focus())
+            if path:
+                self.open_folder(path if os.path.isdir(path) else os.path.dirname(path))
+        
+        tree.configure(yscrollcommand=on_scroll)
+        tree.bind('<Double-1>', on_open)
+        query_var.trace_add('write', on_type)
+        reload()
+    
+    def show_subscriptions(self):
+        """Subscribed channels/playlists; new uploads are queued whenever one is due"""
+        store = self.engine.subscriptions
+        if store is None:
+            return
+        if self.subscriptions_window is not None and self.subscriptions_window.winfo_exists():
+            self.subscriptions_window.lift()
+            return
+        win = self.subscriptions_window = tk.Toplevel(self.root)
+        win.title("Subscriptions")
+        win.geometry("760x420")
+        win.configure(bg=self.bg)
+        
+        top = tk.Frame(win, bg=self.bg)
+        top.pack(fill=tk.X, padx=15, pady=(15, 10))
+        
+        url_var = tk.StringVar()
+        url = self.url_var.get().strip()
+        if url and url != URL_PLACEHOLDER:
+            url_var.set(url)
+        url_entry = tk.Entry(top, textvariable=url_var,
+                            font=("SF Pro Display", 11),
+                            bg=self.surface, fg=self.text,
+                            relief=tk.FLAT, insertbackground=self.accent)
+        url_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=5)
+        url_entry.focus()
+        
+        interval_var = tk.StringVar(value="6h")
+        ttk.Combobox(top, textvariable=interval_var, values=SYNC_INTERVALS,
+                     width=5, font=("SF Pro Display", 10)).pack(side=tk.LEFT, padx=(8, 0))
+        
+        columns = ('title', 'interval', 'synced', 'new', 'status')
+        tree = ttk.Treeview(win, columns=columns, show='headings', selectmode='browse')
+        for column, heading, width, stretch in (('title', "Channel / playlist", 330, True),
+                                                ('interval', "Every", 60, False),
+                                                ('synced', "Last sync", 130, False),
+                                                ('new', "New", 50, False),
+                                                ('status', "Status", 150, False)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, stretch=stretch)
+        
+        def reload():
+            selected = tree.focus()
+            tree.delete(*tree.get_children())
+            for sub in store.all():
+                synced = datetime.fromtimestamp(sub['last_sync']).strftime('%Y-%m-%d %H:%M') \
+                    if sub['last_sync'] else "never"
+                status = sub['last_error'] or ("" if sub['enabled'] else "paused")
+                tree.insert('', tk.END, iid=str(sub['id']),
+                           values=(sub['title'] or sub['url'], format_interval(sub['interval']),
+                                   synced, sub['last_new'] if sub['last_new'] is not None else "",
+                                   status))
+            if selected and tree.exists(selected):
+                tree.focus(selected)
+                tree.selection_set(selected)
+        
+        def refresh():
+            if win.winfo_exists():
+                reload()
+                win.after(SUBSCRIPTIONS_REFRESH_MS, refresh)
+        
+        def subscribe():
+            url = url_var.get().strip()
+            if not url:
+                return
+            try:
+                interval = parse_interval(interval_var.get())
+            except ValueError as e:
+                messagebox.showerror("Subscriptions", str(e), parent=win)
+                return
+            self.engine.subscribe(url, self.quality_var.get(), self.format_var.get(), interval,
+                                  self.download_path)
+            self.log(f"🔔 Subscribed to {url} (every {format_interval(interval)})")
+            url_var.set("")
+            reload()
+        
+        def sync_now():
+            if tree.focus():
+                self.engine.sync_now(int(tree.focus()))
+        
+        def remove():
+            if tree.focus() and self.engine.unsubscribe(int(tree.focus())):
+                reload()
+        
+        for text, command in (("➕ Subscribe", subscribe), ("🔄 Sync now", sync_now),
+                              ("🗑️ Remove", remove)):
+            tk.Button(top, text=text,
+                     font=("SF Pro Display", 9),
+                     bg=self.surface, fg=self.accent,
+                     relief=tk.FLAT, cursor="hand2",
+                     command=command,
+                     padx=8, pady=2).pack(side=tk.LEFT, padx=(8, 0))
+        
+        tree.pack(fill=tk.BOTH, expand=True, padx=15, pady=(0, 15))
+        refresh()
+    
+    def export_history(self, query=''):
+        """Save the history (or the current search) as CSV or JSON"""
+        path = filedialog.asksaveasfilename(
+            title="Export history",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON", "*.json"), ("JSON lines", "*.jsonl")])
+        if not path:
+            return
+        def export():
+            try:
+                written = self.engine.history.export_file(path, query)
+                self.log(f"🕘 History: exported {written} entries to {path}")
+            except Exception as e:
+                self.log(f"❌ History export failed: {e}")
+        threading.Thread(target=export, daemon=True).start()
+    
     def start_download(self):
         """Start download process"""
         url = self.url_var.get().strip()
-        if not url or url == "https://www.youtube.com/watch?v=...":
+        if not url or url == URL_PLACEHOLDER:
             messagebox.showerror("Error", "Please enter a valid YouTube URL")
             return
         
         quality = self.quality_var.get()
         format_type = self.format_var.get()
+        try:
+            clip = self.clip_options()
+        except sections.SectionError as e:
+            messagebox.showerror("Clip", str(e))
+            return
         
-        # Disable button
-        self.download_btn_canvas.itemconfig(self.btn_text, text="Downloading...")
-        self.download_btn_canvas.itemconfig(self.btn_rect, fill=self.text_secondary)
-        
-        thread = threading.Thread(target=self.download,
-                                 args=(url, quality, format_type),
-                                 daemon=True)
-        thread.start()
-    
-    def download(self, url, quality, format_type):
-        """Download video with real-time progress"""
-        self.status_label.config(text="● Starting download...", fg=self.accent)
-        self.progress['value'] = 0
-        self.log("="*60)
-        self.log(f"🚀 Starting download...")
-        self.log(f"📎 URL: {url}")
-        self.log(f"🎯 Quality: {quality}")
-        self.log(f"📦 Format: {format_type}")
-        self.log("-"*60)
+        if len(url.split()) > 1:
+            # A pasted list - queue every URL in it
+            self.ingest(lambda: parse(url), "Pasted list", clip)
+            self.url_var.set("")
+            return
         
+        job, created = self.engine.submit(url, quality, format_type, **clip)
+        if not created:
+            self.log(f"⏭️  Already queued as job #{job.id}: {url}")
+            return
+        if clip:
+            self.log(f"📥 Queued job #{job.id}: {url} ✂️  {clip['sections']}")
+        else:
+            self.log(f"📥 Queued job #{job.id}: {url}")
+    
+    # ========== BULK INPUT ==========
+    def ingest(self, read, title, options=None):
+        """
+        Parse and queue a URL list on a background thread; `read()` returns
+        ingest items and `options` go to every job (clip sections).
+        The Tk loop only sees the summary log line.
+        """
+        options = options or {}
+        quality = self.quality_var.get()
+        format_type = self.format_var.get()
+        
+        def run():
+            try:
+                items = read()
+                if not items:
+                    self.log(f"⚠️  {title}: no URLs found")
+                    return
+                stats = self.engine.submit_many(items, quality, format_type, title=title, **options)
+                self.log(f"📥 {title}: {len(items)} URL(s) - queued {stats['queued']}, "
+                         f"{stats['playlists']} playlist(s), {stats['archived']} already downloaded, "
+                         f"{stats['duplicates']} already queued")
+            except Exception as e:
+                self.log(f"❌ Import failed: {e}")
+        threading.Thread(target=run, daemon=True).start()
+    
+    def import_url_file(self):
+        """Queue every URL in a text, CSV or JSON file"""
+        path = filedialog.askopenfilename(
+            title="Import URL list",
+            filetypes=[("URL lists", "*.txt *.csv *.json *.jsonl"), ("All files", "*")])
+        if path:
+            self.ingest(lambda: parse_file(path), os.path.basename(path))
+    
+    def toggle_clipboard_watch(self):
+        if self.watch_clipboard_var.get():
+            # Only URLs copied from now on count
+            self.clipboard_last = self.read_clipboard()
+            self.log("📋 Watching the clipboard for URLs")
+            self.root.after(CLIPBOARD_POLL_MS, self.poll_clipboard)
+        else:
+            self.log("📋 Stopped watching the clipboard")
+    
+    def read_clipboard(self):
         try:
-            # Format selection
-            if quality == "Audio Only" or format_type == "MP3":
-                fmt = "bestaudio/best"
-            elif quality == "1080p":
-                fmt = "best[height<=1080]"
-            elif quality == "720p":
-                fmt = "best[height<=720]"
-            elif quality == "480p":
-                fmt = "best[height<=480]"
-            else:
-                fmt = "best"
-            
-            # Options with real-time progress
-            ydl_opts = {
-                'format': fmt,
-                'outtmpl': os.path.join(self.download_path, '%(title)s.%(ext)s'),
-                'progress_hooks': [self.progress_hook],
-                'quiet': False,
-                'no_warnings': False,
-                'logger': ConsoleLogger(self),
-                'noprogress': False,
-                'progress_with_newline': False,
-            }
-            
-            # Add ffmpeg location if available
-            if self.ffmpeg_path:
-                ydl_opts['ffmpeg_location'] = self.ffmpeg_path
-            
-            # Audio conversion
-            if format_type == "MP3" or quality == "Audio Only":
-                if not self.ffmpeg_path:
-                    self.log("⚠️  Warning: ffmpeg not found, MP3 conversion may fail")
-                
-                ydl_opts['postprocessors'] = [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '320',
-                }]
-            
-            self.log("📡 Fetching video information...")
-            
-            # Download
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                title = info.get('title', 'Video')
-                duration = info.get('duration', 0)
-                filesize = info.get('filesize', 0)
-            
-            self.progress['value'] = 100
-            self.status_label.config(text=f"✓ Download complete: {title[:35]}...",
-                                   fg=self.success)
-            
-            size_mb = filesize / (1024 * 1024) if filesize else 0
-            self.log("-"*60)
-            self.log(f"✅ Successfully downloaded!")
-            self.log(f"📝 Title: {title}")
-            self.log(f"⏱️  Duration: {duration//60}m {duration%60}s")
-            if size_mb > 0:
-                self.log(f"💾 Size: {size_mb:.2f} MB")
-            self.log(f"📁 Saved to: {self.download_path}")
-            self.log("="*60)
-            
-            # Add to history
-            self.download_history.append({
-                'title': title,
-                'url': url,
-                'time': datetime.now().isoformat(),
-                'path': self.download_path,
-                'quality': quality,
-                'format': format_type
-            })
-            
-            # Save settings
+            return self.root.clipboard_get()
+        except tk.TclError:
+            return None
+    
+    def poll_clipboard(self):
+        """Queue URLs in newly copied text while the watch is on"""
+        if not self.watch_clipboard_var.get():
+            return
+        text = self.read_clipboard()
+        if text and text != self.clipboard_last:
+            self.clipboard_last = text
+            if '.' in text and '/' in text:
+                self.ingest(lambda: parse(text), "Clipboard")
+        self.root.after(CLIPBOARD_POLL_MS, self.poll_clipboard)
+    
+    def setup_drop_target(self):
+        """Accept dropped files and text on the URL field (needs tkinterdnd2)"""
+        if TkinterDnD is None:
+            return
+        try:
+            TkinterDnD._require(self.root)
+            self.url_entry.drop_target_register(DND_FILES, DND_TEXT)
+            self.url_entry.dnd_bind('<<Drop>>', self.on_drop)
+        except Exception as e:
+            print(f"Drag-and-drop unavailable: {e}")
+    
+    def on_drop(self, event):
+        paths = self.root.tk.splitlist(event.data)
+        files = [path for path in paths if os.path.isfile(path)]
+        if files:
+            for path in files:
+                self.ingest(lambda path=path: parse_file(path), os.path.basename(path))
+        else:
+            data = event.data
+            self.ingest(lambda: parse(data), "Dropped list")
+        return event.action
+    
+    def cancel_downloads(self):
+        """Cancel every queued and running job"""
+        cancelled = self.engine.cancel_all()
+        if cancelled:
+            self.log(f"⏹️  Cancelling {cancelled} download(s)...")
+    
+    def scan_archive(self, path):
+        """Register existing files in the archive and history without blocking the UI"""
+        def scan():
+            try:
+                added = self.engine.scan_output(path)
+                if added:
+                    self.log(f"🗂️  Archive: registered {added} existing file(s) in {path}")
+                imported = self.engine.import_history(path)
+                if imported:
+                    self.log(f"🕘 History: imported {imported} existing file(s) from {path}")
+            except Exception as e:
+                self.log(f"⚠️  Archive scan failed: {e}")
+        threading.Thread(target=scan, daemon=True).start()
+    
+    def on_engine_log(self, message, job):
+        self.log(message, job.id if job is not None else None)
+    
+    def on_job_change(self, job):
+        """Engine callback - may run on a worker thread"""
+        # Capture the state now - the job may move on before the UI runs
+        self.ui(self.update_queue_state, job, job.state)
+    
+    def update_queue_state(self, job, state):
+        """Update button and status for a job state change"""
+        # A bulk import changes thousands of jobs at once - redraw the
+        # button once per frame instead of once per job
+        if not self.queue_refresh_pending:
+            self.queue_refresh_pending = True
+            self.root.after(1000 // FRAME_RATE, self.refresh_queue_button)
+        
+        if state == RUNNING:
+            self.set_status("● Starting download...", self.accent, 0)
+        elif state == QUEUED and job.attempts:
+            if not job.options.get('batch'):
+                self.set_status(f"● Retrying (attempt {job.attempts + 1})...", self.accent, 0)
+        elif state == PROCESSING:
+            if not job.options.get('batch'):
+                self.set_status("● Processing with ffmpeg...", self.accent, 100)
+        elif state == DONE and job.result.get('skipped') and 'entries' not in job.result:
+            if not job.options.get('batch'):
+                self.set_status(f"✓ Already downloaded: {job.result['title'][:35]}", self.success, 100)
+        elif state in (DONE, FAILED) and (job.options.get('sync') or job.options.get('subscription')):
+            # Background subscription work never pops up a dialog
+            self.show_subscription_state(job, state)
+        elif state == DONE and 'entries' in job.result:
+            # Playlist expanded - items report on their own
+            self.set_status(f"● Playlist queued: {job.result['entries']} item(s)", self.accent, 0)
+        elif state == DONE and job.options.get('batch'):
+            # Recorded in the history by the engine; the batch reports once at the end
+            pass
+        elif state == FAILED and job.options.get('batch'):
+            self.log(f"❌ Playlist item failed: {job.url}")
+        elif state == DONE:
+            result = job.result
+            title = result['title']
+            self.set_status(f"✓ Download complete: {title[:35]}...", self.success, 100)
             self.save_settings()
             
             messagebox.showinfo("Success",
-                              f"Download complete!\n\n{title}\n\nSaved to:\n{self.download_path}")
-        
-        except Exception as e:
-            self.progress['value'] = 0
-            self.status_label.config(text=f"✗ Download failed", fg=self.error)
-            self.log("-"*60)
-            self.log(f"❌ Error: {str(e)}")
-            self.log("="*60)
-            messagebox.showerror("Download Failed", str(e))
-        
-        finally:
-            # Re-enable button
+                              f"Download complete!\n\n{title}\n\nSaved to:\n{result['path']}")
+        elif state == FAILED:
+            self.set_status("✗ Download failed", self.error, 0)
+            messagebox.showerror("Download Failed", str(job.error))
+        elif state == CANCELLED:
+            self.log(f"🚫 Job #{job.id} cancelled")
+    
+    def show_subscription_state(self, job, state):
+        """Console/status line for a subscription sync or a download it queued"""
+        if job.options.get('sync'):
+            if state == DONE and job.result.get('entries'):
+                self.set_status(f"🔔 {job.result['title'][:35]}: {job.result['entries']} new", self.accent, 0)
+            elif state == FAILED:
+                self.log(f"❌ Subscription sync failed: {job.url} ({job.error})")
+        elif state == FAILED:
+            self.log(f"❌ Subscription download failed: {job.url} ({job.error})")
+    
+    def refresh_queue_button(self):
+        """Show queue counts on the download button"""
+        self.queue_refresh_pending = False
+        counts = self.engine.counts()
+        busy = counts[RUNNING] + counts[QUEUED] + counts[PROCESSING]
+        if busy:
+            text = f"Downloading... ({counts[RUNNING]} active, {counts[QUEUED]} queued)"
+            if counts[PROCESSING]:
+                text = text[:-1] + f", {counts[PROCESSING]} processing)"
+            self.download_btn_canvas.itemconfig(self.btn_text, text=text)
+            self.download_btn_canvas.itemconfig(self.btn_rect, fill=self.text_secondary)
+        else:
             self.download_btn_canvas.itemconfig(self.btn_text, text="⬇ Download Video")
             self.download_btn_canvas.itemconfig(self.btn_rect, fill=self.accent)
     
-    def progress_hook(self, d):
-        """Progress callback - Real-time smooth update"""
-        try:
-            if d['status'] == 'downloading':
-                # Try to get total bytes from multiple sources
-                total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
-                downloaded = d.get('downloaded_bytes', 0)
+    def on_batch_done(self, batch):
+        """Engine callback - a whole playlist finished"""
+        self.ui(self.show_batch_done, batch.snapshot())
+    
+    def show_batch_done(self, stats):
+        color = self.success if not stats['failed'] else self.error
+        if stats.get('subscription') is not None:
+            # New uploads from a scheduled sync - no dialog for unattended work
+            self.set_status(f"✓ {stats['title']}: {stats['done']}/{stats['jobs']} downloaded", color, 100)
+            self.log(f"🔔 {stats['title']}: {stats['done']} downloaded, {stats['failed']} failed, "
+                     f"{stats['cancelled']} cancelled")
+            return
+        self.set_status(f"✓ Playlist complete: {stats['done']}/{stats['jobs']} downloaded", color, 100)
+        self.save_settings()
+        messagebox.showinfo("Playlist Complete",
+                            f"{stats['title']}\n\n{stats['done']} downloaded, "
+                            f"{stats['failed']} failed, {stats['cancelled']} cancelled")
+    
+    def on_engine_progress(self, job, record):
+        """Progress callback - posts coalesced updates to the UI pump"""
+        status = record['status']
+        if 'batch' in record:
+            # Playlist item - show aggregate progress for the whole batch
+            stats = record['batch']
+            status_text = (f"● Playlist: {stats['finished']}/{stats['jobs']} items • "
+                           f"{stats['downloaded'] / (1024 * 1024):.1f} MB • "
+                           f"{stats['throughput'] / (1024 * 1024):.2f} MB/s")
+            self.events.post_progress(('batch', stats['batch']),
+                                      (status_text, self.accent, stats['percent']))
+            return
+        if status == 'downloading':
+            downloaded = record['downloaded']
+            total = record['total']
+            speed = record['speed']
+            percent = record['percent']
+            
+            if percent is not None:
+                # Calculate sizes
+                downloaded_mb = downloaded / (1024 * 1024)
+                total_mb = total / (1024 * 1024)
+                status_text = f"● Downloading... {percent:.1f}% ({downloaded_mb:.1f}/{total_mb:.1f} MB)"
                 
-                if total > 0 and downloaded > 0:
-                    # Calculate percentage
-                    percent = min((downloaded / total) * 100, 100)  # Cap at 100%
-                    
-                    # Update progress bar smoothly
-                    self.progress['value'] = percent
-                    
-                    # Calculate sizes
-                    downloaded_mb = downloaded / (1024 * 1024)
-                    total_mb = total / (1024 * 1024)
-                    
-                    # Get speed and ETA
-                    speed = d.get('speed', 0)
-                    eta = d.get('eta', 0)
-                    
-                    if speed and speed > 0:
-                        speed_mb = speed / (1024 * 1024)
-                        
-                        # Build status text
-                        if eta:
-                            mins, secs = divmod(eta, 60)
-                            eta_text = f"{int(mins)}:{int(secs):02d}"
-                            status_text = f"● Downloading... {percent:.1f}% ({downloaded_mb:.1f}/{total_mb:.1f} MB) • {speed_mb:.2f} MB/s • ETA {eta_text}"
-                        else:
-                            status_text = f"● Downloading... {percent:.1f}% ({downloaded_mb:.1f}/{total_mb:.1f} MB) • {speed_mb:.2f} MB/s"
-                        
-                        self.status_label.config(text=status_text, fg=self.accent)
-                    else:
-                        # No speed info
-                        self.status_label.config(
-                            text=f"● Downloading... {percent:.1f}% ({downloaded_mb:.1f}/{total_mb:.1f} MB)",
-                            fg=self.accent)
-                    
-                    # Force immediate GUI update - THIS IS KEY!
-                    self.progress.update()
-                    self.status_label.update()
-                    self.root.update()
-                    
-                else:
-                    # Indeterminate progress (total unknown)
-                    if downloaded > 0:
-                        downloaded_mb = downloaded / (1024 * 1024)
-                        speed = d.get('speed', 0)
-                        
-                        if speed and speed > 0:
-                            speed_mb = speed / (1024 * 1024)
-                            self.status_label.config(
-                                text=f"● Downloading... {downloaded_mb:.1f} MB • {speed_mb:.2f} MB/s",
-                                fg=self.accent)
-                        else:
-                            self.status_label.config(
-                                text=f"● Downloading... {downloaded_mb:.1f} MB",
-                                fg=self.accent)
-                        
-                        self.status_label.update()
-                        self.root.update()
-                        
-            elif d['status'] == 'finished':
-                # Download complete, processing
-                self.progress['value'] = 100
-                self.status_label.config(text="● Processing... (merging/converting)", fg=self.accent)
-                self.log("⚙️  Download finished, processing file...")
-                self.progress.update()
-                self.status_label.update()
-                self.root.update()
+                # Get speed and ETA
+                eta = record['eta']
+                if speed > 0:
+                    status_text += f" • {speed / (1024 * 1024):.2f} MB/s"
+                    if eta:
+                        mins, secs = divmod(eta, 60)
+                        status_text += f" • ETA {int(mins)}:{int(secs):02d}"
                 
-            elif d['status'] == 'error':
-                self.log("❌ Download error occurred")
+                self.events.post_progress(job.id, (status_text, self.accent, percent))
                 
-        except Exception as e:
-            # Silent fail - don't interrupt download
-            print(f"Progress hook error: {e}")
+            elif downloaded > 0:
+                # Indeterminate progress (total unknown)
+                status_text = f"● Downloading... {downloaded / (1024 * 1024):.1f} MB"
+                if speed > 0:
+                    status_text += f" • {speed / (1024 * 1024):.2f} MB/s"
+                self.events.post_progress(job.id, (status_text, self.accent))
+                
+        elif status == 'finished':
+            # Download complete, processing
+            self.events.post_progress(job.id, ("● Processing... (merging/converting)", self.accent, 100))
+            self.log("⚙️  Download finished, processing file...")
+            
+        elif status == 'error':
+            self.log("❌ Download error occurred")
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = App(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
@@ -0,0 +1,330 @@
+"""
+SnapVid - Metrics
+Per-job timings and counters with JSON-lines export and an optional
+Prometheus-style text endpoint, to tell whether extraction, bandwidth
+or ffmpeg is the bottleneck on a run
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Finished jobs kept in memory for snapshots
+FINISHED_CAPACITY = 1000
+
+# Phases timed per job, in pipeline order
+PHASES = ('queue', 'setup', 'extraction', 'first_byte', 'transfer', 'postprocess_wait',
+          'postprocess', 'merge', 'remux', 'convert', 'total')
+
+
+class JobMetrics:
+    """
+    Timings, bytes and speeds for one job. Spans are (name, start, end)
+    on the monotonic clock relative to when the job was queued; the
+    phase durations in `timings` are derived from them.
+    """
+
+    def __init__(self, job):
+        self.job = job.id
+        self.url = job.url
+        self.state = job.state
+        self.created = time.monotonic()
+        self.started = None
+        self.extracted = None
+        self.first_byte = None
+        self.transfer_end = None
+        self.finished = None
+        self.spans = []
+        self.timings = {}
+        self.bytes = 0
+        self.retries = 0
+        self.cached = None
+        self.peak_speed = 0
+        self.cpu_time = 0.0
+        self._transfers = {}
+
+    def span(self, name, start, end):
+        self.spans.append((name, round(start - self.created, 4), round(end - self.created, 4)))
+        self.timings[name] = round(self.timings.get(name, 0) + end - start, 4)
+
+    @property
+    def avg_speed(self):
+        if self.first_byte is None or not self.bytes:
+            return 0
+        end = self.transfer_end or time.monotonic()
+        return self.bytes / max(end - self.first_byte, 1e-6)
+
+    def to_dict(self):
+        return {
+            'job': self.job,
+            'url': self.url,
+            'state': self.state,
+            'timings': dict(self.timings),
+            'spans': list(self.spans),
+            'bytes': self.bytes,
+            'retries': self.retries,
+            'cached': self.cached,
+            'avg_speed': round(self.avg_speed),
+            'peak_speed': round(self.peak_speed),
+            'cpu_time': round(self.cpu_time, 3),
+        }
+
+
+class Metrics:
+    """
+    Thread-safe registry fed by the engine. Finished jobs are appended to
+    `jsonl_path` as they complete when one is given.
+    """
+
+    def __init__(self, jsonl_path=None):
+        self.jsonl_path = str(jsonl_path) if jsonl_path else None
+        self._lock = threading.Lock()
+        self._active = OrderedDict()
+        self._finished = deque(maxlen=FINISHED_CAPACITY)
+        self._states = {}
+        self._phase_seconds = {}
+        self._phase_counts = {}
+        self._bytes = 0
+        self._retries = 0
+        self._cache_hits = 0
+        self._cpu_time = 0.0
+        self.started = time.time()
+
+    def _get(self, job):
+        metrics = self._active.get(job.id)
+        if metrics is None:
+            metrics = self._active[job.id] = JobMetrics(job)
+        return metrics
+
+    # ========== RECORDING ==========
+    def job_queued(self, job):
+        with self._lock:
+            self._get(job)
+
+    def job_started(self, job):
+        now = time.monotonic()
+        with self._lock:
+            metrics = self._get(job)
+            metrics.state = job.state
+            metrics.started = now
+            metrics.span('queue', metrics.created, now)
+
+    def job_state(self, job):
+        with self._lock:
+            if job.id in self._active:
+                self._active[job.id].state = job.state
+
+    def extraction(self, job, started, cached=False):
+        now = time.monotonic()
+        with self._lock:
+            metrics = self._get(job)
+            metrics.cached = cached
+            if metrics.started is not None and 'setup' not in metrics.timings:
+                # Session creation and URL matching before the first extraction
+                metrics.span('setup', metrics.started, started)
+            metrics.span('extraction', started, now)
+            metrics.extracted = now
+            if cached:
+                self._cache_hits += 1
+
+    def progress(self, job, record):
+        """Fold one engine progress record into the job's byte and speed figures"""
+        now = time.monotonic()
+        with self._lock:
+            metrics = self._get(job)
+            key = record.get('filename')
+            if record['downloaded'] and metrics.first_byte is None:
+                metrics.first_byte = now
+                # Request latency: from the end of extraction to the first data
+                metrics.span('first_byte', metrics.extracted or metrics.started or metrics.created, now)
+            if record['downloaded']:
+                previous = metrics._transfers.get(key, 0)
+                metrics._transfers[key] = record['downloaded']
+                metrics.bytes += max(record['downloaded'] - previous, 0)
+            if record['speed'] and record['speed'] > metrics.peak_speed:
+                metrics.peak_speed = record['speed']
+            if record['status'] == 'finished' and metrics.first_byte is not None:
+                metrics.transfer_end = now
+
+    def postprocess(self, job, kind, queued, started, ended, cpu_time=None):
+        with self._lock:
+            metrics = self._get(job)
+            metrics.span('postprocess_wait', queued, started)
+            metrics.span('postprocess', started, ended)
+            metrics.span(kind, started, ended)
+            if cpu_time:
+                metrics.cpu_time += cpu_time
+                self._cpu_time += cpu_time
+
+    def retry(self, job):
+        with self._lock:
+            self._get(job).retries += 1
+            self._retries += 1
+
+    def job_finished(self, job):
+        now = time.monotonic()
+        with self._lock:
+            metrics = self._active.pop(job.id, None)
+            if metrics is None:
+                return None
+            metrics.state = job.state
+            metrics.finished = now
+            if metrics.first_byte is not None:
+                metrics.span('transfer', metrics.first_byte, metrics.transfer_end or now)
+            metrics.span('total', metrics.created, now)
+            self._finished.append(metrics)
+            self._states[job.state] = self._states.get(job.state, 0) + 1
+            self._bytes += metrics.bytes
+            for phase, seconds in metrics.timings.items():
+                self._phase_seconds[phase] = self._phase_seconds.get(phase, 0) + seconds
+                self._phase_counts[phase] = self._phase_counts.get(phase, 0) + 1
+            record = metrics.to_dict()
+        if self.jsonl_path:
+            try:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                print(f"Metrics export error: {e}")
+        return record
+
+    # ========== READING ==========
+    def jobs(self, include_active=True):
+        """Per-job dicts, finished first then in-flight"""
+        with self._lock:
+            jobs = [m.to_dict() for m in self._finished]
+            if include_active:
+                jobs += [m.to_dict() for m in self._active.values()]
+        return jobs
+
+    def job(self, job_id):
+        with self._lock:
+            metrics = self._active.get(job_id)
+            if metrics is None:
+                metrics = next((m for m in self._finished if m.job == job_id), None)
+            return metrics.to_dict() if metrics is not None else None
+
+    def counters(self):
+        """Aggregate counters across every finished job"""
+        with self._lock:
+            active = {}
+            for metrics in self._active.values():
+                active[metrics.state] = active.get(metrics.state, 0) + 1
+            return {
+                'uptime': round(time.time() - self.started, 1),
+                'jobs': dict(self._states),
+                'active': active,
+                'bytes': self._bytes,
+                'retries': self._retries,
+                'cache_hits': self._cache_hits,
+                'cpu_time': round(self._cpu_time, 3),
+                'phase_seconds': {k: round(v, 4) for k, v in self._phase_seconds.items()},
+                'phase_counts': dict(self._phase_counts),
+            }
+
+    def bottleneck(self):
+        """Phase with the largest share of job time (excluding totals)"""
+        counters = self.counters()['phase_seconds']
+        phases = {k: v for k, v in counters.items() if k not in ('total', 'postprocess')}
+        if not phases:
+            return None
+        return max(phases, key=phases.get)
+
+    def export_jsonl(self, path):
+        """Write every known job as one JSON line; returns the count"""
+        jobs = self.jobs()
+        with open(path, 'w', encoding='utf-8') as f:
+            for job in jobs:
+                f.write(json.dumps(job) + "\n")
+        return len(jobs)
+
+    def prometheus_text(self):
+        """Counters in the Prometheus text exposition format"""
+        counters = self.counters()
+        lines = [
+            "# HELP snapvid_jobs_total Jobs finished, by final state",
+            "# TYPE snapvid_jobs_total counter",
+        ]
+        for state, count in sorted(counters['jobs'].items()):
+            lines.append(f'snapvid_jobs_total{{state="{state}"}} {count}')
+        lines += [
+            "# HELP snapvid_jobs_active Jobs in flight, by state",
+            "# TYPE snapvid_jobs_active gauge",
+        ]
+        for state, count in sorted(counters['active'].items()):
+            lines.append(f'snapvid_jobs_active{{state="{state}"}} {count}')
+        lines += [
+            "# HELP snapvid_phase_seconds Time spent per pipeline phase",
+            "# TYPE snapvid_phase_seconds summary",
+        ]
+        for phase in PHASES:
+            if phase in counters['phase_seconds']:
+                lines.append(f'snapvid_phase_seconds_sum{{phase="{phase}"}} '
+                             f'{counters["phase_seconds"][phase]}')
+                lines.append(f'snapvid_phase_seconds_count{{phase="{phase}"}} '
+                             f'{counters["phase_counts"][phase]}')
+        for name, help_text, value in (
+                ('bytes_total', 'Bytes downloaded by finished jobs', counters['bytes']),
+                ('retries_total', 'Download retries', counters['retries']),
+                ('cache_hits_total', 'Extractions served from the info cache', counters['cache_hits']),
+                ('ffmpeg_cpu_seconds_total', 'CPU time used by ffmpeg', counters['cpu_time'])):
+            lines += [f"# HELP snapvid_{name} {help_text}",
+                      f"# TYPE snapvid_{name} counter",
+                      f"snapvid_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+# ========== HTTP ENDPOINT ==========
+def _handler_class():
+    # http.server pulls in email/html/mimetypes - only load it when serving
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            metrics = self.server.metrics
+            if self.path == '/metrics':
+                body, content_type = metrics.prometheus_text(), 'text/plain; version=0.0.4'
+            elif self.path == '/jobs':
+                body, content_type = "".join(json.dumps(j) + "\n" for j in metrics.jobs()), 'application/x-ndjson'
+            else:
+                self.send_error(404)
+                return
+            data = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return MetricsHandler
+
+
+class MetricsServer:
+    """Serves /metrics (Prometheus text) and /jobs (JSON lines) on localhost"""
+
+    def __init__(self, metrics, port=0, host='127.0.0.1'):
+        from http.server import ThreadingHTTPServer
+
+        self.httpd = ThreadingHTTPServer((host, port), _handler_class())
+        self.httpd.daemon_threads = True
+        self.httpd.metrics = metrics
+        self.metrics = metrics
+
+    @property
+    def server_address(self):
+        return self.httpd.server_address
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/metrics"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
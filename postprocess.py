@@ -0,0 +1,315 @@
+"""
+SnapVid - Post-Processing Stage
+ffmpeg merges and conversions on their own worker pool, fed through a
+bounded hand-off queue so download workers go straight back to the network
+"""
+
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+from download_queue import JobCancelled
+from toolchain import binary
+
+# Hand-off slots per post-processing worker before download workers block
+QUEUE_SLOTS = 2
+# Seconds between checks for a cancelled job while ffmpeg runs
+POLL_INTERVAL = 0.2
+# Default encoder and bitrate (kbit/s) per audio container, for sources
+# that cannot be stream-copied into it
+AUDIO_SETTINGS = {
+    'mp3': ('libmp3lame', '320'),
+    'm4a': ('aac', '256'),
+    'opus': ('libopus', '160'),
+    'ogg': ('libvorbis', '192'),
+}
+# Default (video, audio) encoders when a merge has to convert a stream
+MERGE_SETTINGS = {
+    'mp4': ('libx264', 'aac'),
+    'webm': ('libvpx-vp9', 'libopus'),
+}
+# Quality options per video encoder (constant quality, speed over size)
+VIDEO_SETTINGS = {
+    'libx264': ['-preset', 'veryfast', '-crf', '20'],
+    'libvpx-vp9': ['-b:v', '0', '-crf', '32', '-deadline', 'good', '-cpu-used', '4'],
+    'libvpx': ['-b:v', '2M', '-deadline', 'good', '-cpu-used', '4'],
+}
+# ffmpeg's own encoders for these are still flagged experimental
+EXPERIMENTAL_ENCODERS = ('opus', 'vorbis')
+
+
+def default_postprocess_workers():
+    """One ffmpeg process per core"""
+    return max(1, os.cpu_count() or 1)
+
+
+def ffmpeg_binary(ffmpeg_dir=None):
+    """ffmpeg executable inside a directory as returned by get_ffmpeg_path()"""
+    return binary(ffmpeg_dir, 'ffmpeg')
+
+
+# ========== COMMANDS ==========
+def merge_command(ffmpeg, video, audio, output, video_encoder='copy', audio_encoder='copy'):
+    """
+    Mux a video-only and an audio-only file. Each stream is copied as it
+    is unless an encoder is given for it (one the container cannot take);
+    encodes run on a single thread like the audio conversions.
+    """
+    command = [ffmpeg, '-y', '-hide_banner', '-loglevel', 'error', '-nostdin',
+               '-i', video, '-i', audio, '-map', '0:v:0', '-map', '1:a:0',
+               '-c:v', video_encoder] + VIDEO_SETTINGS.get(video_encoder, [])
+    command += ['-c:a', audio_encoder]
+    if audio_encoder != 'copy':
+        container = 'opus' if audio_format(output) == 'webm' else 'm4a'
+        command += ['-b:a', f'{AUDIO_SETTINGS[container][1]}k']
+        if audio_encoder in EXPERIMENTAL_ENCODERS:
+            command += ['-strict', '-2']
+    if (video_encoder, audio_encoder) != ('copy', 'copy'):
+        command += ['-threads', '1']
+    return command + [output]
+
+
+def audio_format(path):
+    """Audio container of an output path ('mp3', 'm4a', ...)"""
+    return os.path.splitext(path)[1][1:].lower()
+
+
+def extract_audio_command(ffmpeg, source, output, quality=None, encoder=None):
+    """
+    Drop the video and write the first audio stream into the output's
+    container. encoder='copy' remuxes it untouched; otherwise it is
+    encoded (by default with the container's AUDIO_SETTINGS) on a single
+    thread, since the stage already runs one ffmpeg per core.
+    """
+    container = audio_format(output)
+    default_encoder, default_quality = AUDIO_SETTINGS.get(container, AUDIO_SETTINGS['mp3'])
+    command = [ffmpeg, '-y', '-hide_banner', '-loglevel', 'error', '-nostdin',
+               '-i', source, '-vn', '-map', '0:a:0']
+    if encoder == 'copy':
+        command += ['-c:a', 'copy']
+    else:
+        command += ['-c:a', encoder or default_encoder, '-b:a', f'{quality or default_quality}k',
+                    '-threads', '1']
+        if encoder in EXPERIMENTAL_ENCODERS:
+            command += ['-strict', '-2']
+    if container == 'm4a':
+        command += ['-movflags', '+faststart']
+    return command + [output]
+
+
+def temp_output(output):
+    """Sibling path ffmpeg writes to before the atomic rename (keeps the extension)"""
+    base, ext = os.path.splitext(output)
+    return f"{base}.temp{ext}"
+
+
+def run_ffmpeg(command, cancel_event=None):
+    """
+    Run one ffmpeg process to completion. Returns (returncode, stderr, cpu_seconds);
+    cpu_seconds is None where per-process rusage is unavailable (Windows).
+    Raises JobCancelled after killing ffmpeg if cancel_event is set.
+    """
+    with tempfile.TemporaryFile() as errors:
+        proc = subprocess.Popen(command, stdin=subprocess.DEVNULL,
+                                stdout=subprocess.DEVNULL, stderr=errors)
+        cpu = None
+        if hasattr(os, 'wait4'):
+            while True:
+                pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+                if pid:
+                    proc.returncode = os.waitstatus_to_exitcode(status)
+                    cpu = usage.ru_utime + usage.ru_stime
+                    break
+                if cancel_event is not None and cancel_event.is_set():
+                    proc.kill()
+                    proc.wait()
+                    raise JobCancelled()
+                time.sleep(POLL_INTERVAL)
+        else:
+            while True:
+                try:
+                    proc.wait(POLL_INTERVAL)
+                    break
+                except subprocess.TimeoutExpired:
+                    if cancel_event is not None and cancel_event.is_set():
+                        proc.kill()
+                        proc.wait()
+                        raise JobCancelled()
+        errors.seek(0)
+        stderr = errors.read().decode('utf-8', 'replace').strip()
+    return proc.returncode, stderr, cpu
+
+
+class PostTask:
+    """
+    One ffmpeg run for a job. `finalize(task)` runs on the stage worker
+    after the output is in place; its return value becomes the future's
+    result. `codec` is 'copy' for remuxes, else the encoder used. A
+    `fallback` (kind, label, command, codec) runs instead when the first
+    command fails, e.g. an encode after a remux the container refused.
+    """
+
+    def __init__(self, job, kind, label, command, output, inputs, finalize=None, codec='copy',
+                 fallback=None):
+        self.job = job
+        self.kind = kind
+        self.label = label
+        self.command = command
+        self.output = output
+        self.inputs = inputs
+        self.finalize = finalize
+        self.codec = codec
+        self.fallback = fallback
+        self.future = Future()
+        self.queued = time.monotonic()
+        self.started = None
+        self.cpu_time = None
+        self.elapsed = None
+
+
+class PostProcessStage:
+    """
+    Worker threads that each drive one ffmpeg process at a time, so up to
+    `workers` transcodes run in parallel as separate OS processes. submit()
+    blocks while the hand-off queue is full, which throttles downloads when
+    post-processing falls behind instead of piling up raw files.
+    `on_task(task)` is called after each successful run with its timings.
+    """
+
+    def __init__(self, ffmpeg_path=None, workers=None, on_log=None, on_task=None):
+        self.ffmpeg = ffmpeg_binary(ffmpeg_path)
+        self.workers = workers or default_postprocess_workers()
+        self.on_log = on_log
+        self.on_task = on_task
+        self._tasks = queue.Queue(maxsize=self.workers * QUEUE_SLOTS)
+        self._threads = []
+        self._started = False
+
+    # ========== LIFECYCLE ==========
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"snapvid-post-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, wait=False):
+        """Let queued tasks finish, then end the workers"""
+        if not self._started:
+            return
+        self._started = False
+        for _ in self._threads:
+            self._tasks.put(None)
+        if wait:
+            for t in self._threads:
+                t.join()
+        self._threads = []
+
+    # ========== TASKS ==========
+    def submit(self, task):
+        """Queue a task (blocking while the stage is saturated); returns its Future"""
+        self.start()
+        self._tasks.put(task)
+        return task.future
+
+    def merge(self, job, video, audio, output, finalize=None, encoders=('copy', 'copy'),
+              fallback=None):
+        """
+        Mux video and audio into output, converting a stream whose encoder
+        in `encoders` (video, audio) is not 'copy'; `fallback` encoders are
+        used if that run fails (e.g. a copy the container refused)
+        """
+        def step(encoders):
+            converted = [name for name in encoders if name != 'copy']
+            label = f"Merging (converting with {'/'.join(converted)})" if converted else "Merging"
+            command = merge_command(self.ffmpeg, video, audio, temp_output(output), *encoders)
+            return 'convert' if converted else 'merge', label, command, '+'.join(encoders)
+
+        kind, label, command, codec = step(encoders)
+        retry = step(fallback) if fallback else None
+        return self.submit(PostTask(job, kind, label, command, output, [video, audio], finalize,
+                                    codec=codec, fallback=retry))
+
+    def extract_audio(self, job, source, output, quality=None, encoder=None, fallback=None,
+                      finalize=None):
+        """
+        Remux (encoder='copy') or encode a file's audio into output's
+        container; a `fallback` encoder is used if the remux fails
+        """
+        def step(encoder):
+            container = audio_format(output)
+            encoder = encoder or AUDIO_SETTINGS.get(container, AUDIO_SETTINGS['mp3'])[0]
+            label = f"{'Remuxing audio to' if encoder == 'copy' else 'Converting to'} {container.upper()}"
+            command = extract_audio_command(self.ffmpeg, source, temp_output(output), quality, encoder)
+            return 'remux' if encoder == 'copy' else 'convert', label, command, encoder
+
+        kind, label, command, codec = step(encoder)
+        retry = step(fallback) if fallback and encoder == 'copy' else None
+        return self.submit(PostTask(job, kind, label, command, output, [source], finalize,
+                                    codec=codec, fallback=retry))
+
+    def pending(self):
+        return self._tasks.qsize()
+
+    # ========== INTERNALS ==========
+    def log(self, message, job=None):
+        if self.on_log:
+            self.on_log(message, job)
+
+    def _worker(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            try:
+                task.future.set_result(self._run(task))
+            except Exception as e:
+                task.future.set_exception(e)
+
+    def _run(self, task):
+        job = task.job
+        if job.cancelled:
+            raise JobCancelled()
+        self.log(f"🔧 {task.label}: {os.path.basename(task.output)}", job)
+        started = task.started = time.monotonic()
+        temp = temp_output(task.output)
+        while True:
+            try:
+                code, stderr, cpu_time = run_ffmpeg(task.command, job.cancel_event)
+            except BaseException:
+                if os.path.exists(temp):
+                    os.remove(temp)
+                raise
+            if cpu_time is not None:
+                task.cpu_time = (task.cpu_time or 0) + cpu_time
+            if code == 0:
+                break
+            if os.path.exists(temp):
+                os.remove(temp)
+            message = stderr.splitlines()[-1] if stderr else f"exit code {code}"
+            if task.fallback is None:
+                self.log(f"❌ {task.label} failed: {message}", job)
+                raise RuntimeError(f"ffmpeg failed: {message}")
+            task.kind, task.label, task.command, task.codec = task.fallback
+            task.fallback = None
+            self.log(f"🔧 Stream copy refused ({message}) - {task.label}", job)
+        task.elapsed = time.monotonic() - started
+
+        os.replace(temp, task.output)
+        for path in task.inputs:
+            if path != task.output and os.path.exists(path):
+                os.remove(path)
+        cpu = f", {task.cpu_time:.1f}s CPU" if task.cpu_time is not None else ""
+        self.log(f"🔧 {task.label} done in {task.elapsed:.1f}s{cpu} "
+                 f"(waited {started - task.queued:.1f}s)", job)
+        if self.on_task is not None:
+            self.on_task(task)
+        if task.finalize is not None:
+            return task.finalize(task)
+        return task.output
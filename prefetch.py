@@ -0,0 +1,86 @@
+"""
+SnapVid - Extraction Prefetch
+Resolves video information for the next queued jobs on a small thread
+pool, so workers start transferring as soon as they pick a job up
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Queued jobs resolved ahead of the workers
+DEFAULT_DEPTH = 4
+# Extractions running at once (they hit the site's API, not the CDN)
+DEFAULT_WORKERS = 2
+# Seconds between queue scans when nothing pokes the prefetcher
+POLL_INTERVAL = 1.0
+
+
+class Prefetcher:
+    """
+    Watches the queue through `upcoming(n)` (the next n queued jobs in run
+    order) and calls `resolve(job)` for each on its own pool. The future is
+    stored in job.options['_prefetch'], where the download worker picks it
+    up - waiting for it if the extraction is still in flight. `skip(job)`
+    filters out jobs not worth resolving early (playlists, backing off).
+    """
+
+    def __init__(self, resolve, upcoming, depth=DEFAULT_DEPTH, workers=DEFAULT_WORKERS,
+                 skip=None):
+        self.resolve = resolve
+        self.upcoming = upcoming
+        self.depth = depth
+        self.workers = workers
+        self.skip = skip
+        self._pool = None
+        self._thread = None
+        self._wake = threading.Event()
+        self._running = False
+
+    # ========== LIFECYCLE ==========
+    def start(self):
+        if self._running or self.depth <= 0:
+            return
+        self._running = True
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="snapvid-prefetch")
+        self._thread = threading.Thread(target=self._loop, name="snapvid-prefetcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=False):
+        if not self._running:
+            return
+        self._running = False
+        self._wake.set()
+        if wait:
+            self._thread.join()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def poke(self):
+        """The queue changed - look for new work"""
+        self._wake.set()
+
+    # ========== INTERNALS ==========
+    def _loop(self):
+        while self._running:
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+            try:
+                self._schedule()
+            except Exception as e:
+                print(f"Prefetch error: {e}")
+
+    def _schedule(self):
+        now = time.monotonic()
+        for job in self.upcoming(self.depth):
+            if not self._running:
+                return
+            if '_prefetch' in job.options or job.cancelled or job.not_before > now:
+                continue
+            if self.skip is not None and self.skip(job):
+                continue
+            job.options['_prefetch'] = self._pool.submit(self._resolve, job)
+
+    def _resolve(self, job):
+        if job.cancelled:
+            return None
+        return self.resolve(job)
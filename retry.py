@@ -0,0 +1,302 @@
+"""
+SnapVid - Retry Policy
+Sorts job failures into classes, picks a retry delay per class and keeps
+a per-host circuit breaker so a throttling site does not tie up every worker
+"""
+
+import errno
+import random
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+# ========== FAILURE CLASSES ==========
+TRANSIENT = 'transient'    # network hiccups, 5xx, timeouts
+THROTTLED = 'throttled'    # 429, bot checks, repeated 403
+EXPIRED = 'expired'        # stale signed stream URLs - re-extract
+PERMANENT = 'permanent'    # unavailable, private, unsupported, disk full
+
+# Message fragments checked when no HTTP status is available (lowercase)
+PERMANENT_MESSAGES = (
+    'unsupported url', 'video unavailable', 'private video', 'is not available',
+    'has been removed', 'members-only', 'sign in to confirm your age',
+    'no video formats found', 'requested format is not available', 'does not exist', 'copyright',
+)
+THROTTLED_MESSAGES = (
+    'too many requests', "confirm you're not a bot", 'confirm you’re not a bot',
+    'rate-limit', 'rate limit',
+)
+EXPIRED_MESSAGES = ('expired', 'http error 410')
+# Responses that escalate to THROTTLED when fresh stream URLs get them too
+FORBIDDEN_STATUSES = (403, 410)
+TRANSIENT_MESSAGES = (
+    'timed out', 'timeout', 'connection reset', 'connection aborted', 'connection refused',
+    'temporary failure', 'name resolution', 'network is unreachable', 'incomplete read',
+    'remote end closed', 'broken pipe', 'eof occurred', 'unable to download webpage',
+    'got error', 'giving up after',
+)
+PERMANENT_ERRNOS = (errno.ENOSPC, errno.EACCES, errno.EROFS, errno.ENAMETOOLONG)
+
+
+class RetryPolicy:
+    """How one failure class is retried"""
+
+    def __init__(self, attempts, base_delay=0.0, max_delay=0.0, reextract=False, trips_breaker=False):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.reextract = reextract
+        self.trips_breaker = trips_breaker
+
+    def delay(self, attempt, rng=random):
+        """Exponential backoff with equal jitter for the given 1-based attempt"""
+        if not self.base_delay:
+            return 0.0
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return ceiling / 2 + rng.uniform(0, ceiling / 2)
+
+
+DEFAULT_POLICIES = {
+    TRANSIENT: RetryPolicy(5, base_delay=2, max_delay=60),
+    THROTTLED: RetryPolicy(4, base_delay=30, max_delay=300, trips_breaker=True),
+    EXPIRED: RetryPolicy(2, reextract=True),
+    PERMANENT: RetryPolicy(0),
+}
+
+
+# ========== CLASSIFICATION ==========
+def error_chain(exc):
+    """The exception and everything it wraps (cause, context, yt-dlp exc_info)"""
+    seen = []
+    while exc is not None and exc not in seen:
+        seen.append(exc)
+        wrapped = getattr(exc, 'exc_info', None)
+        if wrapped and wrapped[1] is not None and wrapped[1] is not exc:
+            exc = wrapped[1]
+        else:
+            exc = getattr(exc, 'cause', None) or exc.__cause__ or exc.__context__
+            if not isinstance(exc, BaseException):
+                exc = None
+    return seen
+
+
+def http_status(exc):
+    for e in error_chain(exc):
+        status = getattr(e, 'status', None) or getattr(e, 'code', None)
+        if isinstance(status, int) and 100 <= status < 600:
+            return status
+    return None
+
+
+def forbidden(exc):
+    """The server answered 403/410 (by status, or in yt-dlp's 'HTTP Error 403' text)"""
+    if http_status(exc) in FORBIDDEN_STATUSES:
+        return True
+    message = ' '.join(str(e) for e in error_chain(exc)).lower()
+    return any(f'http error {status}' in message for status in FORBIDDEN_STATUSES)
+
+
+def retry_after(exc):
+    """Seconds from a Retry-After header on the underlying HTTP error, if any"""
+    for e in error_chain(exc):
+        headers = getattr(getattr(e, 'response', None), 'headers', None) or getattr(e, 'headers', None)
+        value = headers.get('Retry-After') if headers is not None else None
+        if value and str(value).strip().isdigit():
+            return float(value)
+    return None
+
+
+def classify(exc):
+    """Failure class for an exception raised by a download job"""
+    status = http_status(exc)
+    if status == 429:
+        return THROTTLED
+    if status == 403:
+        # Usually a signed stream URL that went stale; repeated 403s are
+        # escalated to THROTTLED by RetryManager
+        return EXPIRED
+    if status == 410:
+        return EXPIRED
+    if status is not None and (status >= 500 or status == 408):
+        return TRANSIENT
+    if status is not None and 400 <= status < 500:
+        return PERMANENT
+
+    chain = error_chain(exc)
+    for e in chain:
+        if isinstance(e, OSError) and e.errno in PERMANENT_ERRNOS:
+            return PERMANENT
+    message = ' '.join(str(e) for e in chain).lower()
+    for fragments, cls in ((THROTTLED_MESSAGES, THROTTLED),
+                           (EXPIRED_MESSAGES, EXPIRED),
+                           (PERMANENT_MESSAGES, PERMANENT),
+                           (TRANSIENT_MESSAGES, TRANSIENT)):
+        if any(fragment in message for fragment in fragments):
+            return cls
+    if any(isinstance(e, (socket.timeout, ConnectionError, TimeoutError)) for e in chain):
+        return TRANSIENT
+    if any(type(e).__name__ in ('TransportError', 'IncompleteRead', 'URLError') for e in chain):
+        return TRANSIENT
+    return PERMANENT
+
+
+def host_of(url):
+    host = urlparse(url).hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+
+# ========== CIRCUIT BREAKER ==========
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class HostCircuit:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = []
+        self.opened = 0.0
+        self.cooldown = 0.0
+        self.probing = False
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker fed with throttling failures. `threshold` failures
+    within `window` seconds open the circuit for `cooldown` seconds; then
+    one probe job is let through (half-open). A probe that succeeds closes
+    the circuit, a throttled probe re-opens it with twice the cooldown.
+    """
+
+    def __init__(self, threshold=3, window=120.0, cooldown=60.0, max_cooldown=900.0):
+        self.threshold = threshold
+        self.window = window
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, host):
+        circuit = self._hosts.get(host)
+        if circuit is None:
+            circuit = self._hosts[host] = HostCircuit()
+        return circuit
+
+    def admit(self, host, now=None):
+        """
+        Seconds until a job for `host` may start (0 = start now). Called
+        for the job about to be dequeued, so a 0 in half-open state
+        reserves the single probe slot.
+        """
+        now = now or time.monotonic()
+        with self._lock:
+            circuit = self._hosts.get(host)
+            if circuit is None or circuit.state == CLOSED:
+                return 0.0
+            if circuit.state == OPEN:
+                remaining = circuit.opened + circuit.cooldown - now
+                if remaining > 0:
+                    return remaining
+                circuit.state = HALF_OPEN
+            if circuit.probing:
+                return min(circuit.cooldown, 5.0)
+            circuit.probing = True
+            return 0.0
+
+    def record_failure(self, host, now=None):
+        """Throttling seen for host; returns True if this opened a closed circuit"""
+        now = now or time.monotonic()
+        with self._lock:
+            circuit = self._circuit(host)
+            if circuit.state == HALF_OPEN:
+                circuit.probing = False
+                circuit.state = OPEN
+                circuit.opened = now
+                circuit.cooldown = min(circuit.cooldown * 2, self.max_cooldown)
+                return False
+            circuit.failures = [t for t in circuit.failures if now - t < self.window] + [now]
+            if circuit.state == CLOSED and len(circuit.failures) >= self.threshold:
+                circuit.state = OPEN
+                circuit.opened = now
+                circuit.cooldown = self.base_cooldown
+                return True
+            return False
+
+    def record_success(self, host):
+        with self._lock:
+            circuit = self._hosts.get(host)
+            if circuit is None:
+                return
+            if circuit.state == HALF_OPEN or circuit.probing:
+                circuit.state = CLOSED
+                circuit.probing = False
+                circuit.failures = []
+            elif circuit.state == CLOSED:
+                circuit.failures = []
+
+    def release(self, host):
+        """A probe ended without telling us anything (cancelled, permanent error)"""
+        with self._lock:
+            circuit = self._hosts.get(host)
+            if circuit is not None:
+                circuit.probing = False
+
+    def states(self):
+        with self._lock:
+            return {host: c.state for host, c in self._hosts.items() if c.state != CLOSED}
+
+
+class RetryDecision:
+    def __init__(self, cls, retry, delay=0.0, attempt=0, attempts=0, reextract=False, tripped=False):
+        self.cls = cls
+        self.retry = retry
+        self.delay = delay
+        self.attempt = attempt
+        self.attempts = attempts
+        self.reextract = reextract
+        self.tripped = tripped
+
+
+class RetryManager:
+    """Ties classification, per-class attempt counts and the breaker together"""
+
+    def __init__(self, policies=None, breaker=None, rng=None):
+        self.policies = dict(DEFAULT_POLICIES, **(policies or {}))
+        self.breaker = breaker or CircuitBreaker()
+        self.rng = rng or random.Random()
+
+    def gate(self, job):
+        """DownloadQueue gate: seconds the job must still wait"""
+        return self.breaker.admit(host_of(job.url))
+
+    def decide(self, job, exc):
+        """Record a failure and return a RetryDecision; counts live in job.options['_retries']"""
+        cls = classify(exc)
+        counts = job.options.setdefault('_retries', {})
+        if (cls == EXPIRED and counts.get(EXPIRED, 0) >= self.policies[EXPIRED].attempts
+                and forbidden(exc)):
+            # Still forbidden after fresh stream URLs - the site is refusing us
+            cls = THROTTLED
+        policy = self.policies[cls]
+        attempt = counts.get(cls, 0) + 1
+        host = host_of(job.url)
+        tripped = False
+        if policy.trips_breaker:
+            tripped = self.breaker.record_failure(host)
+        else:
+            self.breaker.release(host)
+        if attempt > policy.attempts:
+            return RetryDecision(cls, False, attempt=attempt - 1, attempts=policy.attempts, tripped=tripped)
+        counts[cls] = attempt
+        delay = policy.delay(attempt, self.rng)
+        hinted = retry_after(exc)
+        if hinted is not None:
+            delay = max(delay, min(hinted, policy.max_delay or hinted))
+        return RetryDecision(cls, True, delay, attempt, policy.attempts, policy.reextract, tripped)
+
+    def succeeded(self, job):
+        self.breaker.record_success(host_of(job.url))
+
+    def abandoned(self, job):
+        self.breaker.release(host_of(job.url))
@@ -0,0 +1,124 @@
+"""
+SnapVid - Clip Sections
+Time ranges and chapter names for clip jobs, mapped to yt-dlp's
+download_ranges so only the requested part of a video is fetched
+"""
+
+import re
+
+# Protocols ffmpeg can seek into (HTTP range reads, HLS/DASH segment
+# lists), so a clip only pulls the bytes or fragments around its range
+SEEKABLE_PROTOCOLS = ('http', 'https', 'm3u8', 'm3u8_native', 'http_dash_segments')
+
+# Output name of a clip: 'Title (Intro 00.01.30-00.02.00).mp4'
+CLIP_TEMPLATE = ('%(title)s (%(section_title&{} |)s%(section_start>%H.%M.%S)s-'
+                 '%(section_end>%H.%M.%S|end)s).%(ext)s')
+# File names CLIP_TEMPLATE produces, up to the title
+CLIP_NAME = re.compile(r' \((?:.+ )?\d{2}\.\d{2}\.\d{2}-(?:\d{2}\.\d{2}\.\d{2}|end)\)\.[0-9A-Za-z]+$')
+
+TIMESTAMP = re.compile(r'^(?:(\d+):)?(?:(\d+):)?(\d+(?:\.\d+)?)$')
+RANGE = re.compile(r'^([\d:.]*)\s*-\s*([\d:.]*)$')
+
+
+class SectionError(ValueError):
+    """A section spec that cannot be parsed"""
+
+
+def parse_timestamp(text):
+    """Seconds from '90', '1:30' or '1:02:03.5'"""
+    match = TIMESTAMP.match(text.strip())
+    if not match:
+        raise SectionError(f"Not a timestamp: {text!r} (use 90, 1:30 or 1:02:03.5)")
+    first, second, seconds = match.groups()
+    hours, minutes = (first, second) if second is not None else (0, first)
+    return int(hours or 0) * 3600 + int(minutes or 0) * 60 + float(seconds)
+
+
+def format_timestamp(seconds):
+    if seconds == float('inf'):
+        return 'end'
+    whole = int(seconds)
+    text = f"{whole // 3600}:{whole // 60 % 60:02d}:{whole % 60:02d}" if whole >= 3600 \
+        else f"{whole // 60}:{whole % 60:02d}"
+    fraction = round(seconds - whole, 3)
+    return text + (f"{fraction:.3f}".rstrip('0')[1:] if fraction else '')
+
+
+class Sections:
+    """
+    Parsed clip request: `ranges` as (start, end) seconds and `chapters`
+    as names matched case-insensitively against the video's chapter
+    titles. `spec` is the normalized text stored in the job options.
+    """
+
+    def __init__(self, ranges=None, chapters=None):
+        self.ranges = list(ranges or [])
+        self.chapters = list(chapters or [])
+
+    @property
+    def spec(self):
+        items = [f"{format_timestamp(start) if start else ''}-"
+                 f"{'' if end == float('inf') else format_timestamp(end)}"
+                 for start, end in self.ranges]
+        return ', '.join(items + self.chapters)
+
+    def describe(self):
+        items = [f"{format_timestamp(start)}-{format_timestamp(end)}" for start, end in self.ranges]
+        items += [f"chapter '{name}'" for name in self.chapters]
+        return ', '.join(items)
+
+    def chapter_patterns(self):
+        """Regexes for yt-dlp's download_range_func"""
+        return [f"(?i){re.escape(name)}" for name in self.chapters]
+
+    def matched(self, info):
+        """(start, end) seconds this request covers in one video (end may be inf)"""
+        spans = []
+        for chapter in info.get('chapters') or []:
+            title = (chapter.get('title') or '').lower()
+            if any(name.lower() in title for name in self.chapters):
+                spans.append((chapter.get('start_time') or 0, chapter.get('end_time') or float('inf')))
+        return spans + self.ranges
+
+    def duration(self, info):
+        """Seconds of video the clips add up to, None when the length is unknown"""
+        length = info.get('duration')
+        if not length:
+            return None
+        return sum(max(0, min(end, length) - min(start, length)) for start, end in self.matched(info))
+
+
+def parse(spec):
+    """
+    Sections from a comma-separated spec such as '1:00-1:30, 45:10-, Intro':
+    'start-end' ranges (either side may be left open) and chapter names
+    """
+    ranges, chapters = [], []
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        match = RANGE.match(item)
+        if match is None:
+            chapters.append(item)
+            continue
+        start = parse_timestamp(match.group(1)) if match.group(1) else 0
+        end = parse_timestamp(match.group(2)) if match.group(2) else float('inf')
+        if end <= start:
+            raise SectionError(f"Clip ends before it starts: {item!r}")
+        ranges.append((start, end))
+    if not ranges and not chapters:
+        raise SectionError("No time range or chapter given")
+    return Sections(ranges, chapters)
+
+
+def seekable(info):
+    """
+    Copy of an info dict with only formats ffmpeg can cut while
+    downloading; the original when none of them qualifies
+    """
+    formats = [f for f in info.get('formats') or []
+               if all(p in SEEKABLE_PROTOCOLS for p in (f.get('protocol') or 'https').split('+'))]
+    if not formats or len(formats) == len(info.get('formats') or []):
+        return info
+    return {**info, 'formats': formats}
@@ -0,0 +1,434 @@
+"""
+SnapVid - Segmented Downloader
+Fetches a progressive HTTP file over several connections: byte ranges are
+split on demand (work stealing) and written in place into a preallocated
+.part file, so per-connection throttling no longer caps the transfer
+"""
+
+import json
+import os
+import threading
+import time
+
+# Parallel connections per file (1 disables segmenting)
+DEFAULT_CONNECTIONS = 4
+# Files smaller than this go through yt-dlp's single-stream downloader
+MIN_FILE_SIZE = 4 * 1024 * 1024
+# A range is never split into pieces smaller than this
+MIN_SEGMENT = 1024 * 1024
+# Bytes read from a connection per write
+BLOCK_SIZE = 256 * 1024
+# Attempts per segment before the download fails
+SEGMENT_RETRIES = 5
+# Seconds between saves of the remaining ranges (for resuming)
+STATE_INTERVAL = 2.0
+STATE_SUFFIX = '.segments'
+
+_session_class = None
+
+
+def suitable(info):
+    """A single progressive http(s) stream whose size is unknown or worth splitting"""
+    if info.get('protocol') not in ('http', 'https') or not info.get('url'):
+        return False
+    if info.get('is_live') or info.get('fragments') or info.get('requested_formats'):
+        return False
+    # Clips are cut by ffmpeg while downloading
+    if info.get('section_start') or info.get('section_end'):
+        return False
+    size = info.get('filesize') or info.get('filesize_approx')
+    return size is None or size >= MIN_FILE_SIZE
+
+
+def session_class(yt_dlp):
+    """
+    YoutubeDL subclass whose dl() hands suitable formats to SegmentedFD and
+    everything else (DASH/HLS, small files, subtitles) to yt-dlp's own pick
+    """
+    global _session_class
+    if _session_class is not None:
+        return _session_class
+    fd_class = _fd_class(yt_dlp)
+
+    class SegmentedYoutubeDL(yt_dlp.YoutubeDL):
+        def dl(self, name, info, subtitle=False, test=False):
+            connections = self.params.get('segment_connections') or 1
+            if subtitle or test or name == '-' or connections < 2 or not suitable(info):
+                return super().dl(name, info, subtitle, test)
+            fd = fd_class(self, self.params)
+            for hook in self._progress_hooks:
+                fd.add_progress_hook(hook)
+            self.write_debug(f'Invoking {fd.FD_NAME} downloader on "{info["url"]}"')
+            new_info = self._copy_infodict(info)
+            if new_info.get('http_headers') is None:
+                new_info['http_headers'] = self._calc_headers(new_info)
+            return fd.download(name, new_info, subtitle)
+
+    _session_class = SegmentedYoutubeDL
+    return _session_class
+
+
+class _Abort(Exception):
+    """Wraps an error that must end the download rather than retry the segment"""
+
+    def __init__(self, error):
+        super().__init__(error)
+        self.error = error
+
+
+# ========== FILE ACCESS ==========
+class PositionalFile:
+    """
+    A preallocated file written at explicit offsets from many threads:
+    os.pwrite where available, otherwise one handle with seek+write under a lock
+    """
+
+    def __init__(self, path, size, keep=False):
+        mode = 'r+b' if keep and os.path.exists(path) else 'wb'
+        self._file = open(path, mode)
+        self._lock = threading.Lock()
+        if os.path.getsize(path) != size:
+            self._preallocate(size)
+
+    def _preallocate(self, size):
+        fd = self._file.fileno()
+        if hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd, 0, size)
+                return
+            except OSError as e:
+                # Filesystems without fallocate; a full disk is a real error
+                if e.errno == 28:
+                    raise
+        self._file.truncate(size)
+
+    def write_at(self, offset, data):
+        if hasattr(os, 'pwrite'):
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(self._file.fileno(), view, offset)
+                view = view[written:]
+                offset += written
+            return
+        with self._lock:
+            self._file.seek(offset)
+            self._file.write(data)
+
+    def close(self):
+        self._file.close()
+
+
+# ========== RANGE PLANNING ==========
+class Segment:
+    def __init__(self, start, end):
+        self.pos = start
+        self.end = end
+        self.taken = False
+
+    @property
+    def remaining(self):
+        return max(0, self.end - self.pos)
+
+
+class SegmentPlan:
+    """
+    Byte ranges still to fetch. A worker that runs out takes an unclaimed
+    range or steals the back half of the largest one in flight, so fast
+    connections end up doing more of the file and all finish together.
+    """
+
+    def __init__(self, total, connections, ranges=None):
+        self.total = total
+        self._lock = threading.Lock()
+        if ranges:
+            self.segments = [Segment(start, end) for start, end in ranges if end > start]
+        else:
+            size = max(MIN_SEGMENT, -(-total // connections))
+            self.segments = [Segment(start, min(start + size, total))
+                             for start in range(0, total, size)]
+
+    def take(self):
+        """A range for an idle worker, or None when nothing is left worth splitting"""
+        with self._lock:
+            for segment in self.segments:
+                if not segment.taken and segment.remaining:
+                    segment.taken = True
+                    return segment
+            victim = max((s for s in self.segments if s.taken), key=lambda s: s.remaining, default=None)
+            if victim is None or victim.remaining < 2 * MIN_SEGMENT:
+                return None
+            # Well past the block its worker may be writing at victim.pos
+            middle = victim.pos + victim.remaining // 2
+            stolen = Segment(middle, victim.end)
+            stolen.taken = True
+            victim.end = middle
+            self.segments.append(stolen)
+            return stolen
+
+    def reserve(self, segment, length):
+        """
+        Where the next `length` bytes of a segment go: (offset, count). They
+        only count as fetched (and saved as such) once commit()ted after the
+        write, so a failed write leaves them to be fetched again.
+        """
+        with self._lock:
+            return segment.pos, min(length, segment.remaining)
+
+    def commit(self, segment, count):
+        """Bytes reserved from a segment are on disk"""
+        with self._lock:
+            segment.pos += count
+
+    def release(self, segment):
+        """A worker gave up on a segment (error) - let another one pick it up"""
+        with self._lock:
+            segment.taken = False
+
+    def remaining(self):
+        with self._lock:
+            return [[s.pos, s.end] for s in self.segments if s.remaining]
+
+    def done(self):
+        with self._lock:
+            return self.total - sum(s.remaining for s in self.segments)
+
+
+class SegmentedDownload:
+    """
+    Runs `connections` workers over a SegmentPlan. `open_range(start, end)`
+    returns a readable response for bytes [start, end); `chunk_size` caps
+    the span of one request (YouTube serves at most ~10 MB per request).
+    `on_data(count)` is called after every write - blocking there throttles
+    the transfer and raising there aborts it.
+    """
+
+    def __init__(self, open_range, path, total, connections, chunk_size=None, on_data=None,
+                 retryable=None):
+        self.open_range = open_range
+        self.path = path
+        self.total = total
+        self.connections = connections
+        self.chunk_size = chunk_size
+        self.on_data = on_data
+        self.retryable = retryable or (lambda e: isinstance(e, OSError))
+        self.state_path = path + STATE_SUFFIX
+        self._report_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._error = None
+        self.already = 0
+
+    def _load_state(self):
+        """
+        Ranges left by an interrupted run of the same file, or None. A
+        .part without a state file was written front to back by a single
+        stream, so only its tail is missing.
+        """
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            size = os.path.getsize(self.path)
+            return [[size, self.total]] if 0 < size < self.total else None
+        except (OSError, ValueError):
+            return None
+        if state.get('total') != self.total:
+            return None
+        return state.get('ranges')
+
+    def _save_state(self, plan):
+        try:
+            with open(self.state_path, 'w', encoding='utf-8') as f:
+                json.dump({'total': self.total, 'ranges': plan.remaining()}, f)
+        except OSError:
+            pass
+
+    def run(self, resume=True):
+        """Download the whole file; returns bytes fetched by this run"""
+        ranges = self._load_state() if resume else None
+        plan = SegmentPlan(self.total, self.connections, ranges)
+        # Bytes already on disk from an earlier run (read by on_data callers)
+        self.already = plan.done()
+        output = PositionalFile(self.path, self.total, keep=ranges is not None)
+        workers = [threading.Thread(target=self._worker, args=(plan, output),
+                                    name=f"snapvid-segment-{i}", daemon=True)
+                   for i in range(self.connections)]
+        try:
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(STATE_INTERVAL)
+                    self._save_state(plan)
+        except BaseException as e:
+            # KeyboardInterrupt in the calling thread - stop the workers first
+            self._fail(e)
+            for worker in workers:
+                worker.join()
+        finally:
+            output.close()
+        if self._error is None and plan.done() < self.total:
+            self._error = OSError(f"segmented download stopped at {plan.done()} of {self.total} bytes")
+        if self._error is not None:
+            self._save_state(plan)
+            raise self._error
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        return self.total - self.already
+
+    def _fail(self, error):
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def _worker(self, plan, output):
+        while not self._stop.is_set():
+            segment = plan.take()
+            if segment is None:
+                return
+            try:
+                self._fetch(plan, segment, output)
+            except BaseException as e:
+                plan.release(segment)
+                self._fail(e)
+                return
+
+    def _fetch(self, plan, segment, output):
+        attempt = 0
+        while segment.remaining and not self._stop.is_set():
+            end = segment.end
+            if self.chunk_size:
+                end = min(end, segment.pos + self.chunk_size)
+            response = None
+            try:
+                response = self.open_range(segment.pos, end)
+                while segment.pos < end and not self._stop.is_set():
+                    data = response.read(min(BLOCK_SIZE, end - segment.pos))
+                    if not data:
+                        raise OSError(f"connection closed at byte {segment.pos}")
+                    # The range may have shrunk (stolen) while we were reading
+                    offset, count = plan.reserve(segment, len(data))
+                    if count:
+                        # Disk and hook errors (cancel, disk full) are not retried
+                        try:
+                            output.write_at(offset, data[:count])
+                        except BaseException as e:
+                            raise _Abort(e)
+                        plan.commit(segment, count)
+                        try:
+                            self._report(count)
+                        except BaseException as e:
+                            raise _Abort(e)
+                    end = min(end, segment.end)
+                    attempt = 0
+            except _Abort as e:
+                raise e.error
+            except Exception as e:
+                attempt += 1
+                if attempt > SEGMENT_RETRIES or not self.retryable(e):
+                    raise
+                self._stop.wait(min(2 ** attempt * 0.25, 5))
+            finally:
+                if response is not None:
+                    response.close()
+
+    def _report(self, count):
+        if self.on_data is not None:
+            with self._report_lock:
+                self.on_data(count)
+
+
+def _fd_class(yt_dlp):
+    """FileDownloader adapter, built on first use since yt-dlp is imported lazily"""
+    from yt_dlp.downloader.common import FileDownloader
+    from yt_dlp.downloader.http import HttpFD
+    from yt_dlp.networking import Request
+    from yt_dlp.networking.exceptions import HTTPError, TransportError
+
+    class SegmentedFD(FileDownloader):
+        """Multi-connection HTTP downloader; falls back to HttpFD without range support"""
+
+        def real_download(self, filename, info_dict):
+            url = info_dict['url']
+            headers = dict(info_dict.get('http_headers') or {})
+            total = self._probe(url, headers)
+            if total is None or total < MIN_FILE_SIZE:
+                return self._fallback(filename, info_dict)
+
+            tmpfilename = self.temp_name(filename)
+            connections = self.params.get('segment_connections') or DEFAULT_CONNECTIONS
+            chunk_size = (info_dict.get('downloader_options') or {}).get('http_chunk_size') \
+                or self.params.get('http_chunk_size')
+            self.report_destination(filename)
+            started = time.time()
+            status = {'downloaded': 0}
+
+            def open_range(start, end):
+                response = self.ydl.urlopen(Request(url, headers={**headers, 'Range': f'bytes={start}-{end - 1}'}))
+                if response.status != 206:
+                    response.close()
+                    raise OSError(f"server ignored the byte range (HTTP {response.status})")
+                return response
+
+            def retryable(e):
+                # Expired or forbidden URLs fail the job; dropped connections are resumed
+                if isinstance(e, HTTPError):
+                    return e.status >= 500 or e.status == 429
+                return isinstance(e, (TransportError, OSError))
+
+            def on_data(count):
+                status['downloaded'] += count
+                elapsed = time.time() - started
+                downloaded = download.already + status['downloaded']
+                speed = status['downloaded'] / elapsed if elapsed > 0 else None
+                self._hook_progress({
+                    'status': 'downloading',
+                    'downloaded_bytes': downloaded,
+                    'total_bytes': total,
+                    'tmpfilename': tmpfilename,
+                    'filename': filename,
+                    'elapsed': elapsed,
+                    'speed': speed,
+                    'eta': (total - downloaded) / speed if speed else None,
+                }, info_dict)
+
+            download = SegmentedDownload(open_range, tmpfilename, total, connections, chunk_size, on_data,
+                                         retryable=retryable)
+            self.to_screen(f"[download] {connections} connections, {total / (1024 * 1024):.1f} MiB")
+            download.run(self.params.get('continuedl', True))
+
+            self.try_rename(tmpfilename, filename)
+            self._hook_progress({
+                'status': 'finished',
+                'downloaded_bytes': total,
+                'total_bytes': total,
+                'filename': filename,
+                'elapsed': time.time() - started,
+            }, info_dict)
+            return True
+
+        def _probe(self, url, headers):
+            """File size if the server honours byte ranges, else None"""
+            try:
+                response = self.ydl.urlopen(Request(url, headers={**headers, 'Range': 'bytes=0-0'}))
+            except HTTPError as e:
+                if e.status == 416:
+                    return None
+                raise
+            try:
+                content_range = response.headers.get('Content-Range') or ''
+                if response.status != 206 or '/' not in content_range:
+                    return None
+                size = content_range.rsplit('/', 1)[1]
+                return int(size) if size.isdigit() else None
+            finally:
+                response.close()
+
+        def _fallback(self, filename, info_dict):
+            fd = HttpFD(self.ydl, self.params)
+            for hook in self._progress_hooks:
+                fd.add_progress_hook(hook)
+            return fd.real_download(filename, info_dict)
+
+    return SegmentedFD
@@ -0,0 +1,187 @@
+"""
+SnapVid - Session Pool
+Long-lived YoutubeDL instances shared across jobs, so extractor lookup,
+cookie jars and HTTP keep-alive connections outlive a single download
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from download_queue import JobCancelled
+from retry import classify, PERMANENT
+
+# Options a job sets on a borrowed session; all others select the pool
+JOB_OPTIONS = ('format', 'outtmpl', 'progress_hooks', 'logger', 'noplaylist',
+               'merge_output_format', 'download_ranges', 'force_keyframes_at_cuts')
+# Seconds an unused session stays open
+IDLE_TIMEOUT = 120.0
+# Jobs served before a session is replaced (bounds cookie/cache growth)
+MAX_USES = 200
+# Idle sessions kept per option set
+MAX_IDLE = 8
+
+
+def options_key(options):
+    """Stable key for a session's shared options"""
+    return json.dumps(options, sort_keys=True, default=repr)
+
+
+class Session:
+    """One pooled YoutubeDL and its bookkeeping"""
+
+    def __init__(self, ydl, key):
+        self.ydl = ydl
+        self.key = key
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.uses = 0
+        self.healthy = True
+        # Progress hooks of the job holding the session (see SessionPool._dispatch)
+        self.hooks = []
+
+
+class SessionPool:
+    """
+    Pool of YoutubeDL sessions keyed by their shared options. session()
+    lends one out for a job: the JOB_OPTIONS in the given dict (format,
+    output template, hooks, logger) are applied to the live instance and
+    cleared again when it comes back. A session is closed instead of
+    returned after a network-level failure or MAX_USES jobs, and idle
+    ones are closed by a sweeper after `idle_timeout` seconds.
+    """
+
+    def __init__(self, factory, idle_timeout=IDLE_TIMEOUT, max_uses=MAX_USES, max_idle=MAX_IDLE):
+        self.factory = factory
+        self.idle_timeout = idle_timeout
+        self.max_uses = max_uses
+        self.max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sweeper = None
+        self._closed = False
+        self.created = 0
+        self.reused = 0
+
+    @contextmanager
+    def session(self, options):
+        """Borrow a session configured with `options` (a YoutubeDL params dict)"""
+        shared = {k: v for k, v in options.items() if k not in JOB_OPTIONS}
+        job = {k: v for k, v in options.items() if k in JOB_OPTIONS}
+        session = self._acquire(options_key(shared), shared)
+        try:
+            self._apply(session, job)
+            yield session.ydl
+        except BaseException as e:
+            # Extractor verdicts ("video unavailable") leave the session intact;
+            # broken connections, throttling or an aborted transfer may not
+            if isinstance(e, JobCancelled) or not isinstance(e, Exception) or classify(e) != PERMANENT:
+                session.healthy = False
+            raise
+        finally:
+            self._release(session)
+
+    def close(self):
+        """Close every idle session and stop the sweeper"""
+        with self._lock:
+            self._closed = True
+            sessions = [s for idle in self._idle.values() for s in idle]
+            self._idle.clear()
+        self._wake.set()
+        for session in sessions:
+            self._close(session)
+
+    def idle(self):
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+    # ========== INTERNALS ==========
+    def _acquire(self, key, shared):
+        stale = []
+        session = None
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle and session is None:
+                candidate = idle.pop()
+                if self._usable(candidate, time.monotonic()):
+                    session = candidate
+                    self.reused += 1
+                else:
+                    stale.append(candidate)
+            if session is None:
+                self.created += 1
+        for candidate in stale:
+            self._close(candidate)
+        if session is not None:
+            return session
+        session = Session(self.factory(dict(shared)), key)
+        session.ydl.add_progress_hook(lambda d: self._dispatch(session, d))
+        return session
+
+    def _usable(self, session, now):
+        return (session.healthy and session.uses < self.max_uses and
+                now - session.last_used < self.idle_timeout)
+
+    def _apply(self, session, job):
+        """Point a session at one job's options"""
+        ydl = session.ydl
+        params = ydl.params
+        for name in JOB_OPTIONS:
+            params.pop(name, None)
+        params.update({k: v for k, v in job.items() if k != 'progress_hooks'})
+        params['outtmpl'] = job.get('outtmpl', {})
+        ydl._parse_outtmpl()
+        fmt = params.get('format')
+        ydl.format_selector = fmt if fmt in (None, '-') else ydl.build_format_selector(fmt)
+        session.hooks = list(job.get('progress_hooks') or ())
+        # Per-run counters yt-dlp keeps on the instance
+        ydl._download_retcode = 0
+        ydl._num_downloads = 0
+        session.uses += 1
+
+    def _dispatch(self, session, d):
+        for hook in session.hooks:
+            hook(d)
+
+    def _release(self, session):
+        # Drop references to the job (hooks, logger) before parking the session
+        session.hooks = []
+        session.ydl.params.pop('logger', None)
+        session.last_used = time.monotonic()
+        with self._lock:
+            if not self._closed and self._usable(session, session.last_used):
+                idle = self._idle.setdefault(session.key, [])
+                if len(idle) < self.max_idle:
+                    idle.append(session)
+                    self._start_sweeper()
+                    return
+        self._close(session)
+
+    def _close(self, session):
+        try:
+            session.ydl.close()
+        except Exception as e:
+            print(f"Session close error: {e}")
+
+    def _start_sweeper(self):
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._sweep, name="snapvid-sessions", daemon=True)
+            self._sweeper.start()
+
+    def _sweep(self):
+        while not self._closed:
+            self._wake.wait(self.idle_timeout / 2)
+            now = time.monotonic()
+            expired = []
+            with self._lock:
+                for key, idle in list(self._idle.items()):
+                    keep = [s for s in idle if self._usable(s, now)]
+                    expired.extend(s for s in idle if s not in keep)
+                    if keep:
+                        self._idle[key] = keep
+                    else:
+                        del self._idle[key]
+            for session in expired:
+                self._close(session)
@@ -0,0 +1,301 @@
+"""
+SnapVid - Command Line
+Headless downloads without Tk: URLs from arguments, a file or stdin,
+JSON-lines events on stdout and console log on stderr.
+
+    python snapvid.py URL [URL ...]
+    python snapvid.py -i urls.txt -q 720p -f MP4 -j 4
+    cat urls.txt | python snapvid.py
+    python snapvid.py --subscribe --every 6h CHANNEL_URL
+    python snapvid.py --watch
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+
+from download_queue import DONE, FAILED, CANCELLED
+from engine import DownloadEngine, QUALITIES, FORMATS, default_download_path
+from metrics import Metrics, MetricsServer
+from bandwidth import POLICIES, FAIR
+from ingest import parse, read_source, strip_comments
+from storage import OutputManager, DEFAULT_HEADROOM
+from subscriptions import DEFAULT_INTERVAL, parse_interval, format_interval
+import sections
+
+# Minimum seconds between progress lines for one job
+PROGRESS_INTERVAL = 0.5
+
+
+class JsonEmitter:
+    """Thread-safe JSON-lines writer"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+        self.last_progress = {}
+
+    def emit(self, event, **fields):
+        fields = {'event': event, 'ts': round(time.time(), 3), **fields}
+        line = json.dumps(fields, ensure_ascii=False, default=str)
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def progress(self, job, record):
+        # Throttle per job, but never drop the final record
+        now = time.monotonic()
+        if record['status'] == 'downloading':
+            if now - self.last_progress.get(job.id, 0) < PROGRESS_INTERVAL:
+                return
+        self.last_progress[job.id] = now
+        self.emit('progress', job=job.id, **record)
+
+    def job_change(self, job):
+        fields = {'job': job.id, 'state': job.state, 'url': job.url}
+        if job.attempts:
+            fields['attempts'] = job.attempts
+        if job.state == DONE:
+            fields['result'] = job.result
+        elif job.state == FAILED:
+            fields['error'] = str(job.error)
+        self.emit('job', **fields)
+
+    def batch_done(self, batch):
+        self.emit('batch', **batch.snapshot())
+
+
+def read_urls(args, implicit_stdin=True):
+    """
+    Collect URLs from arguments, --input files (text, CSV or JSON) and
+    piped stdin; returns normalized, de-duplicated ingest items
+    """
+    texts = list(args.urls)
+    sources = list(args.input or [])
+    if implicit_stdin and not texts and not sources and not sys.stdin.isatty():
+        sources.append('-')
+    for source in sources:
+        if source == '-':
+            texts.append(strip_comments(sys.stdin.read()))
+        else:
+            texts.append(read_source(source))
+    return parse("\n".join(texts))
+
+
+def rate_limit(value):
+    """argparse type for '500K' / '4M' style byte rates"""
+    from yt_dlp.utils import parse_bytes
+    rate = parse_bytes(value)
+    if rate is None:
+        raise argparse.ArgumentTypeError(f"invalid rate: {value}")
+    return rate
+
+
+def byte_size(value):
+    """argparse type for '500M' / '2G' style sizes"""
+    from yt_dlp.utils import parse_bytes
+    size = parse_bytes(value)
+    if size is None:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+    return size
+
+
+def section_spec(value):
+    """argparse type for '1:00-1:30, Intro' style clip sections"""
+    try:
+        return sections.parse(value).spec
+    except sections.SectionError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def interval(value):
+    """argparse type for '90m' / '6h' / '1d' sync intervals"""
+    try:
+        return parse_interval(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='snapvid',
+                                     description='SnapVid headless downloader')
+    parser.add_argument('urls', nargs='*', help='video URLs')
+    parser.add_argument('-i', '--input', action='append',
+                        help="text, CSV or JSON file of URLs ('-' for stdin)")
+    parser.add_argument('-q', '--quality', default='Best Quality', choices=QUALITIES)
+    parser.add_argument('-f', '--format', default='MP4', choices=FORMATS,
+                        dest='format_type')
+    parser.add_argument('-o', '--output', default=None,
+                        help=f'output folder (default: {default_download_path()})')
+    parser.add_argument('--scratch', metavar='DIR',
+                        help='keep partial files here (e.g. a fast SSD) and move finished ones to the output folder')
+    parser.add_argument('--min-free', type=byte_size, default=DEFAULT_HEADROOM, metavar='SIZE',
+                        help='free space to leave on each disk, e.g. 500M (default: 200M)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='concurrent downloads')
+    parser.add_argument('--fragments', type=int, default=None,
+                        help='parallel fragment downloads for DASH/HLS items')
+    parser.add_argument('--connections', type=int, default=None, metavar='N',
+                        help='parallel range requests per single-file download (1 disables, default: 4)')
+    parser.add_argument('--prefetch', type=int, default=None, metavar='N',
+                        help='resolve video info for the next N queued jobs ahead of the workers (0 disables)')
+    parser.add_argument('--post-workers', type=int, default=None, dest='postprocess_workers',
+                        help='parallel ffmpeg merges/conversions (default: one per core)')
+    parser.add_argument('-r', '--limit-rate', type=rate_limit, default=None, metavar='RATE',
+                        help='total bandwidth cap, e.g. 500K or 4M (bytes/s)')
+    parser.add_argument('--bandwidth-policy', default=FAIR, choices=POLICIES,
+                        help='who gets bandwidth first when capped (default: fair)')
+    parser.add_argument('--no-playlist', action='store_false', dest='bulk', default=None,
+                        help='treat playlist URLs as a single video')
+    parser.add_argument('--no-cache', action='store_false', dest='cache',
+                        help='always re-extract video information')
+    parser.add_argument('--no-archive', action='store_false', dest='archive',
+                        help='do not skip videos recorded in the download archive')
+    parser.add_argument('--no-retry', action='store_false', dest='retry',
+                        help='fail jobs on the first error instead of backing off and retrying')
+    parser.add_argument('--sections', type=section_spec, metavar='SPEC',
+                        help="download only these parts, e.g. '1:00-1:30, 45:10-, Intro' (ranges or chapter names)")
+    parser.add_argument('--precise-cuts', action='store_true',
+                        help='re-encode clips to cut on the exact frame instead of the nearest keyframe')
+    parser.add_argument('--force', action='store_true',
+                        help='download even if the archive says it is done')
+    parser.add_argument('--archive-import', metavar='FILE',
+                        help='merge a yt-dlp --download-archive file first')
+    parser.add_argument('--archive-export', metavar='FILE',
+                        help='write the archive in yt-dlp format when finished')
+    parser.add_argument('--scan', action='store_true',
+                        help='register files already in the output folder (archive and history)')
+    parser.add_argument('--history', metavar='QUERY', dest='history_query',
+                        help="print the newest history entries matching QUERY ('' for all)")
+    parser.add_argument('--history-export', metavar='FILE',
+                        help='write the history (or the --history matches) to CSV, JSON or JSON lines')
+    parser.add_argument('--subscribe', action='store_true',
+                        help='subscribe to the given channel/playlist URLs instead of downloading them once')
+    parser.add_argument('--every', type=interval, default=None, metavar='INTERVAL',
+                        help='sync interval for --subscribe, e.g. 90m, 6h or 1d (default: 6h)')
+    parser.add_argument('--backfill', type=int, default=None, metavar='N',
+                        help='download only the newest N existing entries on the first sync (0: new uploads only)')
+    parser.add_argument('--unsubscribe', action='append', metavar='ID_OR_URL',
+                        help='remove a subscription (downloaded files are kept)')
+    parser.add_argument('--subscriptions', action='store_true', dest='list_subscriptions',
+                        help='print the subscriptions with their last sync')
+    parser.add_argument('--sync', action='store_true',
+                        help='check every subscription for new uploads now and download them')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running and sync subscriptions whenever they are due')
+    parser.add_argument('--resume', action='store_true',
+                        help='re-queue jobs left unfinished by an earlier run')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='append per-job timings to FILE as JSON lines')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='serve Prometheus-style metrics on localhost:PORT/metrics')
+    parser.add_argument('--quiet', action='store_true',
+                        help='do not print the console log to stderr')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    maintenance = (args.archive_import or args.archive_export or args.scan or args.resume or
+                   args.history_query is not None or args.history_export or args.unsubscribe or
+                   args.list_subscriptions or args.sync or args.watch)
+    urls = read_urls(args, implicit_stdin=not maintenance)
+    if not urls and not maintenance:
+        print("snapvid: no URLs given", file=sys.stderr)
+        return 2
+
+    out = JsonEmitter()
+
+    def on_log(message, job):
+        if not args.quiet:
+            print(message, file=sys.stderr, flush=True)
+
+    metrics = Metrics(args.metrics)
+    engine = DownloadEngine(args.output, workers=args.workers, fragments=args.fragments,
+                            connections=args.connections,
+                            postprocess_workers=args.postprocess_workers, metrics=metrics,
+                            rate_limit=args.limit_rate, bandwidth_policy=args.bandwidth_policy,
+                            retry=args.retry, prefetch=args.prefetch,
+                            storage=OutputManager(args.scratch, args.min_free),
+                            cache=args.cache, archive=args.archive, schedule=args.watch,
+                            on_log=on_log, on_progress=out.progress,
+                            on_job_change=out.job_change, on_batch_done=out.batch_done)
+    if engine.archive is not None:
+        if args.archive_import:
+            added = engine.archive.import_file(args.archive_import)
+            out.emit('archive', imported=added, entries=len(engine.archive))
+        if args.scan:
+            added = engine.scan_output()
+            out.emit('archive', scanned=added, entries=len(engine.archive))
+    if engine.history is not None:
+        if args.scan:
+            added = engine.import_history()
+            out.emit('history', imported=added, entries=len(engine.history))
+        if args.history_query is not None:
+            for entry in engine.history.search(args.history_query):
+                out.emit('history', **entry)
+
+    if engine.subscriptions is not None:
+        for key in args.unsubscribe or []:
+            out.emit('subscription', removed=key, ok=engine.unsubscribe(key))
+        if args.subscribe:
+            for item in urls:
+                sub_id = engine.subscribe(item.url, args.quality, args.format_type, args.every,
+                                          args.output, args.backfill)
+                out.emit('subscription', id=sub_id, url=item.url,
+                         interval=format_interval(args.every or DEFAULT_INTERVAL))
+            # Their first sync runs below with --sync/--watch, else on the next one
+            urls = []
+        if args.list_subscriptions:
+            for sub in engine.subscriptions.all():
+                out.emit('subscription', **sub)
+
+    caps = engine.capabilities()
+    if caps is not None:
+        on_log(f"🧰 {caps.describe()}", None)
+
+    server = None
+    if args.metrics_port is not None:
+        server = MetricsServer(metrics, args.metrics_port).start()
+        on_log(f"📈 Metrics at {server.url}", None)
+
+    if args.resume:
+        out.emit('resume', jobs=engine.resume_pending())
+
+    if args.sync and engine.subscriptions is not None:
+        for sub in engine.subscriptions.all():
+            if sub['enabled']:
+                engine.sync_now(sub)
+
+    if urls:
+        engine.submit_many(urls, args.quality, args.format_type, bulk=args.bulk,
+                           force=args.force, sections=args.sections,
+                           precise_cuts=args.precise_cuts)
+    engine.start()
+
+    try:
+        # --watch keeps going after the queue drains; the scheduler adds syncs
+        while not engine.wait(timeout=0.5) or args.watch:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        engine.cancel_all()
+        engine.wait()
+    if args.archive_export and engine.archive is not None:
+        out.emit('archive', exported=engine.archive.export_file(args.archive_export))
+    if args.history_export and engine.history is not None:
+        out.emit('history', exported=engine.history.export_file(args.history_export,
+                                                                args.history_query))
+    engine.close()
+    if server is not None:
+        server.stop()
+
+    counts = engine.counts()
+    out.emit('metrics', bottleneck=metrics.bottleneck(), **metrics.counters())
+    out.emit('summary', **counts)
+    return 0 if counts[FAILED] == 0 and counts[CANCELLED] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+SnapVid - Startup Profile
+Import timings in the style of `python -X importtime` plus named startup
+phases, to see what stands between launching the app and its first frame
+"""
+
+import builtins
+import os
+import sys
+import threading
+import time
+from importlib.util import resolve_name
+
+# Opt in with the flag or the environment variable
+PROFILE_FLAG = '--profile-startup'
+PROFILE_ENV = 'SNAPVID_PROFILE_STARTUP'
+# Slowest imports listed in the report
+REPORT_IMPORTS = 25
+
+
+class ImportTimer:
+    """
+    Wraps builtins.__import__ and records, for every module loaded while
+    installed, its self and cumulative time like -X importtime. Unlike the
+    interpreter flag it works inside frozen PyInstaller builds.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._local = threading.local()
+        self._original = None
+
+    def install(self):
+        if self._original is None:
+            self._original = builtins.__import__
+            builtins.__import__ = self._import
+        return self
+
+    def uninstall(self):
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original or builtins.__import__
+        try:
+            absolute = resolve_name('.' * level + name, (globals or {}).get('__package__')) \
+                if level else name
+        except (ImportError, ValueError):
+            absolute = name
+        if absolute in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.records.append((absolute, elapsed - children, elapsed, len(stack),
+                                 threading.current_thread().name))
+
+    def slowest(self, limit=REPORT_IMPORTS):
+        """(module, self, cumulative, depth, thread) records, slowest cumulative first"""
+        return sorted(self.records, key=lambda r: r[2], reverse=True)[:limit]
+
+
+class StartupProfile:
+    """Phase marks (seconds since the profile was created) plus an ImportTimer"""
+
+    def __init__(self, imports=True):
+        self.started = time.perf_counter()
+        self.phases = []
+        self.imports = ImportTimer().install() if imports else None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_argv(cls, argv):
+        """A profile if requested on the command line or in the environment, else None"""
+        requested = os.environ.get(PROFILE_ENV) not in (None, '', '0')
+        if PROFILE_FLAG in argv:
+            argv.remove(PROFILE_FLAG)
+            requested = True
+        return cls() if requested else None
+
+    def mark(self, phase):
+        with self._lock:
+            self.phases.append((phase, time.perf_counter() - self.started))
+
+    def finish(self):
+        """Stop timing imports"""
+        if self.imports is not None:
+            self.imports.uninstall()
+
+    def report(self, limit=REPORT_IMPORTS):
+        """Report lines: phases in order, then the slowest imports"""
+        lines = ["⏱️  Startup profile"]
+        previous = 0.0
+        for phase, at in self.phases:
+            lines.append(f"   {at * 1000:8.1f} ms  (+{(at - previous) * 1000:7.1f})  {phase}")
+            previous = at
+        if self.imports is not None and self.imports.records:
+            total = sum(r[1] for r in self.imports.records)
+            lines.append(f"   {len(self.imports.records)} modules imported in {total * 1000:.1f} ms; "
+                         f"slowest (self [us] | cumulative | module):")
+            for module, own, cumulative, depth, thread in self.imports.slowest(limit):
+                where = "" if thread == 'MainThread' else f"  [{thread}]"
+                lines.append(f"   {own * 1e6:9.0f} | {cumulative * 1e6:10.0f} | "
+                             f"{'  ' * depth}{module}{where}")
+        return lines
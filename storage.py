@@ -0,0 +1,231 @@
+"""
+SnapVid - Output Storage
+Free-space admission with reservations for in-flight downloads, a scratch
+directory for partial files and collision-safe atomic moves into place
+"""
+
+import errno
+import os
+import shutil
+import threading
+
+from postprocess import temp_output
+
+# Space always left free on a volume (bytes)
+DEFAULT_HEADROOM = 200 * 1024 * 1024
+# Hidden folder inside the output folder for partial files when there is no scratch
+WORK_DIR = '.snapvid-partial'
+
+
+class DiskSpaceError(OSError):
+    """A job would not fit on its volume; ENOSPC so the retry policy gives up at once"""
+
+    def __init__(self, message):
+        super().__init__(errno.ENOSPC, message)
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def existing_parent(path):
+    """`path` or its nearest ancestor that exists (the directory may not be created yet)"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def volume_of(path):
+    """Device ID of the filesystem holding path"""
+    return os.stat(existing_parent(path)).st_dev
+
+
+def free_space(path):
+    return shutil.disk_usage(existing_parent(path)).free
+
+
+def format_size(fmt, duration=None):
+    """Expected bytes for one format: exact, approximate or from its bitrate"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return int(size)
+    duration = fmt.get('duration') or duration
+    if fmt.get('tbr') and duration:
+        return int(fmt['tbr'] * 125 * duration)
+    return None
+
+
+def expected_size(info, selection=None):
+    """Bytes a download will write, from the chosen formats; None if unknown"""
+    if selection is not None:
+        formats = [f for f in (selection.video, selection.audio) if f]
+    else:
+        formats = [info]
+    sizes = [format_size(f, info.get('duration')) for f in formats]
+    if not sizes or None in sizes:
+        return None
+    return sum(sizes)
+
+
+class Reservation:
+    """
+    Space one job still needs: what is left of its `download` on the work
+    volume, plus a second copy on the output volume when ffmpeg rewrites
+    the files (`processed`) or they are moved off a separate scratch disk
+    """
+
+    def __init__(self, work, path, processed=False):
+        self.work = work
+        self.path = path
+        self.work_volume = volume_of(work)
+        self.output_volume = volume_of(path)
+        self.copied = processed or self.work_volume != self.output_volume
+        self.download = 0
+        self.written = {}
+        self.totals = {}
+
+    def outstanding(self, volume, download=None):
+        download = self.download if download is None else download
+        needed = 0
+        if volume == self.work_volume:
+            needed += max(0, download - sum(self.written.values()))
+        if volume == self.output_volume and self.copied:
+            needed += download
+        return needed
+
+
+class OutputManager:
+    """
+    Where a job's files live and whether they fit. Partial files go to
+    `scratch` (a hidden WORK_DIR in the output folder when None); admit() checks a job's
+    expected size against the volume's free space minus what running
+    jobs still have to write, and finalize() renames the finished file
+    into the output folder without clobbering an existing one.
+    """
+
+    def __init__(self, scratch=None, headroom=DEFAULT_HEADROOM):
+        self.scratch = scratch
+        self.headroom = headroom
+        self._reservations = {}
+        self._claims = {}
+        self._lock = threading.Lock()
+        if scratch:
+            os.makedirs(scratch, exist_ok=True)
+
+    def work_dir(self, path):
+        """Directory a job downloads into before its files are finalized to `path`"""
+        return self.scratch or os.path.join(path, WORK_DIR)
+
+    # ========== ADMISSION ==========
+    def reserved(self, path):
+        """Bytes running jobs still have to write to the volume holding path"""
+        volume = volume_of(path)
+        with self._lock:
+            return sum(r.outstanding(volume) for r in self._reservations.values())
+
+    def admit(self, job_id, path, size, processed=False):
+        """
+        Reserve space for a job about to download `size` bytes that end up
+        in `path`; raises DiskSpaceError if they do not fit. `processed`
+        jobs are written again by ffmpeg before their inputs are deleted.
+        Unknown sizes only check the headroom.
+        """
+        reservation = Reservation(self.work_dir(path), path, processed)
+        with self._lock:
+            self._reservations.pop(job_id, None)
+            self._check(reservation, size or 0)
+            self._reservations[job_id] = reservation
+
+    def _check(self, reservation, size):
+        """Grow a reservation to `size` download bytes if every volume has room (lock held)"""
+        volumes = {reservation.work_volume: reservation.work}
+        volumes.setdefault(reservation.output_volume, reservation.path)
+        for volume, where in volumes.items():
+            needed = reservation.outstanding(volume, size)
+            pending = sum(r.outstanding(volume) for r in self._reservations.values()
+                          if r is not reservation)
+            free = free_space(where)
+            if needed + pending + self.headroom > free:
+                raise DiskSpaceError(
+                    f"Not enough disk space in {where}: {format_bytes(free)} free, "
+                    f"this download needs {format_bytes(needed) if size else 'an unknown amount'}, "
+                    f"running downloads {format_bytes(pending)}, "
+                    f"keeping {format_bytes(self.headroom)} spare")
+        reservation.download = size
+
+    def progress(self, job_id, filename, downloaded, total=0):
+        """
+        Bytes written so far for one of a job's files. A file turning out
+        bigger than the info dict promised grows the reservation, raising
+        DiskSpaceError (which aborts the transfer) if it no longer fits.
+        """
+        with self._lock:
+            reservation = self._reservations.get(job_id)
+            if reservation is None or not filename:
+                return
+            reservation.written[filename] = downloaded
+            if total and total > reservation.totals.get(filename, 0):
+                reservation.totals[filename] = total
+                size = sum(reservation.totals.values())
+                if size > reservation.download:
+                    self._check(reservation, size)
+
+    def release(self, job_id):
+        """The job stopped running - drop its reservation and unused name claims"""
+        with self._lock:
+            self._reservations.pop(job_id, None)
+            self._claims.pop(job_id, None)
+
+    # ========== FINALIZE ==========
+    def claim(self, job_id, destination):
+        """
+        A free name for a job's final file: `destination`, or 'name (2).ext'
+        and so on when it exists or another job is about to write it
+        """
+        base, ext = os.path.splitext(destination)
+        with self._lock:
+            taken = {p for paths in self._claims.values() for p in paths}
+            candidate, n = destination, 1
+            while candidate in taken or os.path.exists(candidate):
+                n += 1
+                candidate = f"{base} ({n}){ext}"
+            self._claims.setdefault(job_id, set()).add(candidate)
+        return candidate
+
+    def finalize(self, job_id, source, path, name=None):
+        """
+        Move a finished file from the work directory into `path` under a
+        claimed name (`name`, by default the source's). Same-volume moves
+        are a single rename; otherwise the copy goes to a temp sibling
+        first, so the output folder only ever holds complete files.
+        Returns the final path.
+        """
+        os.makedirs(path, exist_ok=True)
+        destination = self.claim(job_id, os.path.join(path, name or os.path.basename(source)))
+        try:
+            if volume_of(source) == volume_of(path):
+                os.replace(source, destination)
+            else:
+                temp = temp_output(destination)
+                try:
+                    shutil.copyfile(source, temp)
+                    os.replace(temp, destination)
+                except BaseException:
+                    if os.path.exists(temp):
+                        os.remove(temp)
+                    raise
+                os.remove(source)
+        finally:
+            with self._lock:
+                claims = self._claims.get(job_id)
+                if claims is not None:
+                    claims.discard(destination)
+        return destination
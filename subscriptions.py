@@ -0,0 +1,392 @@
+"""
+SnapVid - Subscriptions
+Channels and playlists synced on a schedule. A watermark of the newest
+entries seen per source lets each sync stop at the first known uploads
+instead of walking the whole listing again
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs
+
+# Seconds between syncs of one source unless it sets its own
+DEFAULT_INTERVAL = 6 * 3600
+# Shortest interval accepted
+MIN_INTERVAL = 5 * 60
+# Delay before a failed sync is tried again (if sooner than its interval)
+RETRY_DELAY = 15 * 60
+# Newest entry IDs remembered per listing (a channel's tabs count separately)
+WATERMARK_SIZE = 50
+# Known entries in a row that end a sync - pinned or re-ordered videos can
+# put a few known ones ahead of new uploads
+BREAK_AFTER = 3
+# Entries fetched per request from listings that are paged on demand
+PAGE_SIZE = 50
+# Syncs a failed entry is re-queued on before it is dropped
+ENTRY_RETRIES = 3
+# Seconds between scheduler checks for due sources
+TICK = 30
+# Entries that cannot be downloaded yet; they stay new until they can
+PENDING_LIVE = ('is_upcoming', 'is_live')
+
+COLUMNS = ('id', 'url', 'title', 'quality', 'format', 'path', 'interval', 'backfill', 'enabled',
+           'last_upload', 'last_sync', 'next_sync', 'last_new', 'last_error', 'created')
+
+INTERVAL = re.compile(r'^(\d+(?:\.\d+)?)\s*([smhdw]?)$', re.IGNORECASE)
+UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_interval(text):
+    """Seconds from '3600', '90m', '6h' or '1d'; ValueError below MIN_INTERVAL"""
+    match = INTERVAL.match(str(text).strip())
+    if not match:
+        raise ValueError(f"Not an interval: {text!r} (use 90m, 6h or 1d)")
+    seconds = float(match.group(1)) * UNITS[match.group(2).lower()]
+    if seconds < MIN_INTERVAL:
+        raise ValueError(f"Interval too short: {text!r} (at least {MIN_INTERVAL // 60} minutes)")
+    return seconds
+
+
+def format_interval(seconds):
+    for unit, size in (('w', 604800), ('d', 86400), ('h', 3600), ('m', 60)):
+        if seconds >= size and seconds % size == 0:
+            return f"{int(seconds // size)}{unit}"
+    return f"{int(seconds)}s"
+
+
+def is_date_ordered(url):
+    """Channel listings run newest upload first; playlists follow their own order"""
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return False
+    return 'list' not in parse_qs(parsed.query) and '/playlist' not in parsed.path
+
+
+def entry_key(entry, url):
+    return entry.get('id') or url
+
+
+def entry_date(entry):
+    """Upload date of a flat entry as YYYYMMDD, None when the listing omits it"""
+    if entry.get('upload_date'):
+        return entry['upload_date']
+    timestamp = entry.get('timestamp') or entry.get('release_timestamp')
+    if timestamp:
+        return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y%m%d')
+    return None
+
+
+def iter_entries(entries):
+    """
+    Entries of an unprocessed playlist result one by one: generators and
+    lists as they are, paged lists a page at a time, so stopping early
+    never requests the pages behind the stop
+    """
+    if entries is None:
+        return
+    if hasattr(entries, 'getslice'):
+        start = 0
+        while True:
+            page = entries.getslice(start, start + PAGE_SIZE)
+            yield from page
+            if len(page) < PAGE_SIZE:
+                return
+            start += PAGE_SIZE
+    else:
+        yield from entries
+
+
+class Watermark:
+    """
+    Newest entry IDs seen per listing of a source (newest first) and the
+    latest upload date among them
+    """
+
+    def __init__(self, listings=None, upload_date=None):
+        self.listings = {url: list(ids) for url, ids in (listings or {}).items()}
+        self.upload_date = upload_date
+        self._known = {key for ids in self.listings.values() for key in ids}
+
+    @property
+    def empty(self):
+        return not self._known
+
+    def __contains__(self, key):
+        return key in self._known
+
+    def advanced(self, seen, dates=()):
+        """Watermark after a sync that found `seen` ({listing: [keys newest first]})"""
+        listings = dict(self.listings)
+        for url, keys in seen.items():
+            if not keys:
+                continue
+            fresh = set(keys)
+            listings[url] = (keys + [k for k in listings.get(url, []) if k not in fresh])[:WATERMARK_SIZE]
+        upload_date = max([d for d in dates if d] + ([self.upload_date] if self.upload_date else []),
+                          default=None)
+        return Watermark(listings, upload_date)
+
+    def to_json(self):
+        return json.dumps(self.listings)
+
+
+def new_entries(info, watermark, existing=None, date_ordered=False, nested=None):
+    """
+    Yield (url, entry) for entries of a flat listing not yet covered by
+    the watermark, newest first. Like yt-dlp's break_on_existing, the walk
+    ends at known entries (in the watermark, or `existing(entry)` such as
+    the archive): after BREAK_AFTER in a row, or at the first one older
+    than the watermark's upload date in a date-ordered listing. A source
+    without a watermark is walked in full. Entries `nested(url)` marks as
+    listings themselves (channel tabs) are passed through unchecked.
+    """
+    streak = 0
+    for entry in iter_entries(info.get('entries')):
+        if not entry:
+            continue
+        url = entry.get('url') or entry.get('webpage_url')
+        if not url:
+            continue
+        if nested is not None and nested(url):
+            yield url, entry
+            continue
+        if entry.get('live_status') in PENDING_LIVE:
+            continue
+        if watermark.empty:
+            yield url, entry
+            continue
+        date = entry_date(entry)
+        if date_ordered and date and watermark.upload_date and date < watermark.upload_date:
+            return
+        if entry_key(entry, url) in watermark or (existing is not None and existing(entry)):
+            streak += 1
+            if streak >= BREAK_AFTER:
+                return
+            continue
+        streak = 0
+        yield url, entry
+
+
+class SubscriptionStore:
+    """
+    SQLite table of subscribed sources with their download settings,
+    schedule and watermark (~/.snapvid/subscriptions.sqlite)
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                title TEXT,
+                quality TEXT NOT NULL,
+                format TEXT NOT NULL,
+                path TEXT,
+                interval REAL NOT NULL,
+                backfill INTEGER,
+                enabled INTEGER NOT NULL DEFAULT 1,
+                watermark TEXT NOT NULL DEFAULT '{}',
+                last_upload TEXT,
+                missed TEXT NOT NULL DEFAULT '{}',
+                last_sync REAL,
+                next_sync REAL NOT NULL DEFAULT 0,
+                last_new INTEGER,
+                last_error TEXT,
+                created REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS subscriptions_due ON subscriptions (enabled, next_sync);
+        """)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM subscriptions").fetchone()[0]
+
+    # ========== SOURCES ==========
+    def add(self, url, quality, format_type, path=None, interval=DEFAULT_INTERVAL, backfill=None):
+        """
+        Subscribe to a source, or update its settings (the watermark is
+        kept); returns its id. `backfill` caps how many existing entries
+        the first sync downloads (None: all of them, 0: only new ones).
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO subscriptions (url, quality, format, path, interval, backfill, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (url) DO UPDATE SET "
+                "quality = excluded.quality, format = excluded.format, path = excluded.path, "
+                "interval = excluded.interval, backfill = excluded.backfill, enabled = 1",
+                (url, quality, format_type, path, interval, backfill, time.time()))
+            self._db.commit()
+            return self._db.execute("SELECT id FROM subscriptions WHERE url = ?", (url,)).fetchone()[0]
+
+    def _select(self, where="", params=()):
+        sql = f"SELECT {', '.join(COLUMNS)} FROM subscriptions {where}"
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def get(self, key):
+        """A source by id or URL, as a dict; None if unknown"""
+        column = 'id' if str(key).isdigit() else 'url'
+        rows = self._select(f"WHERE {column} = ?", (key,))
+        return rows[0] if rows else None
+
+    def all(self):
+        return self._select("ORDER BY id")
+
+    def remove(self, key):
+        column = 'id' if str(key).isdigit() else 'url'
+        with self._lock:
+            removed = self._db.execute(f"DELETE FROM subscriptions WHERE {column} = ?", (key,)).rowcount
+            self._db.commit()
+        return removed > 0
+
+    def set_enabled(self, sub_id, enabled):
+        with self._lock:
+            self._db.execute("UPDATE subscriptions SET enabled = ? WHERE id = ?", (int(enabled), sub_id))
+            self._db.commit()
+
+    # ========== SCHEDULE ==========
+    def claim_due(self, now=None):
+        """
+        Enabled sources whose next sync is due. Each is pushed one interval
+        ahead right away, so a slow sync is not claimed twice.
+        """
+        now = now or time.time()
+        with self._lock:
+            rows = [dict(row) for row in self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM subscriptions "
+                f"WHERE enabled = 1 AND next_sync <= ? ORDER BY next_sync", (now,))]
+            self._db.executemany("UPDATE subscriptions SET next_sync = ? + interval WHERE id = ?",
+                                 [(now, row['id']) for row in rows])
+            self._db.commit()
+        return rows
+
+    # ========== WATERMARKS ==========
+    def watermark(self, sub_id):
+        with self._lock:
+            row = self._db.execute("SELECT watermark, last_upload FROM subscriptions WHERE id = ?",
+                                   (sub_id,)).fetchone()
+        if row is None:
+            return Watermark()
+        return Watermark(json.loads(row['watermark']), row['last_upload'])
+
+    def synced(self, sub_id, watermark, title=None, new=0):
+        """Store the watermark a sync advanced to and schedule the next one"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE subscriptions SET watermark = ?, last_upload = ?, title = COALESCE(?, title), "
+                "last_sync = ?, next_sync = ? + interval, last_new = ?, last_error = NULL WHERE id = ?",
+                (watermark.to_json(), watermark.upload_date, title, now, now, new, sub_id))
+            self._db.commit()
+
+    def sync_failed(self, sub_id, error):
+        """Keep the watermark; retry after RETRY_DELAY unless the interval is shorter"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE subscriptions SET last_error = ?, next_sync = ? + MIN(interval, ?) WHERE id = ?",
+                (str(error), now, RETRY_DELAY, sub_id))
+            self._db.commit()
+
+    # ========== MISSED ENTRIES ==========
+    def missed(self, sub_id):
+        """URLs of entries whose download failed, re-queued by the next sync"""
+        with self._lock:
+            row = self._db.execute("SELECT missed FROM subscriptions WHERE id = ?", (sub_id,)).fetchone()
+        return list(json.loads(row['missed'])) if row else []
+
+    def _update_missed(self, sub_id, change):
+        with self._lock:
+            row = self._db.execute("SELECT missed FROM subscriptions WHERE id = ?", (sub_id,)).fetchone()
+            if row is None:
+                return None
+            missed = json.loads(row['missed'])
+            result = change(missed)
+            self._db.execute("UPDATE subscriptions SET missed = ? WHERE id = ?",
+                             (json.dumps(missed), sub_id))
+            self._db.commit()
+            return result
+
+    def miss(self, sub_id, url):
+        """
+        Remember a failed entry (the watermark is already past it); returns
+        False once it has failed ENTRY_RETRIES syncs and is dropped
+        """
+        def change(missed):
+            missed[url] = missed.get(url, 0) + 1
+            if missed[url] > ENTRY_RETRIES:
+                del missed[url]
+                return False
+            return True
+        return self._update_missed(sub_id, change)
+
+    def expect(self, sub_id, url):
+        """
+        Hold on to an entry some other job is downloading, so it is queued
+        again if that job does not finish it (resolve() clears it)
+        """
+        self._update_missed(sub_id, lambda missed: missed.setdefault(url, 0))
+
+    def resolve(self, sub_id, url):
+        """A missed entry was downloaded after all"""
+        if url in self.missed(sub_id):
+            self._update_missed(sub_id, lambda missed: missed.pop(url, None))
+
+
+class SyncScheduler:
+    """
+    Background thread that calls `sync_due()` every `tick` seconds; the
+    engine's callback queues a sync job for each due source. poke() checks
+    right away (after subscribing or changing an interval).
+    """
+
+    def __init__(self, sync_due, tick=TICK):
+        self.sync_due = sync_due
+        self.tick = tick
+        self._thread = None
+        self._wake = threading.Event()
+        self._running = False
+
+    # ========== LIFECYCLE ==========
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="snapvid-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=False):
+        if not self._running:
+            return
+        self._running = False
+        self._wake.set()
+        if wait:
+            self._thread.join()
+
+    def poke(self):
+        self._wake.set()
+
+    # ========== INTERNALS ==========
+    def _loop(self):
+        while self._running:
+            try:
+                self.sync_due()
+            except Exception as e:
+                print(f"Subscription sync error: {e}")
+            self._wake.wait(self.tick)
+            self._wake.clear()
@@ -0,0 +1,141 @@
+"""
+Format ranking on fixture info dicts (python -m pytest)
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from engine import DownloadEngine
+from format_selector import select_formats
+from toolchain import Toolchain, ToolchainError
+
+
+def video(format_id, height, vcodec, ext='mp4', tbr=1000, fps=30):
+    return {'format_id': format_id, 'height': height, 'vcodec': vcodec, 'acodec': 'none',
+            'ext': ext, 'tbr': tbr, 'fps': fps}
+
+
+def audio(format_id, acodec, abr, ext='m4a'):
+    return {'format_id': format_id, 'vcodec': 'none', 'acodec': acodec, 'abr': abr, 'ext': ext}
+
+
+def progressive(format_id, height, vcodec='avc1.42001E', acodec='mp4a.40.2', ext='mp4'):
+    return {'format_id': format_id, 'height': height, 'vcodec': vcodec, 'acodec': acodec,
+            'ext': ext, 'tbr': 500}
+
+
+# A YouTube-like listing: avc1/vp9/av1 video up to 1080p, AAC and Opus audio
+YOUTUBE = {'formats': [
+    progressive('18', 360),
+    progressive('22', 720),
+    video('137', 1080, 'avc1.640028', tbr=4000),
+    video('248', 1080, 'vp09.00.40.08', ext='webm', tbr=2500),
+    video('399', 1080, 'av01.0.08M.08', tbr=2000),
+    video('136', 720, 'avc1.4d401f', tbr=2000),
+    video('247', 720, 'vp09.00.31.08', ext='webm', tbr=1500),
+    audio('140', 'mp4a.40.2', 129),
+    audio('251', 'opus', 135, ext='webm'),
+]}
+
+
+def merge_plan(selection, encoders):
+    """Engine.merge_plan against an ffmpeg that has exactly `encoders`"""
+    caps = Toolchain(ffmpeg='ffmpeg', version='6.0', encoders={name: 'V' for name in encoders})
+    return DownloadEngine.merge_plan(SimpleNamespace(capabilities=lambda: caps), selection)
+
+
+# ========== CODEC PREFERENCE ==========
+def test_mp4_prefers_avc1_pair_at_best_height():
+    selection = select_formats(YOUTUBE, "Best Quality", "MP4")
+    assert selection.format_id == '137+140'
+    assert selection.stream_copy
+
+
+def test_webm_prefers_vp9_and_opus():
+    selection = select_formats(YOUTUBE, "Best Quality", "WEBM")
+    assert selection.format_id == '248+251'
+    assert selection.container == 'webm'
+    assert selection.stream_copy
+
+
+def test_height_outranks_codec_fit():
+    info = {'formats': [video('136', 720, 'avc1.4d401f'),
+                        video('248', 1080, 'vp09.00.40.08', ext='webm'),
+                        audio('140', 'mp4a.40.2', 129)]}
+    # VP9 is still stream-copyable into MP4, so the extra resolution wins
+    assert select_formats(info, "Best Quality", "MP4").format_id == '248+140'
+
+
+def test_quality_caps_the_height():
+    info = {'formats': [f for f in YOUTUBE['formats'] if f['format_id'] != '22']}
+    assert select_formats(info, "720p", "MP4").format_id == '136+140'
+
+
+def test_audio_only_picks_native_codec():
+    assert select_formats(YOUTUBE, "Audio Only", "MP4").format_id == '140'
+    assert select_formats(YOUTUBE, "Audio Only", "WEBM").format_id == '251'
+    assert select_formats(YOUTUBE, "Best Quality", "OPUS").format_id == '251'
+
+
+# ========== SPLIT PAIR VS PROGRESSIVE ==========
+def test_split_pair_beats_lower_progressive():
+    selection = select_formats(YOUTUBE, "1080p", "MP4")
+    assert selection.merged
+    assert selection.video['height'] == 1080
+
+
+def test_progressive_wins_at_same_height():
+    info = {'formats': [progressive('22', 720), video('136', 720, 'avc1.4d401f'),
+                        audio('140', 'mp4a.40.2', 129)]}
+    selection = select_formats(info, "Best Quality", "MP4")
+    assert selection.format_id == '22'
+    assert not selection.merged
+
+
+def test_copyable_pair_beats_progressive_that_needs_conversion():
+    info = {'formats': [progressive('43', 720, 'vp8', 'vorbis', ext='webm'),
+                        video('136', 720, 'avc1.4d401f'), audio('140', 'mp4a.40.2', 129)]}
+    assert select_formats(info, "Best Quality", "MP4").format_id == '136+140'
+
+
+def test_without_ffmpeg_only_progressive():
+    assert select_formats(YOUTUBE, "Best Quality", "MP4", can_merge=False).format_id == '22'
+
+
+def test_no_format_list():
+    assert select_formats({'formats': []}, "Best Quality", "MP4") is None
+
+
+# ========== CONVERSION FALLBACK ==========
+def test_pair_the_container_cannot_take_needs_conversion():
+    info = {'formats': [video('137', 1080, 'avc1.640028'), audio('140', 'mp4a.40.2', 129)]}
+    selection = select_formats(info, "Best Quality", "WEBM")
+    assert selection.format_id == '137+140'
+    assert not selection.stream_copy
+    assert "needs conversion" in selection.describe()
+
+
+def test_merge_plan_copies_compatible_streams():
+    selection = select_formats(YOUTUBE, "Best Quality", "MP4")
+    assert merge_plan(selection, ['libx264', 'aac']) == (('copy', 'copy'), None)
+
+
+def test_merge_plan_converts_incompatible_streams():
+    info = {'formats': [video('137', 1080, 'avc1.640028'), audio('140', 'mp4a.40.2', 129)]}
+    selection = select_formats(info, "Best Quality", "WEBM")
+    plan = merge_plan(selection, ['libvpx', 'libvpx-vp9', 'libopus'])
+    assert plan == (('libvpx-vp9', 'libopus'), None)
+
+
+def test_merge_plan_falls_back_for_unknown_codecs():
+    info = {'formats': [video('0', 720, None), audio('1', None, 128)]}
+    selection = select_formats(info, "Best Quality", "MP4")
+    assert merge_plan(selection, ['libx264', 'aac']) == (('copy', 'copy'), ('libx264', 'aac'))
+
+
+def test_merge_plan_rejects_conversion_without_encoder():
+    info = {'formats': [video('137', 1080, 'avc1.640028'), audio('140', 'mp4a.40.2', 129)]}
+    selection = select_formats(info, "Best Quality", "WEBM")
+    with pytest.raises(ToolchainError):
+        merge_plan(selection, ['libx264', 'aac'])
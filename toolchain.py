@@ -0,0 +1,231 @@
+"""
+SnapVid - Toolchain Probe
+What the installed ffmpeg/ffprobe can actually do (version, encoders,
+muxers, hardware accelerators), probed once per binary and cached on disk
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+
+# Seconds one probe command may take
+PROBE_TIMEOUT = 15
+# MP3 encoders in order of preference (libshine/mp3_mf ship in some builds instead of LAME)
+MP3_ENCODERS = ('libmp3lame', 'libshine', 'mp3_mf')
+# Encoders per audio container, for sources that cannot be stream-copied
+AUDIO_ENCODERS = {
+    'mp3': MP3_ENCODERS,
+    'm4a': ('libfdk_aac', 'aac', 'aac_at'),
+    'opus': ('libopus', 'opus'),
+    'ogg': ('libvorbis', 'libopus', 'vorbis'),
+}
+# Video encoders per merge container, for streams that cannot be stream-copied
+VIDEO_ENCODERS = {
+    'mp4': ('libx264', 'h264_videotoolbox', 'libopenh264'),
+    'webm': ('libvpx-vp9', 'libvpx'),
+}
+# Audio container whose encoders produce audio each merge container takes
+MERGE_AUDIO = {'mp4': 'm4a', 'webm': 'opus'}
+# ffmpeg muxer that writes each audio container
+AUDIO_MUXERS = {'mp3': 'mp3', 'm4a': 'ipod', 'opus': 'opus', 'ogg': 'ogg'}
+# Bump when the stored fields change so old cache entries are re-probed
+CACHE_VERSION = 1
+
+VERSION_PATTERN = re.compile(r'version\s+(\S+)')
+
+
+class ToolchainError(RuntimeError):
+    """The local ffmpeg cannot produce what a job asked for"""
+
+
+def binary(ffmpeg_dir, name):
+    """Executable `name` inside a directory as returned by get_ffmpeg_path()"""
+    if sys.platform == 'win32':
+        name += '.exe'
+    return os.path.join(ffmpeg_dir, name) if ffmpeg_dir else name
+
+
+# ========== PARSING ==========
+def parse_version(text):
+    match = VERSION_PATTERN.search(text or '')
+    return match.group(1) if match else None
+
+
+def parse_listing(text):
+    """
+    Names from `ffmpeg -encoders` / `-muxers` style output: rows after the
+    '---' rule, `FLAGS name[,alias] description`. Returns {name: flags}.
+    """
+    entries = {}
+    started = False
+    for line in (text or '').splitlines():
+        if not started:
+            started = line.strip().startswith('--')
+            continue
+        parts = line.split()
+        if len(parts) < 2:
+            continue
+        flags, names = parts[0], parts[1]
+        for name in names.split(','):
+            entries[name] = flags
+    return entries
+
+
+def parse_hwaccels(text):
+    lines = (text or '').splitlines()
+    return [line.strip() for line in lines[1:] if line.strip()]
+
+
+class Toolchain:
+    """Capabilities of one ffmpeg install; ffmpeg is None when none was found"""
+
+    def __init__(self, ffmpeg=None, ffprobe=None, version=None, ffprobe_version=None,
+                 encoders=None, muxers=None, hwaccels=None):
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.version = version
+        self.ffprobe_version = ffprobe_version
+        self.encoders = encoders or {}
+        self.muxers = set(muxers or ())
+        self.hwaccels = list(hwaccels or ())
+
+    @property
+    def available(self):
+        return self.ffmpeg is not None
+
+    def can_mux(self, container):
+        return self.available and container in self.muxers
+
+    def mp3_encoder(self):
+        """Best available MP3 encoder, or None"""
+        return self.audio_encoder('mp3')
+
+    def audio_encoder(self, container):
+        """Best available encoder for an audio container (see AUDIO_ENCODERS), or None"""
+        return next((name for name in AUDIO_ENCODERS.get(container, ()) if name in self.encoders), None)
+
+    def video_encoder(self, container):
+        """Best available video encoder for a merge container (see VIDEO_ENCODERS), or None"""
+        return next((name for name in VIDEO_ENCODERS.get(container, ()) if name in self.encoders), None)
+
+    def can_write_audio(self, container):
+        return self.can_mux(AUDIO_MUXERS.get(container, container))
+
+    def describe(self):
+        if not self.available:
+            return "ffmpeg not found"
+        hw = ', '.join(self.hwaccels) if self.hwaccels else 'none'
+        probe = f"ffprobe {self.ffprobe_version}" if self.ffprobe else "no ffprobe"
+        return (f"ffmpeg {self.version} • {len(self.encoders)} encoders • "
+                f"{len(self.muxers)} muxers • hw accel: {hw} • {probe}")
+
+    def to_dict(self):
+        return {
+            'ffmpeg': self.ffmpeg,
+            'ffprobe': self.ffprobe,
+            'version': self.version,
+            'ffprobe_version': self.ffprobe_version,
+            'encoders': self.encoders,
+            'muxers': sorted(self.muxers),
+            'hwaccels': self.hwaccels,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+# ========== PROBING ==========
+def run_probe(command):
+    """stdout of a quick ffmpeg/ffprobe invocation ('' on failure)"""
+    try:
+        result = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True,
+                                timeout=PROBE_TIMEOUT)
+    except (OSError, subprocess.SubprocessError):
+        return ''
+    return result.stdout.decode('utf-8', 'replace')
+
+
+def probe(ffmpeg_dir):
+    """Run ffmpeg/ffprobe and collect their capabilities (a few hundred ms)"""
+    ffmpeg = binary(ffmpeg_dir, 'ffmpeg')
+    version_text = run_probe([ffmpeg, '-hide_banner', '-version'])
+    if not version_text:
+        return Toolchain()
+    ffprobe = binary(ffmpeg_dir, 'ffprobe')
+    ffprobe_version = parse_version(run_probe([ffprobe, '-hide_banner', '-version']))
+    return Toolchain(
+        ffmpeg=ffmpeg,
+        ffprobe=ffprobe if ffprobe_version else None,
+        version=parse_version(version_text),
+        ffprobe_version=ffprobe_version,
+        encoders=parse_listing(run_probe([ffmpeg, '-hide_banner', '-encoders'])),
+        muxers=[name for name, flags in parse_listing(
+            run_probe([ffmpeg, '-hide_banner', '-muxers'])).items() if 'E' in flags],
+        hwaccels=parse_hwaccels(run_probe([ffmpeg, '-hide_banner', '-hwaccels'])),
+    )
+
+
+def fingerprint(ffmpeg_dir):
+    """Cache key: resolved binary path, mtime and size - changes on every upgrade"""
+    path = os.path.realpath(binary(ffmpeg_dir, 'ffmpeg'))
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{path}|{st.st_mtime_ns}|{st.st_size}"
+
+
+class ToolchainCache:
+    """
+    JSON file of probe results keyed by fingerprint(), so ffmpeg only runs
+    again after it is replaced. get() is memoized per directory and safe to
+    call from any thread.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._loaded = {}
+
+    def get(self, ffmpeg_dir):
+        if not ffmpeg_dir:
+            return Toolchain()
+        with self._lock:
+            toolchain = self._loaded.get(ffmpeg_dir)
+            if toolchain is not None:
+                return toolchain
+            key = fingerprint(ffmpeg_dir)
+            stored = self._read()
+            entry = stored.get(key) if key else None
+            if entry is not None and entry.get('cache_version') == CACHE_VERSION:
+                toolchain = Toolchain.from_dict(entry['toolchain'])
+            else:
+                toolchain = probe(ffmpeg_dir)
+                if key and toolchain.available:
+                    # One entry per binary path - drop probes of replaced builds
+                    path = key.split('|', 1)[0]
+                    stored = {k: v for k, v in stored.items() if k.split('|', 1)[0] != path}
+                    stored[key] = {'cache_version': CACHE_VERSION, 'toolchain': toolchain.to_dict()}
+                    self._write(stored)
+            self._loaded[ffmpeg_dir] = toolchain
+            return toolchain
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, stored):
+        temp = self.path + '.tmp'
+        try:
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(stored, f)
+            os.replace(temp, self.path)
+        except OSError as e:
+            print(f"Toolchain cache error: {e}")
@@ -0,0 +1,61 @@
+"""
+SnapVid - UI Event Channel
+Thread-safe hand-off from download workers to the Tk main loop
+"""
+
+import queue
+import threading
+
+# ========== EVENT KINDS ==========
+LOG = 'log'
+PROGRESS = 'progress'
+CALL = 'call'
+
+# Default redraw rate for the Tk pump
+FRAME_RATE = 20
+
+
+class UIEventChannel:
+    """
+    Workers push records with post_*(); the UI thread calls drain() once per
+    frame. Progress records are coalesced per key so only the newest state
+    of each job is drawn, while logs and calls keep their original order.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self.main_thread = threading.current_thread()
+
+    def on_main_thread(self):
+        return threading.current_thread() is self.main_thread
+
+    def post_log(self, message):
+        self._queue.put((LOG, None, message))
+
+    def post_progress(self, key, payload):
+        self._queue.put((PROGRESS, key, payload))
+
+    def post_call(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on the UI thread"""
+        self._queue.put((CALL, None, (func, args, kwargs)))
+
+    def drain(self, limit=None):
+        """
+        Return the pending events as (kind, key, payload) tuples with stale
+        progress records removed. `limit` caps how many raw records are taken
+        in one frame so a flood cannot freeze the UI.
+        """
+        events = []
+        while limit is None or len(events) < limit:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        last_progress = {}
+        for index, (kind, key, _) in enumerate(events):
+            if kind == PROGRESS:
+                last_progress[key] = index
+
+        return [event for index, event in enumerate(events)
+                if event[0] != PROGRESS or last_progress[event[1]] == index]